@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -48,12 +49,14 @@ INSTALLED_APPS = [
     'social',
     'website',      # Site web public
     'dashboard',    # Tableau de bord artisan
+    'core',         # Outils communs (pagination, ...)
     'drf_spectacular',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db_router.DatabaseRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -82,17 +85,75 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+# Lectures asynchrones de l'API (core/async_api.py), activées par le profil ASGI
+# (gunicorn_asgi.conf.py) ; déploiement par défaut : WSGI
+ASYNC_API_VIEWS = os.environ.get('ASYNC_API_VIEWS') == '1'
 
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite en local. En production : DB_ENGINE=postgresql et DB_NAME, DB_USER,
+# DB_PASSWORD, DB_HOST, DB_PORT.
+# DB_REPLICAS : réplicas en lecture, séparés par des virgules (hôtes PostgreSQL,
+# ou fichiers SQLite pour simuler en local) ; voir core/db_router.py.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+DB_REPLICAS = [replica.strip() for replica in os.environ.get('DB_REPLICAS', '').split(',') if replica.strip()]
+
+
+def postgres_database(host):
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'nsapka'),
+        'USER': os.environ.get('DB_USER', 'nsapka'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': host,
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
-}
+    if os.environ.get('DB_POOL') == '1':
+        # Pool de connexions psycopg 3 dans chaque processus
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': 10,
+        }
+    else:
+        # Connexions persistantes (ou derrière PgBouncer)
+        database['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    if os.environ.get('DB_PGBOUNCER') == '1':
+        # PgBouncer en mode transaction : pas de curseurs côté serveur
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return database
+
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {'default': postgres_database(os.environ.get('DB_HOST', 'localhost'))}
+    replica_databases = [postgres_database(host) for host in DB_REPLICAS]
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+    replica_databases = [{'ENGINE': 'django.db.backends.sqlite3', 'NAME': path} for path in DB_REPLICAS]
+
+for index, replica in enumerate(replica_databases, start=1):
+    # En test, un réplica est la base principale
+    DATABASES[f'replica_{index}'] = {**replica, 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+# Lectures sur la base principale après une écriture du même client (secondes)
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 10))
+# Panier, paiement et commandes : toujours sur la base principale
+DATABASE_PRIMARY_PATHS = [
+    '/admin/', '/api/orders/', '/api/payments/',
+    '/cart/', '/payment/', '/confirmation/', '/check-stock/', '/order/',
+]
 
 
 # Password validation
@@ -147,6 +208,9 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Pagination par curseur sur (created_at, id) : voir core/pagination.py
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.CursorPagination',
+    'PAGE_SIZE': 20,
 }
 
 SIMPLE_JWT = {
@@ -184,4 +248,79 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
     'COMPONENT_SPLIT_REQUEST': True,
-}
\ No newline at end of file
+}
+
+# Cache (core/cache.py) : Redis si REDIS_URL est défini, sinon mémoire locale
+# (un cache par processus : les invalidations ne sont pas partagées)
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'nsapka',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'nsapka',
+        }
+    }
+APP_CACHE_TIMEOUT = 300
+# ETag des listes tiré de versions en cache (core/conditional.py)
+# None = seulement avec un cache partagé (pas en mémoire locale)
+CONDITIONAL_STATE_VERSIONS = None
+
+# Recherche plein texte du catalogue (products/search.py)
+# None = détection automatique : FTS5 sur SQLite, tsvector + GIN sur PostgreSQL,
+# filtre icontains ailleurs
+PRODUCT_SEARCH_BACKEND = None
+# Résultats classés au plus (taille du CASE WHEN du tri par pertinence)
+PRODUCT_SEARCH_MAX_RESULTS = 1000
+
+
+# Tâches en arrière-plan (core/tasks.py)
+BACKGROUND_TASK_WORKERS = 4
+BACKGROUND_TASKS_EAGER = False  # True : exécution immédiate (tests)
+
+# Paiements (orders/providers.py)
+PAYMENT_PROVIDER = 'orders.providers.SimulatedProvider'
+PAYMENT_WEBHOOK_SECRET = os.environ.get('PAYMENT_WEBHOOK_SECRET', '')
+# Paiement en attente sans tentative depuis ce délai : relancé (retry_pending_payments)
+PAYMENT_RETRY_AFTER = timedelta(minutes=2)
+# Au-delà, le paiement est marqué échoué et l'acheteur peut réessayer
+PAYMENT_MAX_ATTEMPTS = 5
+
+# Réservations de stock du panier (products/reservations.py)
+STOCK_RESERVATION_TTL = timedelta(minutes=15)
+
+# Envoi des images produits (products/uploads.py)
+IMAGE_UPLOAD_CHUNK_SIZE = 1024 * 1024       # mémoire max par morceau lu
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+IMAGE_UPLOAD_SPOOL_DIR = None               # None : MEDIA_ROOT/uploads/partial
+
+# Import du catalogue en masse (products/bulk.py) : lignes validées et créées par lot
+PRODUCT_IMPORT_BATCH_SIZE = 500
+
+# Copies réduites des images (core/images.py), générées par core.tasks
+IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1280)
+
+# Vidéos produits en HLS (products/video.py, commande process_video_jobs)
+VIDEO_HLS_RENDITIONS = ((240, 400, 64), (480, 1000, 96), (720, 2500, 128))  # hauteur, kb/s vidéo, kb/s audio
+VIDEO_HLS_SEGMENT_SECONDS = 4
+VIDEO_TRANSCODE_TIMEOUT = 1800   # secondes par appel à ffmpeg
+VIDEO_CLAIM_TIMEOUT = 3 * 3600    # tâche "En cours" depuis plus longtemps : worker perdu, tâche reprise
+FFMPEG_BINARY = None    # None : ffmpeg / ffprobe trouvés dans le PATH
+FFPROBE_BINARY = None
+
+
+# WebSockets de la messagerie (social/consumers.py)
+# Couche en mémoire : un seul processus (dev, tests). En production avec
+# plusieurs workers, utiliser channels_redis.core.RedisChannelLayer.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
@@ -3,6 +3,7 @@ from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 from django.conf import settings
 from django.conf.urls.static import static
+from core.views import serve_media
 # Importez toutes les vues nécessaires ici
 from website.views import (
     artisans_list, artisan_detail, 
@@ -63,5 +64,6 @@ urlpatterns = [
 
 # AJOUTEZ CE BLOC À LA FIN DU FICHIER
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # MEDIA avec requêtes Range (lecture vidéo progressive, core/views.py)
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -0,0 +1,120 @@
+# core/async_api.py
+"""
+Lectures asynchrones (ASGI) des endpoints les plus sollicités par l'app.
+
+async_read_view(ProductViewSet, ...) sert les GET list / retrieve d'un
+viewset DRF existant avec l'ORM asynchrone : authentification JWT,
+requête conditionnelle (304), page et objet sont lus avec await, la
+sérialisation se fait sur des données préchargées. Le worker ASGI traite
+d'autres requêtes pendant les attentes de la base.
+
+Le viewset reste la référence : queryset, filtres, ?fields=, serializer,
+permissions et pagination par curseur sont les siens. Les autres
+méthodes (POST, PUT, ...) et les cas non couverts (recherche paginée
+par numéro de page) sont transmis au viewset synchrone.
+
+Activé par ASYNC_API_VIEWS (profil ASGI, voir gunicorn_asgi.conf.py),
+désactivé par défaut : servies en WSGI, ces routes restent synchrones.
+Mesuré sous uvicorn, le débit est le même avec ou sans ces vues : le coût
+vient du serveur ASGI, pas de l'ORM asynchrone.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .conditional import aqueryset_state, aversioned_state, not_modified, request_salt, set_validators, versions_enabled
+from .pagination import CursorPagination
+
+
+async def authenticate(request):
+    """JWTAuthentication de simplejwt, utilisateur lu avec l'ORM asynchrone"""
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return AnonymousUser()
+
+    token = authenticator.get_validated_token(raw_token)
+    try:
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken("Le jeton ne contient pas d'identifiant utilisateur")
+    user = await authenticator.user_model.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+    if user is None or not user.is_active:
+        raise AuthenticationFailed("Utilisateur introuvable ou inactif", code='user_not_found')
+    return user
+
+
+async def async_list(view):
+    queryset = view.filter_queryset(view.get_queryset())
+    if view.conditional_versions and versions_enabled():
+        etag, last_modified = await aversioned_state(view.conditional_versions, *request_salt(view.request))
+    else:
+        etag, last_modified = await aqueryset_state(queryset, view.conditional_fields, *request_salt(view.request))
+    response = not_modified(view.request, etag, last_modified)
+    if response is None:
+        page = await view.paginator.apaginate_queryset(queryset, view.request, view=view)
+        response = view.get_paginated_response(view.get_serializer(page, many=True).data)
+    return set_validators(response, etag, last_modified, vary=('Authorization',))
+
+
+async def async_retrieve(view):
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    queryset = view.filter_queryset(view.get_queryset()).filter(
+        **{view.lookup_field: view.kwargs[lookup_url_kwarg]}
+    )
+    etag, last_modified = await aqueryset_state(queryset, view.conditional_fields, *request_salt(view.request))
+    response = not_modified(view.request, etag, last_modified)
+    if response is None:
+        instance = await queryset.afirst()
+        if instance is None:
+            raise Http404
+        view.check_object_permissions(view.request, instance)
+        response = Response(view.get_serializer(instance).data)
+    return set_validators(response, etag, last_modified, vary=('Authorization',))
+
+
+HANDLERS = {'list': async_list, 'retrieve': async_retrieve}
+
+
+def async_read_view(viewset_class, actions, read_action):
+    """
+    Vue async pour une route du viewset : `actions` est le dictionnaire
+    méthode -> action du router ({'get': 'list', 'post': 'create'}),
+    `read_action` l'action servie en asynchrone ('list' ou 'retrieve').
+    """
+    sync_view = viewset_class.as_view(actions)
+    handler = HANDLERS[read_action]
+
+    @csrf_exempt
+    async def view_func(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+        view = viewset_class(action=read_action, action_map=actions, args=args, kwargs=kwargs, format_kwarg=None)
+        view.request = drf_request = view.initialize_request(request, *args, **kwargs)
+        view.headers = view.default_response_headers
+        if not isinstance(view.paginator, CursorPagination) and read_action == 'list':
+            # Recherche (pagination par numéro de page) : viewset synchrone
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+        try:
+            drf_request.user = await authenticate(request)
+            drf_request.accepted_renderer, drf_request.accepted_media_type = view.perform_content_negotiation(drf_request)
+            view.check_permissions(drf_request)
+            response = await handler(view)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        response = view.finalize_response(drf_request, response)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    view_func.cls = viewset_class
+    return view_func
@@ -0,0 +1,101 @@
+# core/cache.py
+"""
+Cache applicatif à clés versionnées.
+
+Chaque espace de noms ("catalog", ...) a un numéro de version stocké dans
+le cache ; il fait partie de toutes les clés de l'espace. Invalider
+revient à incrémenter ce numéro (bump) : les anciennes entrées ne sont
+plus jamais lues et expirent d'elles-mêmes.
+
+get_or_set() protège contre l'effet de meute : à l'expiration d'une
+entrée très demandée, un seul processus la recalcule (verrou posé avec
+cache.add, atomique en mémoire comme sur Redis) pendant que les autres
+attendent brièvement le résultat.
+
+Le backend est celui de CACHES['default'] : mémoire locale par défaut,
+Redis si REDIS_URL est défini (voir config/settings.py).
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 300
+LOCK_TIMEOUT = 30          # durée max d'un recalcul (secondes)
+WAIT_TIMEOUT = 2.0         # attente max du résultat calculé par un autre
+WAIT_INTERVAL = 0.05
+
+_MISSING = object()
+# Verrous du processus, répartis par hash de clé (nombre fixe)
+_local_locks = [threading.RLock() for _ in range(64)]
+
+
+def _version_key(namespace):
+    return f"cachens:{namespace}:version"
+
+
+def get_version(namespace):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        # Départ horodaté : une version perdue (cache vidé) ne revient pas à
+        # un numéro déjà servi (anciennes entrées, anciens ETag)
+        cache.add(_version_key(namespace), int(time.time()), timeout=None)
+        version = cache.get(_version_key(namespace), 1)
+    return version
+
+
+def bump(namespace):
+    """Invalide toutes les entrées de l'espace de noms"""
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        # Version absente (cache vidé, redémarrage) : repartir au-dessus de 1
+        cache.set(_version_key(namespace), int(time.time()), timeout=None)
+
+
+def make_key(namespace, key):
+    return f"{namespace}:v{get_version(namespace)}:{key}"
+
+
+def _local_lock(key):
+    return _local_locks[hash(key) % len(_local_locks)]
+
+
+def get_or_set(namespace, key, compute, timeout=None):
+    """
+    Valeur en cache, sinon compute() calculé une seule fois à la fois
+    (par clé, tous processus confondus).
+    """
+    timeout = timeout or getattr(settings, 'APP_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+    full_key = make_key(namespace, key)
+    value = cache.get(full_key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    # Un seul thread par processus, puis un seul processus (verrou dans le cache)
+    with _local_lock(full_key):
+        value = cache.get(full_key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        lock_key = f"lock:{full_key}"
+        if not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+            deadline = time.monotonic() + WAIT_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(WAIT_INTERVAL)
+                value = cache.get(full_key, _MISSING)
+                if value is not _MISSING:
+                    return value
+            logger.warning(f"Cache : attente dépassée pour {full_key}, calcul local")
+            return compute()
+
+        try:
+            value = compute()
+            cache.set(full_key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
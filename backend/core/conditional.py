@@ -0,0 +1,189 @@
+# core/conditional.py
+"""
+Requêtes conditionnelles (ETag / Last-Modified -> 304 Not Modified).
+
+L'état d'une réponse est tiré des colonnes updated_at des lignes qu'elle
+affiche : une seule requête agrégée (nombre de lignes + dates max), sans
+charger ni sérialiser les objets. Le nombre de lignes détecte les
+suppressions, que la date max ne voit pas.
+
+Les écritures en masse (queryset.update) qui modifient des données
+exposées doivent aussi mettre à jour updated_at.
+
+Listes très demandées (catalogue) : l'agrégat parcourt tout l'ensemble
+filtré à chaque requête. Une vue peut à la place déclarer des versions
+(conditional_versions) incrémentées par les écritures (bump_state) :
+l'ETag se calcule alors sans requête SQL. Les versions vivent dans le
+cache (core.cache) et doivent être partagées entre processus : elles ne
+sont utilisées qu'avec un cache commun (Redis), voir versions_enabled.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from . import cache
+
+
+def state_aggregates(fields):
+    return {'_count': Count('pk'), **{f'_max_{index}': Max(field) for index, field in enumerate(fields)}}
+
+
+def queryset_state(queryset, fields=('updated_at',), *salt):
+    """
+    (etag, last_modified) de `queryset` : nombre de lignes et maximum de
+    chaque champ date de `fields`, en une requête.
+    """
+    values = queryset.order_by().aggregate(**state_aggregates(fields))
+    return state_from_values(values, fields, salt)
+
+
+async def aqueryset_state(queryset, fields=('updated_at',), *salt):
+    """Variante asynchrone de queryset_state (core.async_api)"""
+    values = await queryset.order_by().aaggregate(**state_aggregates(fields))
+    return state_from_values(values, fields, salt)
+
+
+def state_from_values(values, fields, salt):
+    dates = [values[f'_max_{index}'] for index in range(len(fields))]
+    last_modified = max((date for date in dates if date is not None), default=None)
+    return make_etag(values['_count'], *dates, *salt), last_modified
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(usedforsecurity=False)
+    for part in parts:
+        digest.update(f"{part.isoformat() if hasattr(part, 'isoformat') else part}|".encode())
+    return quote_etag(digest.hexdigest())
+
+
+def state_namespace(name):
+    return f"state:{name}"
+
+
+def bump_state(*names):
+    """Les réponses qui dépendent de `names` ont changé : nouvelles versions après le commit"""
+    def bump():
+        for name in names:
+            cache.bump(state_namespace(name))
+    transaction.on_commit(bump)
+
+
+def versions_enabled():
+    """
+    CONDITIONAL_STATE_VERSIONS, ou par défaut : seulement avec un cache
+    partagé (avec LocMemCache, chaque processus aurait ses versions et un
+    worker répondrait 304 sur une donnée modifiée par un autre).
+    """
+    enabled = getattr(settings, 'CONDITIONAL_STATE_VERSIONS', None)
+    if enabled is None:
+        return not isinstance(caches['default'], LocMemCache)
+    return enabled
+
+
+def versioned_state(names, *salt):
+    """(etag, None) tiré des versions de `names` : lectures dans le cache seulement"""
+    return make_etag(*(cache.get_version(state_namespace(name)) for name in names), *salt), None
+
+
+async def aversioned_state(names, *salt):
+    """Variante asynchrone de versioned_state (core.async_api)"""
+    return await sync_to_async(versioned_state)(names, *salt)
+
+
+def request_salt(request):
+    """La même URL n'a pas le même contenu selon l'utilisateur connecté"""
+    user = getattr(request, 'user', None)
+    return request.get_full_path(), user.pk if user is not None and user.is_authenticated else ''
+
+
+def not_modified(request, etag, last_modified):
+    """Réponse 304 si le client a déjà cette version, sinon None"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified.timestamp() if last_modified else None,
+    )
+
+
+def set_validators(response, etag, last_modified, vary=()):
+    """En-têtes permettant au client de revalider sa copie"""
+    if response.status_code not in (200, 304):
+        return response
+    response.headers.setdefault('ETag', etag)
+    if last_modified:
+        response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+    # Copie réutilisable après revalidation seulement, jamais partagée
+    patch_cache_control(response, private=True, no_cache=True)
+    if vary:
+        patch_vary_headers(response, vary)
+    return response
+
+
+def conditional_page(state_func):
+    """
+    Décorateur de vue : state_func(request, *args, **kwargs) retourne
+    (etag, last_modified) ; un GET sur une page inchangée répond 304
+    sans exécuter la vue.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            etag, last_modified = state_func(request, *args, **kwargs)
+            response = not_modified(request, etag, last_modified) or view(request, *args, **kwargs)
+            return set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+class ConditionalGetMixin:
+    """
+    list / retrieve des viewsets DRF avec ETag et Last-Modified.
+
+    conditional_fields : champs date agrégés (relations autorisées, ex.
+    'artisan__updated_at' quand le serializer expose l'artisan).
+    conditional_versions : versions (bump_state) couvrant toute la liste ;
+    si elles sont actives, list n'exécute plus l'agrégat.
+    """
+    conditional_fields = ('updated_at',)
+    conditional_versions = ()
+
+    def conditional_state(self, queryset):
+        return queryset_state(queryset, self.conditional_fields, *request_salt(self.request))
+
+    def list_state(self, queryset):
+        if self.conditional_versions and versions_enabled():
+            return versioned_state(self.conditional_versions, *request_salt(self.request))
+        return self.conditional_state(queryset)
+
+    def conditional_response(self, state, render):
+        etag, last_modified = state
+        response = not_modified(self.request, etag, last_modified) or render()
+        return set_validators(response, etag, last_modified, vary=('Authorization',))
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(
+            self.list_state(queryset), lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return self.conditional_response(
+            self.conditional_state(queryset),
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs),
+        )
@@ -0,0 +1,157 @@
+# core/db_router.py
+"""
+Lectures sur les réplicas, écritures sur la base principale.
+
+Les bases autres que 'default' dans DATABASES sont des réplicas en
+lecture seule (voir config/settings.py, DB_REPLICAS). Une requête HTTP
+lit sur un réplica seulement si :
+
+- c'est un GET / HEAD hors des chemins DATABASE_PRIMARY_PATHS (panier,
+  paiement, commandes) ;
+- aucune transaction n'est ouverte sur la base principale
+  (select_for_update et lectures du checkout restent cohérentes) ;
+- le client n'a pas écrit récemment : après une écriture (commande,
+  connexion, panier), ses requêtes restent sur la base principale
+  pendant DATABASE_REPLICA_STICKY_SECONDS, le temps que la réplication
+  rattrape (lecture de ses propres écritures).
+
+Hors requête (commandes, workers, WebSocket), tout passe par 'default'.
+"""
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULT_STICKY_SECONDS = 10
+DEFAULT_PRIMARY_PATHS = ('/admin/',)
+DEFAULT_PRIMARY_APPS = ('sessions',)
+
+# État de la requête en cours : {'replica': bool, 'wrote': bool}, None hors requête
+_routing = ContextVar('database_routing', default=None)
+
+
+def sticky_seconds():
+    return getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+@contextmanager
+def use_primary():
+    """Force les lectures sur la base principale dans le bloc"""
+    state = _routing.get()
+    token = _routing.set({'replica': False, 'wrote': state['wrote'] if state else False})
+    try:
+        yield
+    finally:
+        wrote = _routing.get()['wrote']
+        _routing.reset(token)
+        if state is not None:
+            state['wrote'] = state['wrote'] or wrote
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        aliases = replica_aliases()
+        if (
+            not aliases
+            or state is None
+            or not state['replica']
+            or model._meta.app_label in getattr(settings, 'DATABASE_PRIMARY_APPS', DEFAULT_PRIMARY_APPS)
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mêmes données sur toutes les bases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def sticky_key(request, response=None):
+    """Clé de cache du client : jeton JWT, sinon cookie de session (nouveau ou existant)"""
+    credential = request.headers.get('Authorization', '')
+    if not credential:
+        cookie = response.cookies.get(settings.SESSION_COOKIE_NAME) if response is not None else None
+        credential = cookie.value if cookie is not None else request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+    if not credential:
+        return None
+    return f"dbpin:{hashlib.sha256(credential.encode()).hexdigest()[:32]}"
+
+
+class DatabaseRoutingMiddleware:
+    """
+    À placer avant SessionMiddleware : les lectures de session sont aussi
+    routées. Synchrone et asynchrone (profil ASGI, core.async_api) : l'état
+    est posé dans le contexte de la requête, que sync_to_async recopie.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_aliases():
+            return self.get_response(request)
+
+        key = sticky_key(request)
+        state = {'replica': self.use_replica(request, key and cache.get(key)), 'wrote': False}
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        if state['wrote']:
+            key = sticky_key(request, response)
+            if key:
+                cache.set(key, 1, sticky_seconds())
+        return response
+
+    async def __acall__(self, request):
+        if not replica_aliases():
+            return await self.get_response(request)
+
+        key = sticky_key(request)
+        state = {'replica': self.use_replica(request, key and await cache.aget(key)), 'wrote': False}
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        if state['wrote']:
+            key = sticky_key(request, response)
+            if key:
+                await cache.aset(key, 1, sticky_seconds())
+        return response
+
+    def use_replica(self, request, pinned):
+        return (
+            request.method in ('GET', 'HEAD')
+            and not request.path.startswith(tuple(getattr(settings, 'DATABASE_PRIMARY_PATHS', DEFAULT_PRIMARY_PATHS)))
+            and not pinned
+        )
@@ -0,0 +1,64 @@
+# core/explain.py
+"""
+Audit des requêtes fréquentes (commande explain_hot_queries).
+
+Chaque application déclare ses requêtes critiques dans un module
+hot_queries.py :
+
+    @hot_query('products.category_listing')
+    def category_listing():
+        return filter_category(Product.objects.all(), 'sculpture').order_by('-created_at', '-id')
+
+La commande lance EXPLAIN sur chacune et signale les parcours complets de
+table (et, sous SQLite, les tris sans index), avant la mise en production.
+"""
+import re
+
+from django.db import connections, transaction
+from django.utils.module_loading import autodiscover_modules
+
+# nom -> fonction retournant un queryset
+_registry = {}
+
+SQLITE_SCAN_RE = re.compile(r'\bSCAN (\w+)\b(?! USING (?:COVERING )?INDEX)')
+POSTGRES_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+
+
+def hot_query(name):
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def registered():
+    """[(nom, fonction), ...] de toutes les applications installées"""
+    autodiscover_modules('hot_queries')
+    return sorted(_registry.items())
+
+
+def explain(queryset):
+    """
+    Plan d'exécution du queryset. Sous PostgreSQL, les parcours séquentiels
+    sont découragés : un Seq Scan restant signifie qu'aucun index ne
+    convient (et non que la table de test est petite).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with transaction.atomic(using=queryset.db):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def problems(plan, vendor):
+    """Problèmes relevés dans le plan : ["parcours complet de <table>", ...]"""
+    found = []
+    if vendor == 'sqlite':
+        found += [f"parcours complet de {table}" for table in SQLITE_SCAN_RE.findall(plan)]
+        if 'USE TEMP B-TREE FOR ORDER BY' in plan:
+            found.append("tri sans index (ORDER BY)")
+    elif vendor == 'postgresql':
+        found += [f"parcours complet de {table}" for table in POSTGRES_SCAN_RE.findall(plan)]
+    return found
@@ -0,0 +1,184 @@
+# core/images.py
+"""
+Déclinaisons (variantes) des images envoyées par les utilisateurs.
+
+Après l'envoi d'une image, un worker (core.tasks) génère des copies
+réduites aux largeurs IMAGE_VARIANT_WIDTHS, en WebP et en JPEG, à côté de
+l'original : products/abc.jpg -> products/variants/abc_320.webp, ...
+Le résultat est enregistré dans un JSONField du modèle :
+
+    {"source": "products/abc.jpg", "width": 3000,
+     "widths": {"320": {"webp": "products/variants/abc_320.webp", "jpg": "..."}, ...}}
+
+Les templates et serializers en tirent un attribut srcset ; tant que les
+variantes ne sont pas prêtes, l'image originale est utilisée.
+"""
+import io
+import logging
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models.signals import post_save
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .tasks import enqueue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (160, 320, 640, 1280)
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+# (modèle, champ image) -> champ JSON des variantes
+_registry = {}
+
+# Envoyé quand les variantes d'une instance sont enregistrées (sender=modèle, pk)
+variants_ready = Signal()
+
+
+def variant_widths():
+    return tuple(getattr(settings, 'IMAGE_VARIANT_WIDTHS', DEFAULT_WIDTHS))
+
+
+def variant_name(source_name, width, extension):
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f"{stem}_{width}.{extension}")
+
+
+def generate_variants(source_name, storage=default_storage):
+    """
+    Crée les variantes manquantes d'une image stockée.
+    Retourne (largeur de l'original, dict "widths").
+    """
+    with storage.open(source_name, 'rb') as source:
+        with Image.open(source) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'RGBA'):
+                original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+            source_width, source_height = original.size
+
+            widths = {}
+            for width in variant_widths():
+                if width >= source_width:
+                    continue
+                height = max(1, round(source_height * width / source_width))
+                resized = None
+                entry = {}
+                for extension, image_format, options in FORMATS:
+                    name = variant_name(source_name, width, extension)
+                    # Même source (images dédupliquées par hash) : déjà générée
+                    if not storage.exists(name):
+                        if resized is None:
+                            resized = original.resize((width, height), Image.LANCZOS)
+                        image = resized.convert('RGB') if image_format == 'JPEG' else resized
+                        buffer = io.BytesIO()
+                        image.save(buffer, image_format, **options)
+                        name = storage.save(name, ContentFile(buffer.getvalue()))
+                    entry[extension] = name
+                widths[str(width)] = entry
+    return source_width, widths
+
+
+def build_variants(model_label, pk, image_field, variants_field):
+    """Tâche : génère les variantes d'une instance puis les enregistre (UPDATE)"""
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).only(image_field, variants_field).first()
+    if instance is None:
+        return
+    source = getattr(instance, image_field)
+    if not source:
+        return
+    try:
+        source_width, widths = generate_variants(source.name)
+    except (FileNotFoundError, UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Variantes impossibles pour {model_label}#{pk} ({source.name}): {e}")
+        return
+    changes = {variants_field: {'source': source.name, 'width': source_width, 'widths': widths}}
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        # La représentation change : invalide les ETag (core.conditional)
+        changes['updated_at'] = timezone.now()
+    # Ne pas écraser si l'image a changé entre-temps
+    if model.objects.filter(pk=pk, **{image_field: source.name}).update(**changes):
+        variants_ready.send(sender=model, pk=pk)
+
+
+def needs_variants(instance, image_field, variants_field):
+    source = getattr(instance, image_field)
+    variants = getattr(instance, variants_field) or {}
+    return bool(source) and variants.get('source') != source.name
+
+
+def schedule_variants(instance, image_field, variants_field):
+    if needs_variants(instance, image_field, variants_field):
+        enqueue(build_variants, instance._meta.label, instance.pk, image_field, variants_field)
+
+
+def schedule_for(instances):
+    """Pour les instances créées sans post_save (bulk_create)"""
+    for instance in instances:
+        for (model, image_field), variants_field in _registry.items():
+            if isinstance(instance, model):
+                schedule_variants(instance, image_field, variants_field)
+
+
+def registered():
+    """[((modèle, champ image), champ des variantes), ...]"""
+    return list(_registry.items())
+
+
+def register(model, image_field, variants_field):
+    """Génère les variantes de model.<image_field> après chaque sauvegarde"""
+    _registry[(model, image_field)] = variants_field
+
+    def on_save(sender, instance, raw=False, **kwargs):
+        if not raw:
+            schedule_variants(instance, image_field, variants_field)
+
+    post_save.connect(
+        on_save, sender=model, weak=False,
+        dispatch_uid=f"image_variants_{model._meta.label}_{image_field}",
+    )
+
+
+def variant_urls(field_file, variants, extension='webp', request=None):
+    """{largeur: url} des variantes prêtes pour `field_file`"""
+    if not field_file or not variants or variants.get('source') != field_file.name:
+        return {}
+    urls = {}
+    for width, entry in (variants.get('widths') or {}).items():
+        if extension in entry:
+            url = default_storage.url(entry[extension])
+            urls[int(width)] = request.build_absolute_uri(url) if request else url
+    return dict(sorted(urls.items()))
+
+
+def srcset(field_file, variants, extension='webp', request=None):
+    """
+    Valeur de l'attribut srcset ("url 160w, url 320w, ..., original 3000w"),
+    vide tant que les variantes ne sont pas prêtes.
+    """
+    urls = variant_urls(field_file, variants, extension, request)
+    if not urls:
+        return ''
+    candidates = [f"{url} {width}w" for width, url in urls.items()]
+    original = request.build_absolute_uri(field_file.url) if request else field_file.url
+    candidates.append(f"{original} {variants['width']}w")
+    return ', '.join(candidates)
+
+
+def variants_payload(field_file, variants, request=None):
+    """Représentation API : srcset et URLs par largeur, pour chaque format"""
+    if not field_file:
+        return None
+    return {
+        'srcset': srcset(field_file, variants, request=request),
+        **{extension: variant_urls(field_file, variants, extension, request) for extension, _, _ in FORMATS},
+    }
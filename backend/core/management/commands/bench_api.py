@@ -0,0 +1,55 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Charge un endpoint avec N clients simultanés et mesure le débit. "
+        "Comparer un worker WSGI (gunicorn -w 1 config.wsgi) et un worker ASGI "
+        "(gunicorn -c gunicorn_asgi.conf.py -w 1 config.asgi:application)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="Ex. http://127.0.0.1:8000/api/products/")
+        parser.add_argument('--concurrency', type=int, default=50, help="Clients simultanés")
+        parser.add_argument('--requests', type=int, default=1000, help="Nombre total de requêtes")
+        parser.add_argument('--token', default='', help="Jeton JWT (Authorization: Bearer)")
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        headers = {'Authorization': f"Bearer {options['token']}"} if options['token'] else {}
+
+        def fetch(_):
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(
+                    urllib.request.Request(options['url'], headers=headers), timeout=options['timeout']
+                ) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except OSError:
+                status = None
+            return status, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        ok = [duration for status, duration in results if status == 200]
+        if not ok:
+            raise CommandError("Aucune réponse 200 : vérifier l'URL et le serveur")
+        ok.sort()
+        self.stdout.write(
+            f"{len(results)} requêtes, {options['concurrency']} clients : "
+            f"{len(results) / elapsed:.0f} req/s, "
+            f"p50 {ok[len(ok) // 2] * 1000:.0f} ms, p95 {ok[int(len(ok) * 0.95) - 1] * 1000:.0f} ms, "
+            f"moyenne {statistics.mean(ok) * 1000:.0f} ms, erreurs {len(results) - len(ok)}"
+        )
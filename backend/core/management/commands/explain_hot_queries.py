@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.explain import explain, problems, registered
+
+
+class Command(BaseCommand):
+    help = "Lance EXPLAIN sur les requêtes fréquentes (hot_queries.py) et signale les parcours complets de table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Requêtes à auditer (toutes par défaut)")
+        parser.add_argument('--plan', action='store_true', help="Afficher le plan de chaque requête")
+        parser.add_argument('--strict', action='store_true', help="Code de sortie en erreur si une requête est signalée")
+
+    def handle(self, *args, **options):
+        queries = [(name, func) for name, func in registered() if not options['names'] or name in options['names']]
+        if not queries:
+            raise CommandError("Aucune requête trouvée")
+
+        flagged = 0
+        for name, func in queries:
+            queryset = func()
+            vendor = connections[queryset.db].vendor
+            plan = explain(queryset)
+            found = problems(plan, vendor)
+            if found:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"{name} : {', '.join(found)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name} : OK"))
+            if options['plan'] or found:
+                self.stdout.write(f"    {plan.replace(chr(10), chr(10) + '    ')}")
+
+        if vendor not in ('sqlite', 'postgresql'):
+            self.stdout.write(f"Base {vendor} : plans affichés sans analyse")
+        self.stdout.write(f"{len(queries)} requête(s) auditée(s), {flagged} signalée(s)")
+        if flagged and options['strict']:
+            raise CommandError(f"{flagged} requête(s) sans index adapté")
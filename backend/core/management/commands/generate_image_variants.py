@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.images import build_variants, needs_variants, registered
+
+
+class Command(BaseCommand):
+    help = "Génère les copies réduites manquantes des images déjà envoyées (produits, profils, blog, messages)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Régénérer aussi les images déjà traitées")
+
+    def handle(self, *args, **options):
+        for (model, image_field), variants_field in registered():
+            queryset = model.objects.exclude(**{image_field: ''}).exclude(**{f'{image_field}__isnull': True})
+            count = 0
+            for instance in queryset.only(image_field, variants_field).iterator(chunk_size=200):
+                if options['force'] or needs_variants(instance, image_field, variants_field):
+                    build_variants(model._meta.label, instance.pk, image_field, variants_field)
+                    count += 1
+            self.stdout.write(f"{model._meta.label}.{image_field} : {count} image(s) traitée(s)")
@@ -0,0 +1,67 @@
+# core/mixins.py
+"""
+Plan de chargement des viewsets DRF.
+
+Chaque viewset déclare les relations utilisées par son serializer ; le
+queryset les charge en une requête (select_related) ou une requête par
+relation (prefetch_related), quel que soit le nombre d'objets listés.
+
+Avec ?fields= (core.serializers.DynamicFieldsMixin), seules les
+relations et colonnes lues par les champs demandés sont chargées.
+"""
+from django.db.models import Prefetch
+
+from .serializers import DynamicFieldsMixin
+
+
+def relation_root(lookup):
+    """'items__product' ou Prefetch('items', ...) -> 'items'"""
+    if isinstance(lookup, Prefetch):
+        lookup = lookup.prefetch_through
+    return lookup.split('__')[0]
+
+
+def only_fields(model, attributes, nested, select_related):
+    """Colonnes à lire : celles du modèle, puis celles des relations jointes restreintes"""
+    concrete = {field.name for field in model._meta.concrete_fields}
+    columns = [name for name in attributes if name in concrete]
+    for relation in select_related:
+        if relation in nested and '__' not in relation:
+            related_model = model._meta.get_field(relation).related_model
+            related_concrete = {field.name for field in related_model._meta.concrete_fields}
+            columns += [f"{relation}__{name}" for name in nested[relation][0] if name in related_concrete]
+    return columns
+
+
+class QueryPlanMixin:
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def get_queryset(self):
+        return self.apply_query_plan(super().get_queryset())
+
+    def serializer_requirements(self):
+        """(attributs, relations imbriquées) lus par les champs demandés, None = tout"""
+        serializer = self.get_serializer()
+        if not isinstance(serializer, DynamicFieldsMixin) or serializer.field_selection is None:
+            return None
+        return serializer.query_requirements()
+
+    def apply_query_plan(self, queryset):
+        select_related = self.select_related_fields
+        prefetch_related = self.prefetch_related_fields
+
+        requirements = self.serializer_requirements()
+        if requirements is not None:
+            attributes, nested = requirements
+            # La pagination par curseur lit les champs de tri du dernier objet
+            attributes = attributes | {name.lstrip('-') for name in getattr(self, 'cursor_ordering', ())}
+            select_related = [lookup for lookup in select_related if relation_root(lookup) in attributes]
+            prefetch_related = [lookup for lookup in prefetch_related if relation_root(lookup) in attributes]
+            queryset = queryset.only(*only_fields(queryset.model, attributes, nested, select_related))
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
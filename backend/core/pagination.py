@@ -0,0 +1,142 @@
+# core/pagination.py
+"""
+Pagination commune des endpoints DRF.
+
+La pagination par curseur (keyset) lit toujours une seule plage d'index :
+la page 500 coûte autant que la page 1, contrairement à OFFSET.
+"""
+import json
+
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination as BaseCursorPagination
+from rest_framework.pagination import PageNumberPagination, _reverse_ordering
+
+
+class CursorPagination(BaseCursorPagination):
+    """
+    Pagination par curseur sur (created_at, id) par défaut.
+
+    Une vue peut déclarer son propre tri indexé via l'attribut
+    `cursor_ordering`, ex: ('-timestamp', '-id') pour les messages.
+
+    Le curseur porte tous les champs du tri, dont le dernier est unique :
+    les ex aequo sur le premier champ (même date, même nombre de commandes)
+    sont départagés par la clé, sans OFFSET. Champs du tri non nuls.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering:
+            return tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+    # paginate_queryset de DRF, en deux temps autour de la lecture de la page,
+    # pour la variante asynchrone (core.async_api)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        window = self.page_window(queryset, request, view)
+        if window is None:
+            return None
+        return self.paginate_results(list(window))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        window = self.page_window(queryset, request, view)
+        if window is None:
+            return None
+        return self.paginate_results([item async for item in window])
+
+    def page_window(self, queryset, request, view=None):
+        """Queryset de la page (plus un élément), sans l'exécuter"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = self.filter_position(queryset, current_position, reverse)
+
+        self._window = (offset, reverse, current_position)
+        return queryset[offset:offset + self.page_size + 1]
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            value = getattr(instance, order.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return json.dumps(values)
+
+    def filter_position(self, queryset, position, reverse):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            return queryset.none()
+        # (a, b) > (x, y)  <=>  a > x OU (a = x ET b > y), selon le sens de chaque champ
+        condition = Q()
+        equal = {}
+        for order, value in zip(self.ordering, values):
+            field = order.lstrip('-')
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return queryset.filter(condition)
+
+    def paginate_results(self, results):
+        """Page et positions suivante / précédente à partir des lignes lues"""
+        offset, reverse, current_position = self._window
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class SearchResultsPagination(PageNumberPagination):
+    """
+    Résultats de recherche triés par pertinence : le tri n'est pas une clé
+    indexée, mais l'ensemble est borné par PRODUCT_SEARCH_MAX_RESULTS.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
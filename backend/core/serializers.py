@@ -0,0 +1,95 @@
+# core/serializers.py
+"""
+Champs à la demande (sparse fieldsets) pour les serializers DRF.
+
+    ?fields=id,name,price,main_image              champs retenus
+    ?fields=id,name,artisan_details.stand_name    champs d'un serializer imbriqué
+    ?fields=id,name&expand=artisan_details        relation imbriquée complète
+
+Sans ?fields, la représentation est complète (comportement historique).
+Le viewset (core.mixins.QueryPlanMixin) en déduit les colonnes lues
+(only()) et les relations chargées.
+"""
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_fields(value):
+    """"a,b.c,b.d" -> {'a': {}, 'b': {'c': {}, 'd': {}}}"""
+    selection = {}
+    for path in value.split(','):
+        node = selection
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return selection
+
+
+def requested_fields(request):
+    """Sélection demandée par ?fields / ?expand, None = tous les champs"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    selection = parse_fields(fields)
+    for name in request.query_params.get('expand', '').split(','):
+        if name.strip():
+            selection.setdefault(name.strip(), {})
+    return selection
+
+
+class DynamicFieldsMixin:
+    """
+    Meta.field_dependencies : attributs du modèle lus par un champ calculé,
+    ex. {'available_stock': ('stock', 'reserved_stock')}. Les autres champs
+    lisent leur `source`.
+    """
+
+    @property
+    def field_selection(self):
+        if not hasattr(self, '_field_selection'):
+            self._field_selection = self._resolve_selection()
+        return self._field_selection
+
+    def _resolve_selection(self):
+        parent = self.parent
+        name = self.field_name
+        if isinstance(parent, serializers.ListSerializer):
+            name = parent.field_name
+            parent = parent.parent
+        if parent is None:
+            return requested_fields(self.context.get('request'))
+        # Serializer imbriqué : sous-sélection du parent ({} = tous les champs)
+        selection = getattr(parent, 'field_selection', None)
+        return (selection.get(name) or None) if selection else None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.field_selection
+        if selection is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in selection}
+
+    def query_requirements(self):
+        """
+        Attributs du modèle lus par les champs retenus (colonnes et
+        relations), et pour chaque relation imbriquée restreinte, les
+        exigences de son serializer : (attributs, {source: (attributs, ...)}).
+        """
+        dependencies = getattr(self.Meta, 'field_dependencies', {})
+        attributes = set()
+        nested = {}
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if name in dependencies:
+                attributes.update(dependencies[name])
+                continue
+            if field.source == '*':
+                continue
+            source = field.source.split('.')[0]
+            attributes.add(source)
+            child = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(child, DynamicFieldsMixin) and child.field_selection is not None:
+                nested[source] = child.query_requirements()
+        return attributes, nested
@@ -0,0 +1,20 @@
+# core/streaming.py
+"""
+Aides des exports en flux (StreamingHttpResponse) et des traitements par
+lots : le fichier est produit ligne à ligne, en mémoire constante.
+"""
+from itertools import islice
+
+
+class Echo:
+    """Tampon de csv.writer qui retourne la ligne au lieu de l'écrire"""
+
+    def write(self, value):
+        return value
+
+
+def batches(iterable, size):
+    """Listes successives d'au plus `size` éléments de `iterable`"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
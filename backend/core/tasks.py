@@ -0,0 +1,50 @@
+# core/tasks.py
+"""
+File de tâches en arrière-plan (pool de threads du processus).
+
+Les tâches sont planifiées après le commit de la transaction courante :
+un worker ne voit jamais une ligne qui n'a pas encore été validée.
+Avec BACKGROUND_TASKS_EAGER = True (tests, scripts), elles s'exécutent
+immédiatement dans le thread appelant.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 4),
+                thread_name_prefix='nsapka-task',
+            )
+        return _executor
+
+
+def run_task(func, *args, **kwargs):
+    """Exécute une tâche avec des connexions BDD propres au thread"""
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception(f"Échec de la tâche {func.__module__}.{func.__qualname__}")
+    finally:
+        close_old_connections()
+
+
+def enqueue(func, *args, **kwargs):
+    """Planifie func(*args, **kwargs) après le commit de la transaction courante"""
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(run_task, func, *args, **kwargs))
@@ -0,0 +1,392 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from products.models import Product, ProductImage
+from users.models import User
+from . import explain, images
+from .pagination import CursorPagination
+from .db_router import DatabaseRoutingMiddleware, PrimaryReplicaRouter, _routing, sticky_key
+from .views import serve_media
+
+REPLICA = 'replica_1'
+
+
+@mock.patch('core.db_router.replica_aliases', return_value=['replica_1'])
+class DatabaseRoutingMiddlewareTests(SimpleTestCase):
+    """Même routage en WSGI et en ASGI (état visible depuis sync_to_async)"""
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/api/products/', HTTP_AUTHORIZATION='Bearer jeton')
+
+    def test_async_chain(self, aliases):
+        seen = []
+
+        async def view(request):
+            seen.append(_routing.get()['replica'])
+            # Écriture ORM exécutée dans un thread : l'état de la requête suit
+            await sync_to_async(PrimaryReplicaRouter().db_for_write)(Product)
+            return HttpResponse()
+
+        middleware = DatabaseRoutingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(middleware)(self.request)
+
+        self.assertEqual(seen, [True])
+        self.assertIsNone(_routing.get())
+        self.assertEqual(cache.get(sticky_key(self.request)), 1)
+
+    def test_sync_chain(self, aliases):
+        seen = []
+
+        def view(request):
+            seen.append(_routing.get()['replica'])
+            return HttpResponse()
+
+        middleware = DatabaseRoutingMiddleware(view)
+        self.assertFalse(iscoroutinefunction(middleware))
+        cache.set(sticky_key(self.request), 1)
+        middleware(self.request)
+
+        # Client épinglé après une écriture récente : base principale
+        self.assertEqual(seen, [False])
+
+
+@mock.patch('core.db_router.replica_aliases', return_value=[REPLICA])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Deux alias SQLite (réplica = miroir de la base de test, connexion
+    distincte) : les lectures vont au réplica, sauf pour un client qui
+    vient d'écrire (lecture de ses propres écritures).
+    """
+
+    def setUp(self):
+        # Alias ajouté après la préparation des bases : connexion SQLite
+        # distincte sur la base de test (lit les données validées)
+        primary = connections['default'].settings_dict
+        connections.settings[REPLICA] = {**primary, 'TEST': {**primary['TEST'], 'MIRROR': 'default'}}
+        # Ouverte ici : hors de `databases`, le test refuse les ouvertures implicites
+        connections[REPLICA].connect()
+        self.addCleanup(self.remove_replica)
+
+        cache.clear()
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        Product.objects.create(
+            artisan=self.artisan, name='Panier', description='d', price=1000, stock=5, category='other',
+        )
+
+    def remove_replica(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def client_for(self, user):
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return api
+
+    def read(self, api):
+        """Requêtes (base principale, réplica) d'une lecture du catalogue"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = api.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        return len(primary), len(replica)
+
+    def test_reads_on_replica(self, aliases):
+        primary, replica = self.read(self.client_for(self.buyer))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_pinned_after_write(self, aliases):
+        buyer = self.client_for(self.buyer)
+        response = buyer.post('/api/conversations/', {'participants': [self.artisan.pk]}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        primary, replica = self.read(buyer)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        # Les autres clients lisent toujours sur le réplica
+        primary, replica = self.read(self.client_for(self.artisan))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+
+class DynamicFieldsTests(TestCase):
+    """
+    ?fields= / ?expand= avec only() : les champs calculés déclarent leurs
+    dépendances, aucune colonne différée n'est relue ligne par ligne
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.api = APIClient()
+        self.api.force_authenticate(self.artisan)
+        self.add_rows(2)
+
+    def add_rows(self, count):
+        start = Product.objects.count()
+        for i in range(start, start + count):
+            product = Product.objects.create(
+                artisan=self.artisan, name=f'Panier {i}', description='d', price=1000, stock=5, category='other',
+            )
+            ProductImage.objects.create(product=product, image=f'products/panier_{i}.jpg', is_main=True)
+            User.objects.create_user(f'artisan{i}', password='x', role=User.Role.ARTISAN, phone=f'02{i:02d}')
+
+    def get(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], queries
+
+    def test_query_count_independent_of_rows(self):
+        urls = {
+            '/api/products/?fields=id,name': {'id', 'name'},
+            '/api/products/?fields=id,main_image,main_image_variants': {'id', 'main_image', 'main_image_variants'},
+            '/api/products/?fields=id,available_stock,video': {'id', 'available_stock', 'video'},
+            '/api/products/?fields=id,images_details.variants': {'id', 'images_details'},
+            '/api/products/?fields=id,artisan_details.username': {'id', 'artisan_details'},
+            '/api/products/?fields=id&expand=artisan_details': {'id', 'artisan_details'},
+            '/api/products/my_products/?fields=id,main_image': {'id', 'main_image'},
+            '/api/users/?fields=id,profile_image_variants': {'id', 'profile_image_variants'},
+        }
+        before = {}
+        for url, keys in urls.items():
+            rows, queries = self.get(url)
+            self.assertEqual(set(rows[0]), keys, url)
+            before[url] = len(queries)
+
+        self.add_rows(3)
+        for url in urls:
+            with self.subTest(url):
+                rows, queries = self.get(url)
+                self.assertGreaterEqual(len(rows), 5)
+                self.assertEqual(len(queries), before[url])
+
+    def test_only_requested_columns(self):
+        rows, queries = self.get('/api/products/?fields=id,name')
+        self.assertEqual(rows[0]['name'], 'Panier 1')
+        select = next(q['sql'] for q in queries if 'FROM "products_product"' in q['sql'] and 'COUNT' not in q['sql'])
+        self.assertIn('"products_product"."name"', select)
+        self.assertNotIn('"products_product"."description"', select)
+
+        # Sous-sélection imbriquée : seules les colonnes utiles de l'artisan
+        rows, queries = self.get('/api/products/?fields=id,artisan_details.username')
+        self.assertEqual(rows[0]['artisan_details'], {'username': 'artisan'})
+        select = next(q['sql'] for q in queries if 'FROM "products_product"' in q['sql'] and 'COUNT' not in q['sql'])
+        self.assertNotIn('"users_user"."email"', select)
+
+
+class ServeMediaRangeTests(SimpleTestCase):
+    """Requêtes Range sur les fichiers MEDIA (lecture vidéo, reprise)"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.content = bytes(range(100))
+        with open(os.path.join(self.root, 'seg_000.ts'), 'wb') as f:
+            f.write(self.content)
+
+    def get(self, path='seg_000.ts', **headers):
+        request = RequestFactory().get(f'/media/{path}', **headers)
+        return serve_media(request, path, document_root=self.root)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response['Content-Type'], response['Accept-Ranges']), ('video/mp2t', 'bytes'))
+        self.assertEqual(self.body(response), self.content)
+
+    def test_partial_ranges(self):
+        for header, start, end in (
+            ('bytes=10-19', 10, 19),
+            ('bytes=90-', 90, 99),
+            ('bytes=95-500', 95, 99),  # fin bornée à la taille
+            ('bytes=-5', 95, 99),      # les 5 derniers octets
+            ('bytes=-500', 0, 99),
+        ):
+            with self.subTest(header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/100')
+                self.assertEqual(response['Content-Length'], str(end - start + 1))
+                self.assertEqual(self.body(response), self.content[start:end + 1])
+
+    def test_unsatisfiable_range(self):
+        for header in ('bytes=100-', 'bytes=50-10', 'bytes=-0'):
+            with self.subTest(header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_outside_root(self):
+        with self.assertRaises(Http404):
+            self.get('../secret.txt')
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=(160, 320, 640), BACKGROUND_TASKS_EAGER=True, MEDIA_URL='/media/')
+class ImageVariantsTests(TestCase):
+    """Variantes WebP/JPEG d'une image envoyée, puis srcset de l'API"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), 'green').save(buffer, 'PNG')
+        self.name = default_storage.save('products/pagne.png', ContentFile(buffer.getvalue()))
+        artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.product = Product.objects.create(
+            artisan=artisan, name='Pagne', description='d', price=1000, stock=5, category='mode',
+        )
+
+    def test_generate_variants(self):
+        source_width, widths = images.generate_variants(self.name)
+
+        # Pas d'agrandissement : 640 dépasse l'original
+        self.assertEqual(source_width, 400)
+        self.assertEqual(sorted(widths, key=int), ['160', '320'])
+        self.assertEqual(widths['160']['webp'], 'products/variants/pagne_160.webp')
+        with default_storage.open(widths['320']['jpg']) as f, Image.open(f) as variant:
+            self.assertEqual((variant.format, variant.size), ('JPEG', (320, 160)))
+
+    def test_variants_payload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(product=self.product, image=self.name, is_main=True)
+            # Variantes pas encore prêtes : l'original seul
+            self.assertEqual(images.variants_payload(image.image, image.variants)['srcset'], '')
+
+        image.refresh_from_db()
+        self.assertEqual(image.variants['source'], self.name)
+        payload = images.variants_payload(image.image, image.variants)
+        self.assertEqual(payload['srcset'], (
+            '/media/products/variants/pagne_160.webp 160w, '
+            '/media/products/variants/pagne_320.webp 320w, '
+            '/media/products/pagne.png 400w'
+        ))
+        self.assertEqual(payload['jpg'], {
+            160: '/media/products/variants/pagne_160.jpg', 320: '/media/products/variants/pagne_320.jpg',
+        })
+        self.assertEqual(image.srcset, payload['srcset'])
+
+        # Nouvelle image : les anciennes variantes ne sont plus servies
+        image.image = 'products/autre.png'
+        self.assertEqual(images.variants_payload(image.image, image.variants), {'srcset': '', 'webp': {}, 'jpg': {}})
+
+
+
+class ExplainHotQueriesTests(TestCase):
+    """Audit EXPLAIN des requêtes fréquentes, sur la base de test SQLite"""
+
+    def audit(self, *args):
+        out = StringIO()
+        call_command('explain_hot_queries', *args, stdout=out)
+        return out.getvalue()
+
+    def test_registered_queries_use_indexes(self):
+        names = [name for name, _ in explain.registered()]
+        self.assertIn('products.category_listing', names)
+
+        output = self.audit('--strict')
+        for name in names:
+            self.assertIn(f"{name} : OK", output)
+        self.assertIn(f"{len(names)} requête(s) auditée(s), 0 signalée(s)", output)
+
+    def test_full_scan_flagged(self):
+        # Découverte avant le patch : les modules importés ne s'enregistrent qu'une fois
+        explain.registered()
+        queries = {'core.description': lambda: Product.objects.filter(description='d').order_by('name')}
+        with mock.patch.dict(explain._registry, queries):
+            output = self.audit('core.description')
+            self.assertIn("parcours complet de products_product", output)
+            self.assertIn("tri sans index (ORDER BY)", output)
+            with self.assertRaises(CommandError):
+                self.audit('core.description', '--strict')
+
+    def test_unknown_name(self):
+        with self.assertRaises(CommandError):
+            self.audit('inconnue')
+
+    def test_problems(self):
+        self.assertEqual(explain.problems('SCAN products_product USING INDEX product_idx', 'sqlite'), [])
+        self.assertEqual(
+            explain.problems('Seq Scan on orders_order  (cost=0.00..1.01 rows=1)', 'postgresql'),
+            ["parcours complet de orders_order"],
+        )
+
+
+class CursorPaginationTests(TestCase):
+    """Curseur sur tout le tri : les ex aequo de date sont départagés par l'id"""
+
+    def setUp(self):
+        artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.ids = [
+            Product.objects.create(
+                artisan=artisan, name=f'Panier {index}', description='d', price=1000, stock=5, category='other',
+            ).pk
+            for index in range(7)
+        ]
+        # Import groupé : même date de création
+        Product.objects.update(created_at=timezone.now())
+
+    def page(self, url):
+        pagination = CursorPagination()
+        with CaptureQueriesContext(connections['default']) as queries:
+            page = pagination.paginate_queryset(Product.objects.all(), Request(RequestFactory().get(url)))
+        self.assertFalse([q for q in queries if 'OFFSET' in q['sql']])
+        return [product.pk for product in page], pagination
+
+    def test_ties_without_offset(self):
+        url, pages = '/api/products/?page_size=2', []
+        while url:
+            ids, pagination = self.page(url)
+            pages.append(ids)
+            url = pagination.get_next_link()
+            if url:
+                self.assertEqual(pagination.decode_cursor(Request(RequestFactory().get(url))).offset, 0)
+        self.assertEqual([pk for ids in pages for pk in ids], sorted(self.ids, reverse=True))
+
+        url, backwards = pagination.get_previous_link(), [pages[-1]]
+        while url:
+            ids, pagination = self.page(url)
+            backwards.insert(0, ids)
+            url = pagination.get_previous_link()
+        self.assertEqual(backwards, pages)
+
+    def test_malformed_cursor(self):
+        pagination = CursorPagination()
+        pagination.base_url = 'http://testserver/api/products/'
+        # Position d'un seul champ (format de DRF) : page vide plutôt qu'une erreur
+        url = pagination.encode_cursor(Cursor(offset=0, reverse=False, position='2026-01-01T00:00:00'))
+        ids, _ = self.page(url)
+        self.assertEqual(ids, [])
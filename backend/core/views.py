@@ -0,0 +1,80 @@
+# core/views.py
+"""
+Service des fichiers MEDIA avec prise en charge des requêtes Range
+(HTTP 206) : un lecteur vidéo peut commencer la lecture ou se déplacer
+sans télécharger le fichier entier.
+
+Utilisé par config/urls.py en développement ; en production le serveur
+web (nginx, ...) sert MEDIA_ROOT directement avec le même comportement.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+# Types des playlists et segments HLS (products.video)
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+mimetypes.add_type('video/mp2t', '.ts')
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def serve_media(request, path, document_root=None):
+    try:
+        full_path = safe_join(document_root or settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Fichier introuvable")
+    if not os.path.isfile(full_path):
+        raise Http404("Fichier introuvable")
+
+    stat = os.stat(full_path)
+    size = stat.st_size
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if if_modified_since and int(stat.st_mtime) <= if_modified_since:
+        return HttpResponseNotModified()
+
+    match = RANGE_RE.match(request.headers.get('Range', '').strip())
+    if match and (match.group(1) or match.group(2)):
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # bytes=-N : les N derniers octets
+            start = max(size - int(last), 0)
+            end = size - 1
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+        length = end - start + 1
+        response = StreamingHttpResponse(read_range(full_path, start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Length'] = str(length)
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
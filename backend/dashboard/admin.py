@@ -1,3 +1,25 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ArtisanCustomerStats, ArtisanDailySales, ArtisanProductDailySales
+
+
+@admin.register(ArtisanDailySales)
+class ArtisanDailySalesAdmin(admin.ModelAdmin):
+    list_display = ['artisan', 'day', 'order_count', 'units', 'revenue']
+    list_filter = ['day']
+    search_fields = ['artisan__username']
+    date_hierarchy = 'day'
+
+
+@admin.register(ArtisanProductDailySales)
+class ArtisanProductDailySalesAdmin(admin.ModelAdmin):
+    list_display = ['product', 'artisan', 'day', 'units', 'revenue']
+    list_filter = ['day']
+    search_fields = ['product__name', 'artisan__username']
+    date_hierarchy = 'day'
+
+
+@admin.register(ArtisanCustomerStats)
+class ArtisanCustomerStatsAdmin(admin.ModelAdmin):
+    list_display = ['customer', 'artisan', 'order_count', 'total_spent', 'first_order_at', 'last_order_at']
+    search_fields = ['customer__username', 'artisan__username']
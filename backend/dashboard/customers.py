@@ -0,0 +1,290 @@
+# dashboard/customers.py
+"""
+Statistiques des clients par artisan (ArtisanCustomerStats).
+
+Une commande compte pour ses artisans dès qu'elle est payée et tant
+qu'elle n'est ni annulée ni remboursée (PAID_STATUSES). Les compteurs
+sont mis à jour de façon incrémentale depuis les signaux
+orders.signals, à partir des sous-commandes (ArtisanOrder) : le montant
+est la part de l'artisan, pas le total de la commande.
+
+La liste des clients lit une page de cette table sur l'index du tri
+choisi (pagination par curseur), sans jointure sur les commandes ni
+COUNT ; l'export CSV la parcourt par blocs.
+"""
+import csv
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from core.pagination import CursorPagination
+from core.streaming import Echo, batches
+from orders.models import ArtisanOrder, Order
+from users.models import User
+from .models import ArtisanCustomerStats
+
+logger = logging.getLogger(__name__)
+
+# Payée, pas annulée ni remboursée
+PAID_STATUSES = Order.PROGRESS[Order.PROGRESS.index(Order.Status.PAID):]
+# ?sort= de la liste des clients -> tri (un index par tri, voir le modèle)
+# Clé finale unique par artisan et stable (rebuild recrée les lignes)
+SORTS = {
+    'recent': ('-last_order_at', '-customer_id'),
+    'spent': ('-total_spent', '-customer_id'),
+    'orders': ('-order_count', '-customer_id'),
+    'first': ('first_order_at', 'customer_id'),
+}
+DEFAULT_SORT = 'recent'
+# Liste des acheteurs (administrateur)
+BUYERS_ORDERING = ('-date_joined', '-id')
+EXPORT_CHUNK_SIZE = 500
+EXPORT_COLUMNS = (
+    'id', 'username', 'first_name', 'last_name', 'email', 'phone',
+    'orders', 'total_spent', 'first_order', 'last_order',
+)
+
+
+def is_paid(status):
+    return status in PAID_STATUSES
+
+
+class CustomerStatsPagination(CursorPagination):
+    page_size = 20
+
+    def __init__(self, ordering=SORTS[DEFAULT_SORT]):
+        self.ordering = ordering
+
+
+class CustomerStatsService:
+
+    @classmethod
+    def record_order(cls, order):
+        """Nouvelle commande (sous-commandes déjà créées)"""
+        if is_paid(order.status):
+            cls.apply([order.pk], 1)
+
+    @classmethod
+    def apply_transitions(cls, transitions):
+        """transitions = {order_id: (ancien statut, nouveau statut)}"""
+        added = [pk for pk, (old, new) in transitions.items() if not is_paid(old) and is_paid(new)]
+        removed = [pk for pk, (old, new) in transitions.items() if is_paid(old) and not is_paid(new)]
+        if added:
+            cls.apply(added, 1)
+        if removed:
+            cls.apply(removed, -1)
+
+    @classmethod
+    def _slices(cls, order_ids):
+        """Découpe les commandes par (artisan, client)"""
+        rows = ArtisanOrder.objects.filter(order_id__in=order_ids).values_list(
+            'artisan_id', 'order__buyer_id', 'created_at', 'subtotal'
+        )
+        pairs = {}
+        for artisan_id, customer_id, created_at, subtotal in rows:
+            entry = pairs.setdefault(
+                (artisan_id, customer_id), {'orders': 0, 'spent': 0, 'first': created_at, 'last': created_at}
+            )
+            entry['orders'] += 1
+            entry['spent'] += subtotal
+            entry['first'] = min(entry['first'], created_at)
+            entry['last'] = max(entry['last'], created_at)
+        return pairs
+
+    @classmethod
+    @transaction.atomic
+    def apply(cls, order_ids, sign):
+        """Ajoute (sign=1) ou retire (sign=-1) des commandes des statistiques"""
+        pairs = cls._slices(order_ids)
+        for (artisan_id, customer_id), entry in pairs.items():
+            if sign > 0:
+                cls._add(artisan_id, customer_id, entry)
+            else:
+                ArtisanCustomerStats.objects.filter(artisan_id=artisan_id, customer_id=customer_id).update(
+                    order_count=F('order_count') - entry['orders'],
+                    total_spent=F('total_spent') - entry['spent'],
+                )
+        if sign < 0 and pairs:
+            # Plus aucune commande payée : le client sort de la liste de l'artisan
+            ArtisanCustomerStats.objects.filter(cls._pairs_filter(pairs, 'customer_id'), order_count__lte=0).delete()
+            cls._refresh_dates(pairs)
+
+    @classmethod
+    def _pairs_filter(cls, pairs, customer_field):
+        condition = Q()
+        for artisan_id, customer_id in pairs:
+            condition |= Q(artisan_id=artisan_id, **{customer_field: customer_id})
+        return condition
+
+    @classmethod
+    def _add(cls, artisan_id, customer_id, entry):
+        """UPDATE ... SET x = x + delta, ou INSERT si la ligne n'existe pas encore"""
+        keys = {'artisan_id': artisan_id, 'customer_id': customer_id}
+        changes = {
+            'order_count': F('order_count') + entry['orders'],
+            'total_spent': F('total_spent') + entry['spent'],
+            'first_order_at': Least(Coalesce('first_order_at', Value(entry['first'])), Value(entry['first'])),
+            'last_order_at': Greatest(Coalesce('last_order_at', Value(entry['last'])), Value(entry['last'])),
+        }
+        if ArtisanCustomerStats.objects.filter(**keys).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                ArtisanCustomerStats.objects.create(
+                    **keys,
+                    order_count=entry['orders'],
+                    total_spent=entry['spent'],
+                    first_order_at=entry['first'],
+                    last_order_at=entry['last'],
+                )
+        except IntegrityError:
+            # Créée entre-temps par une autre transaction
+            ArtisanCustomerStats.objects.filter(**keys).update(**changes)
+
+    @classmethod
+    def _refresh_dates(cls, pairs):
+        """
+        Première et dernière commande des couples dont des commandes ont été
+        retirées (un minimum ne se décrémente pas) : une requête groupée.
+        """
+        dates = {
+            (row['artisan_id'], row['order__buyer_id']): (row['first'], row['last'])
+            for row in ArtisanOrder.objects.filter(cls._pairs_filter(pairs, 'order__buyer_id'), order__status__in=PAID_STATUSES)
+            .values('artisan_id', 'order__buyer_id')
+            .annotate(first=Min('created_at'), last=Max('created_at'))
+            .order_by()
+        }
+        for (artisan_id, customer_id), (first, last) in dates.items():
+            ArtisanCustomerStats.objects.filter(artisan_id=artisan_id, customer_id=customer_id).update(
+                first_order_at=first, last_order_at=last,
+            )
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls, artisan_ids=None):
+        """Recalcule les statistiques depuis les sous-commandes (GROUP BY en base)"""
+        parts = ArtisanOrder.objects.filter(order__status__in=PAID_STATUSES)
+        stats = ArtisanCustomerStats.objects.all()
+        if artisan_ids is not None:
+            parts = parts.filter(artisan_id__in=artisan_ids)
+            stats = stats.filter(artisan_id__in=artisan_ids)
+        stats.delete()
+
+        ArtisanCustomerStats.objects.bulk_create(
+            (
+                ArtisanCustomerStats(
+                    artisan_id=row['artisan_id'],
+                    customer_id=row['order__buyer_id'],
+                    order_count=row['order_count'],
+                    total_spent=row['total_spent'],
+                    first_order_at=row['first_order_at'],
+                    last_order_at=row['last_order_at'],
+                )
+                for row in parts.values('artisan_id', 'order__buyer_id').annotate(
+                    order_count=Count('id'),
+                    total_spent=Sum('subtotal'),
+                    first_order_at=Min('created_at'),
+                    last_order_at=Max('created_at'),
+                ).order_by()
+            ),
+            batch_size=1000,
+        )
+        logger.info("Statistiques clients reconstruites")
+
+    # Lecture (tableau de bord)
+
+    @classmethod
+    def queryset_for(cls, artisan):
+        """Clients de l'artisan (au moins une commande payée)"""
+        return ArtisanCustomerStats.objects.filter(artisan=artisan).select_related('customer')
+
+    @classmethod
+    def totals_by_customer(cls, customer_ids):
+        """{client: (commandes, montant, dernière commande)} tous artisans confondus"""
+        rows = (
+            ArtisanCustomerStats.objects.filter(customer_id__in=customer_ids)
+            .values('customer_id')
+            .annotate(orders=Sum('order_count'), spent=Sum('total_spent'), last=Max('last_order_at'))
+            .order_by()
+        )
+        return {row['customer_id']: (row['orders'], row['spent'], row['last']) for row in rows}
+
+    @classmethod
+    def customers(cls, stats):
+        """
+        Clients des lignes `stats` (select_related('customer')), avec les
+        attributs attendus par le gabarit (total_orders, total_spent,
+        last_order_date).
+        """
+        customers = []
+        for row in stats:
+            customer = row.customer
+            customer.total_orders = row.order_count
+            customer.total_spent = row.total_spent
+            customer.first_order_date = row.first_order_at
+            customer.last_order_date = row.last_order_at
+            customers.append(customer)
+        return customers
+
+    @classmethod
+    def with_totals(cls, customers):
+        """Mêmes attributs pour des clients (vue administrateur), une requête groupée"""
+        customers = list(customers)
+        totals = cls.totals_by_customer([customer.pk for customer in customers])
+        for customer in customers:
+            customer.total_orders, customer.total_spent, customer.last_order_date = totals.get(customer.pk, (0, 0, None))
+        return customers
+
+    @classmethod
+    def export_rows(cls, artisan=None, sort=DEFAULT_SORT):
+        """
+        Lignes de l'export : clients de l'artisan dans l'ordre du tri, ou
+        tous les acheteurs et leurs totaux (administrateur), par blocs.
+        """
+        if artisan is not None:
+            stats = cls.queryset_for(artisan).order_by(*SORTS[sort])
+            for row in stats.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                yield cls._export_row(row.customer, row.order_count, row.total_spent, row.first_order_at, row.last_order_at)
+            return
+
+        buyers = User.objects.filter(role=User.Role.BUYER).order_by('pk')
+        totals = (
+            ArtisanCustomerStats.objects.values('customer_id')
+            .annotate(
+                orders=Sum('order_count'), spent=Sum('total_spent'),
+                first=Min('first_order_at'), last=Max('last_order_at'),
+            )
+            .order_by()
+        )
+        for chunk in batches(buyers.iterator(chunk_size=EXPORT_CHUNK_SIZE), EXPORT_CHUNK_SIZE):
+            by_customer = {row['customer_id']: row for row in totals.filter(customer_id__in=[buyer.pk for buyer in chunk])}
+            for buyer in chunk:
+                row = by_customer.get(buyer.pk, {})
+                yield cls._export_row(
+                    buyer, row.get('orders', 0), row.get('spent', 0), row.get('first'), row.get('last'),
+                )
+
+    @classmethod
+    def _export_row(cls, customer, orders, spent, first, last):
+        return {
+            'id': customer.pk,
+            'username': customer.username,
+            'first_name': customer.first_name,
+            'last_name': customer.last_name,
+            'email': customer.email,
+            'phone': customer.phone or '',
+            'orders': orders,
+            'total_spent': spent,
+            'first_order': first.isoformat() if first else '',
+            'last_order': last.isoformat() if last else '',
+        }
+
+    @classmethod
+    def stream_csv(cls, rows):
+        """Morceaux de texte du CSV, client par client"""
+        writer = csv.DictWriter(Echo(), fieldnames=EXPORT_COLUMNS)
+        yield writer.writeheader()
+        for row in rows:
+            yield writer.writerow(row)
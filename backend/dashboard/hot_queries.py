@@ -0,0 +1,15 @@
+# dashboard/hot_queries.py
+"""Requêtes fréquentes du tableau de bord (commande explain_hot_queries)"""
+from core.explain import hot_query
+from .customers import SORTS, CustomerStatsService
+from users.models import User
+
+
+@hot_query('dashboard.customers_by_spend')
+def customers_by_spend():
+    return CustomerStatsService.queryset_for(User(pk=1)).order_by(*SORTS['spent'])[:21]
+
+
+@hot_query('dashboard.customers_recent')
+def customers_recent():
+    return CustomerStatsService.queryset_for(User(pk=1)).order_by(*SORTS['recent'])[:21]
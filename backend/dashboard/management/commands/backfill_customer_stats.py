@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.customers import CustomerStatsService
+from dashboard.models import ArtisanCustomerStats
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les statistiques clients des artisans depuis l'historique des commandes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--artisan', type=int, action='append', dest='artisans',
+            help="Limiter à cet artisan (id, option répétable)",
+        )
+
+    def handle(self, *args, **options):
+        CustomerStatsService.rebuild(artisan_ids=options['artisans'])
+        rows = ArtisanCustomerStats.objects.all()
+        if options['artisans']:
+            rows = rows.filter(artisan_id__in=options['artisans'])
+        self.stdout.write(self.style.SUCCESS(f"{rows.count()} couple(s) artisan / client reconstruit(s)"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.models import ArtisanDailySales
+from dashboard.rollups import SalesRollupService
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les agrégats de ventes quotidiens des artisans depuis l'historique des commandes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--artisan', type=int, action='append', dest='artisans',
+            help="Limiter à cet artisan (id, option répétable)",
+        )
+
+    def handle(self, *args, **options):
+        SalesRollupService.rebuild(artisan_ids=options['artisans'])
+        rows = ArtisanDailySales.objects.all()
+        if options['artisans']:
+            rows = rows.filter(artisan_id__in=options['artisans'])
+        self.stdout.write(self.style.SUCCESS(f"{rows.count()} jour(s) d'agrégats reconstruits"))
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtisanCustomerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_count', models.IntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('first_order_at', models.DateTimeField(blank=True, null=True)),
+                ('last_order_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('artisan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='customer_stats', to=settings.AUTH_USER_MODEL)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artisan_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['artisan', '-last_order_at', '-id'], name='customer_stats_recent_idx'), models.Index(fields=['artisan', '-total_spent', '-id'], name='customer_stats_spent_idx'), models.Index(fields=['artisan', '-order_count', '-id'], name='customer_stats_orders_idx'), models.Index(fields=['artisan', 'first_order_at', 'id'], name='customer_stats_first_idx')],
+                'constraints': [models.UniqueConstraint(fields=('artisan', 'customer'), name='unique_artisan_customer_stats')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_artisan_customer_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='artisancustomerstats',
+            name='customer_stats_recent_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='artisancustomerstats',
+            name='customer_stats_spent_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='artisancustomerstats',
+            name='customer_stats_orders_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='artisancustomerstats',
+            name='customer_stats_first_idx',
+        ),
+        migrations.AddIndex(
+            model_name='artisancustomerstats',
+            index=models.Index(fields=['artisan', '-last_order_at', '-customer'], name='customer_stats_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artisancustomerstats',
+            index=models.Index(fields=['artisan', '-total_spent', '-customer'], name='customer_stats_spent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artisancustomerstats',
+            index=models.Index(fields=['artisan', '-order_count', '-customer'], name='customer_stats_orders_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artisancustomerstats',
+            index=models.Index(fields=['artisan', 'first_order_at', 'customer'], name='customer_stats_first_idx'),
+        ),
+    ]
@@ -1,3 +1,75 @@
 from django.db import models
+from django.conf import settings
 
-# Create your models here.
+
+class ArtisanDailySales(models.Model):
+    """
+    Agrégat quotidien des ventes d'un artisan (jour de la commande).
+    Maintenu de façon incrémentale par dashboard.rollups ; reconstruit
+    par la commande backfill_sales_rollups.
+    """
+    artisan = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    order_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['artisan', 'day'], name='unique_artisan_day_sales'),
+        ]
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.artisan} - {self.day}: {self.order_count} commande(s)"
+
+
+class ArtisanProductDailySales(models.Model):
+    """Ventes quotidiennes par produit (unités et chiffre d'affaires)"""
+    artisan = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='product_daily_sales')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['artisan', 'product', 'day'], name='unique_artisan_product_day'),
+        ]
+        indexes = [
+            models.Index(fields=['artisan', 'day'], name='product_sales_artisan_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} - {self.day}: {self.units} unité(s)"
+
+
+class ArtisanCustomerStats(models.Model):
+    """
+    Achats d'un client chez un artisan : commandes payées, montant (part
+    de l'artisan), première et dernière commande. Maintenu de façon
+    incrémentale par dashboard.customers ; reconstruit par la commande
+    backfill_customer_stats.
+    """
+    artisan = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='customer_stats')
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='artisan_stats')
+    order_count = models.IntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    first_order_at = models.DateTimeField(null=True, blank=True)
+    last_order_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['artisan', 'customer'], name='unique_artisan_customer_stats'),
+        ]
+        # Un index par tri de la liste des clients (dashboard.customers.SORTS)
+        indexes = [
+            models.Index(fields=['artisan', '-last_order_at', '-customer'], name='customer_stats_recent_idx'),
+            models.Index(fields=['artisan', '-total_spent', '-customer'], name='customer_stats_spent_idx'),
+            models.Index(fields=['artisan', '-order_count', '-customer'], name='customer_stats_orders_idx'),
+            models.Index(fields=['artisan', 'first_order_at', 'customer'], name='customer_stats_first_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer} chez {self.artisan}: {self.order_count} commande(s)"
@@ -0,0 +1,160 @@
+# dashboard/rollups.py
+"""
+Agrégats de ventes par artisan et par jour.
+
+Les compteurs sont mis à jour de façon incrémentale quand une commande
+est passée ou change de statut (signaux orders.signals) : le tableau de
+bord lit O(jours) lignes au lieu de parcourir l'historique des commandes.
+La mise à jour part après le commit (dashboard.signals) : la ligne
+(artisan, jour) des artisans les plus vendus n'est pas écrite pendant
+que le checkout tient les verrous des produits. Un compteur manqué
+(arrêt du processus entre commit et mise à jour) est rattrapé par
+backfill_sales_rollups.
+
+Une commande compte comme vente dès qu'elle est payée et tant qu'elle
+n'est ni annulée ni remboursée (PAID_STATUSES, comme les statistiques
+clients). Le jour retenu est celui de la création de la commande.
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import OrderItem
+from .customers import PAID_STATUSES
+from .models import ArtisanDailySales, ArtisanProductDailySales
+
+logger = logging.getLogger(__name__)
+
+
+def is_sale(status):
+    return status in PAID_STATUSES
+
+
+class SalesRollupService:
+
+    @classmethod
+    def record_order(cls, order):
+        """Nouvelle commande (lignes déjà créées)"""
+        if is_sale(order.status):
+            cls.apply([order.pk], 1)
+
+    @classmethod
+    def apply_transitions(cls, transitions):
+        """transitions = {order_id: (ancien statut, nouveau statut)}"""
+        added = [pk for pk, (old, new) in transitions.items() if not is_sale(old) and is_sale(new)]
+        removed = [pk for pk, (old, new) in transitions.items() if is_sale(old) and not is_sale(new)]
+        if added:
+            cls.apply(added, 1)
+        if removed:
+            cls.apply(removed, -1)
+
+    @classmethod
+    def _slices(cls, order_ids):
+        """Découpe les commandes par (artisan, jour) et (artisan, produit, jour)"""
+        rows = OrderItem.objects.filter(
+            order_id__in=order_ids, artisan__isnull=False
+        ).values_list('order_id', 'order__created_at', 'product_id', 'artisan_id', 'quantity', 'total')
+
+        daily = {}
+        per_product = {}
+        for order_id, created_at, product_id, artisan_id, quantity, total in rows:
+            day = timezone.localdate(created_at)
+            entry = daily.setdefault((artisan_id, day), {'orders': set(), 'units': 0, 'revenue': 0})
+            entry['orders'].add(order_id)
+            entry['units'] += quantity
+            entry['revenue'] += total
+            if product_id is None:
+                # Produit supprimé depuis : compté dans les ventes de l'artisan seulement
+                continue
+            product_entry = per_product.setdefault((artisan_id, product_id, day), {'units': 0, 'revenue': 0})
+            product_entry['units'] += quantity
+            product_entry['revenue'] += total
+        return daily, per_product
+
+    @classmethod
+    @transaction.atomic
+    def apply(cls, order_ids, sign):
+        """Ajoute (sign=1) ou retire (sign=-1) des commandes des agrégats"""
+        daily, per_product = cls._slices(order_ids)
+        for (artisan_id, day), entry in daily.items():
+            cls._increment(
+                ArtisanDailySales,
+                {'artisan_id': artisan_id, 'day': day},
+                {
+                    'order_count': sign * len(entry['orders']),
+                    'units': sign * entry['units'],
+                    'revenue': sign * entry['revenue'],
+                },
+            )
+        for (artisan_id, product_id, day), entry in per_product.items():
+            cls._increment(
+                ArtisanProductDailySales,
+                {'artisan_id': artisan_id, 'product_id': product_id, 'day': day},
+                {'units': sign * entry['units'], 'revenue': sign * entry['revenue']},
+            )
+
+    @classmethod
+    def _increment(cls, model, keys, deltas):
+        """UPDATE ... SET x = x + delta, ou INSERT si la ligne n'existe pas encore"""
+        changes = {field: F(field) + delta for field, delta in deltas.items()}
+        if model.objects.filter(**keys).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                model.objects.create(**keys, **deltas)
+        except IntegrityError:
+            # Créée entre-temps par une autre transaction
+            model.objects.filter(**keys).update(**changes)
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls, artisan_ids=None):
+        """Recalcule tous les agrégats depuis l'historique (GROUP BY en base)"""
+        items = OrderItem.objects.filter(artisan__isnull=False, order__status__in=PAID_STATUSES)
+        daily = ArtisanDailySales.objects.all()
+        per_product = ArtisanProductDailySales.objects.all()
+        if artisan_ids is not None:
+            items = items.filter(artisan_id__in=artisan_ids)
+            daily = daily.filter(artisan_id__in=artisan_ids)
+            per_product = per_product.filter(artisan_id__in=artisan_ids)
+        daily.delete()
+        per_product.delete()
+
+        items = items.annotate(day=TruncDate('order__created_at'))
+        ArtisanDailySales.objects.bulk_create(
+            (
+                ArtisanDailySales(
+                    artisan_id=row['artisan_id'],
+                    day=row['day'],
+                    order_count=row['order_count'],
+                    units=row['units'],
+                    revenue=row['revenue'],
+                )
+                for row in items.values('artisan_id', 'day').annotate(
+                    order_count=Count('order_id', distinct=True),
+                    units=Sum('quantity'),
+                    revenue=Sum('total'),
+                ).order_by()
+            ),
+            batch_size=1000,
+        )
+        ArtisanProductDailySales.objects.bulk_create(
+            (
+                ArtisanProductDailySales(
+                    artisan_id=row['artisan_id'],
+                    product_id=row['product_id'],
+                    day=row['day'],
+                    units=row['units'],
+                    revenue=row['revenue'],
+                )
+                for row in items.filter(product__isnull=False).values('artisan_id', 'product_id', 'day').annotate(
+                    units=Sum('quantity'),
+                    revenue=Sum('total'),
+                ).order_by()
+            ),
+            batch_size=1000,
+        )
+        logger.info("Agrégats de ventes reconstruits")
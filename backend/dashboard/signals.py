@@ -0,0 +1,21 @@
+# dashboard/signals.py
+from django.db import transaction
+from django.dispatch import receiver
+
+from orders.signals import order_placed, order_status_changed
+from .customers import CustomerStatsService
+from .rollups import SalesRollupService
+
+
+@receiver(order_placed)
+def rollup_new_order(sender, order, **kwargs):
+    # Après le commit : hors des verrous produits du checkout
+    transaction.on_commit(lambda: SalesRollupService.record_order(order))
+    CustomerStatsService.record_order(order)
+
+
+@receiver(order_status_changed)
+def rollup_status_change(sender, transitions, **kwargs):
+    transitions = dict(transitions)
+    transaction.on_commit(lambda: SalesRollupService.apply_transitions(transitions))
+    CustomerStatsService.apply_transitions(transitions)
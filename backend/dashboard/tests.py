@@ -1,3 +1,154 @@
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from rest_framework.request import Request
 
-# Create your tests here.
+from orders.models import ArtisanOrder, Order
+from orders.services import PaymentService
+from products.models import Product
+from users.models import User
+from .customers import SORTS, CustomerStatsPagination
+from .models import ArtisanCustomerStats, ArtisanDailySales
+from .rollups import SalesRollupService
+
+
+class CustomerStatsPaginationTests(TestCase):
+    """Curseur de la liste des clients : ex aequo départagés par le client"""
+
+    def setUp(self):
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        now = timezone.now()
+        customers = [
+            User.objects.create_user(f'client{index}', password='x', role=User.Role.BUYER, phone=f'02{index:02d}')
+            for index in range(7)
+        ]
+        # Même nombre de commandes pour tous sauf un
+        ArtisanCustomerStats.objects.bulk_create(
+            ArtisanCustomerStats(
+                artisan=self.artisan, customer=customer, order_count=3 if index == 4 else 1,
+                total_spent=1000, first_order_at=now, last_order_at=now,
+            )
+            for index, customer in enumerate(customers)
+        )
+        self.customers = customers
+
+    def page(self, sort, url):
+        pagination = CustomerStatsPagination(SORTS[sort])
+        page = pagination.paginate_queryset(
+            ArtisanCustomerStats.objects.filter(artisan=self.artisan), Request(RequestFactory().get(url))
+        )
+        return [row.customer_id for row in page], pagination
+
+    def walk(self, sort):
+        """
+        Ids des clients, page par page (2 par page), en suivant les liens
+        suivants puis, depuis la dernière page, les liens précédents.
+        """
+        url, pages = '/dashboard/customers/?page_size=2', []
+        while url:
+            ids, pagination = self.page(sort, url)
+            pages.append(ids)
+            url = pagination.get_next_link()
+
+        url, backwards = pagination.get_previous_link(), [pages[-1]]
+        while url:
+            ids, pagination = self.page(sort, url)
+            backwards.insert(0, ids)
+            url = pagination.get_previous_link()
+        self.assertEqual(backwards, pages)
+        return [pk for ids in pages for pk in ids]
+
+    def test_ties_paginated_once(self):
+        ids = [customer.pk for customer in self.customers]
+        expected = [ids[4]] + sorted((pk for pk in ids if pk != ids[4]), reverse=True)
+        self.assertEqual(self.walk('orders'), expected)
+        self.assertEqual(self.walk('recent'), sorted(ids, reverse=True))
+        self.assertEqual(self.walk('first'), sorted(ids))
+
+    def test_cursor_without_offset(self):
+        pagination = CustomerStatsPagination(SORTS['orders'])
+        pagination.paginate_queryset(
+            ArtisanCustomerStats.objects.filter(artisan=self.artisan),
+            Request(RequestFactory().get('/dashboard/customers/?page_size=3')),
+        )
+        cursor = pagination.decode_cursor(Request(RequestFactory().get(pagination.get_next_link())))
+        self.assertEqual(cursor.offset, 0)
+
+
+class OrderDetailsTests(TestCase):
+    """Détail d'une commande multi-artisans vu par un artisan : sa part seulement"""
+
+    def setUp(self):
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        other = User.objects.create_user('other', password='x', role=User.Role.ARTISAN, phone='0102')
+        buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        products = [
+            Product.objects.create(artisan=owner, name=name, description='d', price=price, stock=5, category='other')
+            for owner, name, price in ((self.artisan, 'Masque', 1000), (other, 'Panier', 4000))
+        ]
+        self.order = PaymentService.create_order_from_cart(
+            buyer, [{'product_id': product.pk, 'quantity': 1} for product in products], shipping_cost=500,
+        )
+
+    def test_artisan_sees_own_subtotal(self):
+        self.client.force_login(self.artisan)
+        data = self.client.get(f'/dashboard/orders/{self.order.pk}/details/').json()['order']
+        part = ArtisanOrder.objects.get(order=self.order, artisan=self.artisan)
+        self.assertEqual(data['subtotal'], str(part.subtotal))
+        self.assertEqual(data['total_amount'], str(part.subtotal))
+        self.assertEqual(data['shipping_cost'], '0')
+        self.assertEqual([item['product_name'] for item in data['items']], ['Masque'])
+
+
+class SalesRollupTests(TestCase):
+    """Agrégats de ventes : commandes payées seulement, écrits après le commit"""
+
+    def setUp(self):
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.product = Product.objects.create(
+            artisan=self.artisan, name='Masque', description='d', price=1000, stock=5, category='other',
+        )
+
+    def place(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return PaymentService.create_order_from_cart(
+                self.buyer, [{'product_id': self.product.pk, 'quantity': 2}], **fields
+            )
+
+    def set_status(self, order, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = status
+            order.save()
+
+    def sales(self):
+        return list(ArtisanDailySales.objects.values_list('order_count', 'units', 'revenue'))
+
+    def test_pending_order_not_counted(self):
+        order = self.place()
+        self.assertEqual(self.sales(), [])
+
+        self.set_status(order, Order.Status.PAID)
+        self.assertEqual(self.sales(), [(1, 2, 2000)])
+        # Avancement sans effet, annulation retirée
+        self.set_status(order, Order.Status.PREPARING)
+        self.set_status(order, Order.Status.CANCELLED)
+        self.assertEqual(self.sales(), [(0, 0, 0)])
+
+    def test_written_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            PaymentService.create_order_from_cart(
+                self.buyer, [{'product_id': self.product.pk, 'quantity': 1}], status=Order.Status.PAID,
+            )
+            # Pas d'écriture de l'agrégat dans la transaction du checkout
+            self.assertEqual(self.sales(), [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.sales(), [(1, 1, 1000)])
+
+    def test_rebuild_matches_incremental(self):
+        paid = self.place()
+        self.set_status(paid, Order.Status.PAID)
+        self.place()
+        incremental = self.sales()
+        SalesRollupService.rebuild()
+        self.assertEqual(self.sales(), incremental)
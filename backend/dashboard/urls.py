@@ -17,6 +17,7 @@ urlpatterns = [
     path('orders/<int:pk>/add-note/', views.add_note, name='add_note'),
     
     path('customers/', views.customers_list, name='customers'),
+    path('customers/export/', views.export_customers, name='export_customers'),
     path('categories/', views.categories_list, name='categories'),
     path('notifications/', views.notifications_list, name='notifications'),
     path('notifications/<int:pk>/', views.notification_detail, name='notification_detail'),
@@ -2,13 +2,20 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Sum, Count, Q
+from django.db.models import Count, Sum
 from django.utils import timezone
-from datetime import timedelta
-from products.models import Product
-from orders.models import Order, OrderItem
+from datetime import date, datetime, time, timedelta
+from core import cache
+from products.models import CATALOG_CACHE, Product
+from products.search import search_products
+from orders.events import TIMELINE_SIZE, OrderEventService
+from orders.models import ArtisanOrder, Order, OrderEvent
+from orders.transitions import INVALID_TRANSITION, NOT_FOUND, UNCHANGED, UPDATED, OrderStatusService, parse_ids
 from users.models import User
-from django.http import JsonResponse
+from rest_framework.request import Request
+from .customers import BUYERS_ORDERING, DEFAULT_SORT, SORTS, CustomerStatsPagination, CustomerStatsService
+from .models import ArtisanDailySales, ArtisanProductDailySales
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 
@@ -23,6 +30,34 @@ def artisan_required(view_func):
     return wrapper
 
 
+def with_artisan_parts(parts):
+    """
+    Commandes des sous-commandes `parts` (select_related('order')), chacune
+    avec sa part dans order.artisan_part : les gabarits affichent le statut
+    et le sous-total de l'artisan plutôt que ceux de la commande entière.
+    """
+    orders = []
+    for part in parts:
+        part.order.artisan_part = part
+        orders.append(part.order)
+    return orders
+
+
+def event_author(event):
+    if event.author is None:
+        return 'Système'
+    return event.author.get_full_name() or event.author.username
+
+
+def day_start(value):
+    """Début de la journée 'AAAA-MM-JJ' (fuseau courant), None si vide ou invalide"""
+    try:
+        day = date.fromisoformat(value or '')
+    except ValueError:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
 @login_required
 @artisan_required
 def dashboard_home(request):
@@ -32,40 +67,60 @@ def dashboard_home(request):
     last_month = today - timedelta(days=30)
     previous_month = last_month - timedelta(days=30)
     
-    # Statistiques actuelles
+    # Statistiques lues dans les agrégats quotidiens (dashboard.rollups)
     if user.role == 'admin':
         orders = Order.objects.all()
         products = Product.objects.all()
+        daily_sales = ArtisanDailySales.objects.all()
+        product_sales = ArtisanProductDailySales.objects.all()
     else:
-        orders = Order.objects.filter(items__product__artisan=user).distinct()
+        orders = Order.objects.filter(artisan_orders__artisan=user)
         products = Product.objects.filter(artisan=user)
-    
-    current_orders = orders.filter(created_at__gte=last_month)
-    previous_orders = orders.filter(created_at__gte=previous_month, created_at__lt=last_month)
-    
+        daily_sales = ArtisanDailySales.objects.filter(artisan=user)
+        product_sales = ArtisanProductDailySales.objects.filter(artisan=user)
+
+    current = daily_sales.filter(day__gt=timezone.localdate(last_month)).aggregate(
+        orders=Sum('order_count'), revenue=Sum('revenue'),
+    )
+    previous = daily_sales.filter(
+        day__gt=timezone.localdate(previous_month), day__lte=timezone.localdate(last_month),
+    ).aggregate(orders=Sum('order_count'), revenue=Sum('revenue'))
+
     # Calcul des statistiques
     stats = {
-        'total_orders': current_orders.count(),
-        'total_revenue': current_orders.aggregate(total=Sum('total_amount'))['total'] or 0,
+        'total_orders': current['orders'] or 0,
+        'total_revenue': current['revenue'] or 0,
         'new_customers': User.objects.filter(role='buyer', date_joined__gte=last_month).count(),
         'total_products': products.count(),
     }
-    
+
     # Calcul des variations
-    prev_orders_count = previous_orders.count()
-    prev_revenue = previous_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-    
+    prev_orders_count = previous['orders'] or 0
+    prev_revenue = previous['revenue'] or 0
+
     stats['orders_change'] = ((stats['total_orders'] - prev_orders_count) / max(prev_orders_count, 1)) * 100
     stats['revenue_change'] = ((stats['total_revenue'] - prev_revenue) / max(prev_revenue, 1)) * 100
-    
-    # Dernières commandes
-    recent_orders = orders.order_by('-created_at')[:5]
-    
-    # Produits les plus vendus
-    top_products = products.annotate(
-        sales_count=Count('orderitem')
-    ).order_by('-sales_count')[:5]
-    
+
+    # Dernières commandes (pour un artisan : ses sous-commandes)
+    if user.role == 'admin':
+        recent_orders = orders.select_related('buyer').prefetch_related('items').order_by('-created_at')[:5]
+    else:
+        recent_orders = with_artisan_parts(
+            ArtisanOrder.objects.filter(artisan=user).select_related('order__buyer').order_by('-created_at', '-id')[:5]
+        )
+
+    # Produits les plus vendus (unités cumulées)
+    best_sellers = list(
+        product_sales.values('product_id').annotate(sales_count=Sum('units')).order_by('-sales_count')[:5]
+    )
+    products_by_id = products.in_bulk([row['product_id'] for row in best_sellers])
+    top_products = []
+    for row in best_sellers:
+        product = products_by_id.get(row['product_id'])
+        if product is not None:
+            product.sales_count = row['sales_count']
+            top_products.append(product)
+
     context = {
         'stats': stats,
         'recent_orders': recent_orders,
@@ -82,17 +137,16 @@ def products_list(request):
         products = Product.objects.all()
     else:
         products = Product.objects.filter(artisan=request.user)
+    products = products.prefetch_related('images')
     
     # Filtres
     search = request.GET.get('q')
     category = request.GET.get('category')
     
-    if search:
-        products = products.filter(
-            Q(name__icontains=search) | Q(description__icontains=search)
-        )
     if category:
         products = products.filter(category=category)
+    if search:
+        products = search_products(products, search)
     
     # Pagination
     paginator = Paginator(products, 10)
@@ -114,9 +168,13 @@ def products_list(request):
 def orders_list(request):
     """Liste des commandes"""
     if request.user.role == 'admin':
-        orders = Order.objects.all()
+        orders = Order.objects.order_by('-created_at')
     else:
-        orders = Order.objects.filter(items__product__artisan=request.user).distinct()
+        # Sous-commandes de l'artisan (statut et sous-total de sa part),
+        # index (artisan, status, created_at, id) de ArtisanOrder
+        orders = ArtisanOrder.objects.filter(artisan=request.user).select_related('order__buyer').order_by(
+            '-created_at', '-id'
+        )
     
     # Filtres
     status = request.GET.get('status')
@@ -125,17 +183,20 @@ def orders_list(request):
     
     if status:
         orders = orders.filter(status=status)
-    if date_from:
-        orders = orders.filter(created_at__date__gte=date_from)
-    if date_to:
-        orders = orders.filter(created_at__date__lte=date_to)
-    
-    orders = orders.order_by('-created_at')
+    # Bornes en datetime (created_at__date n'utilise pas l'index)
+    start = day_start(date_from)
+    end = day_start(date_to)
+    if start:
+        orders = orders.filter(created_at__gte=start)
+    if end:
+        orders = orders.filter(created_at__lt=end + timedelta(days=1))
     
     # Pagination
     paginator = Paginator(orders, 10)
     page = request.GET.get('page')
     orders = paginator.get_page(page)
+    if request.user.role != 'admin':
+        orders.object_list = with_artisan_parts(orders.object_list)
     
     # Get choices for template
     order_status_choices = Order.Status.choices
@@ -153,40 +214,55 @@ def orders_list(request):
 @login_required
 @artisan_required
 def customers_list(request):
-    """Liste des clients"""
+    """
+    Liste des clients, lue dans les statistiques tenues à jour
+    (dashboard.customers) : une page sur l'index du tri, sans COUNT.
+    """
+    sort = request.GET.get('sort') if request.GET.get('sort') in SORTS else DEFAULT_SORT
     if request.user.role == 'admin':
-        customers = User.objects.filter(role='buyer')
+        # Tous les acheteurs ; totaux de la page en une requête groupée
+        pagination = CustomerStatsPagination(BUYERS_ORDERING)
+        page = pagination.paginate_queryset(User.objects.filter(role='buyer'), Request(request))
+        customers = CustomerStatsService.with_totals(page)
     else:
-        # Clients qui ont acheté des produits de cet artisan
-        customers = User.objects.filter(
-            orders__items__product__artisan=request.user
-        ).distinct()
-    
-    # Annoter avec les statistiques
-    customers = customers.annotate(
-        total_orders=Count('orders'),
-        total_spent=Sum('orders__total_amount')
-    )
-    
-    # Pagination
-    paginator = Paginator(customers, 10)
-    page = request.GET.get('page')
-    customers = paginator.get_page(page)
-    
+        pagination = CustomerStatsPagination(SORTS[sort])
+        page = pagination.paginate_queryset(CustomerStatsService.queryset_for(request.user), Request(request))
+        customers = CustomerStatsService.customers(page)
+
     context = {
         'customers': customers,
+        'current_sort': sort,
+        'next_url': pagination.get_next_link(),
+        'previous_url': pagination.get_previous_link(),
     }
     return render(request, 'dashboard/customer.html', context)
 
 
+@login_required
+@artisan_required
+def export_customers(request):
+    """GET ?sort= : CSV des clients (mêmes statistiques que la liste), en flux"""
+    sort = request.GET.get('sort') if request.GET.get('sort') in SORTS else DEFAULT_SORT
+    artisan = None if request.user.role == 'admin' else request.user
+    response = StreamingHttpResponse(
+        CustomerStatsService.stream_csv(CustomerStatsService.export_rows(artisan, sort)),
+        content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'attachment; filename="clients.csv"'
+    return response
+
+
 @login_required
 @artisan_required
 def categories_list(request):
     """Liste des catégories"""
     # Récupérer les catégories uniques avec le nombre de produits
-    categories = Product.objects.values('category').annotate(
-        product_count=Count('id')
-    ).order_by('category')
+    categories = cache.get_or_set(
+        CATALOG_CACHE, 'categories:counts',
+        lambda: list(Product.objects.values('category').annotate(
+            product_count=Count('id')
+        ).order_by('category')),
+    )
     
     context = {
         'categories': categories,
@@ -243,12 +319,35 @@ def change_order_status(request):
     order_id = request.POST.get('order_id')
     status = request.POST.get('status')
     
+    if request.user.role != 'admin':
+        # Un artisan ne fait avancer que sa part de la commande
+        return change_artisan_order_status(request, order_id, status)
+
     order = get_object_or_404(Order, id=order_id)
     order.status = status
+    order.changed_by = request.user
     order.save()
     
     return JsonResponse({'success': True, 'status_display': order.get_status_display()})
 
+
+def change_artisan_order_status(request, order_id, status):
+    part = get_object_or_404(ArtisanOrder, artisan=request.user, order_id=order_id)
+    try:
+        outcome = OrderStatusService.batch_update_artisan(
+            request.user, [part.order_id], status=status, author=request.user
+        )[part.order_id]
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    if outcome == INVALID_TRANSITION:
+        return JsonResponse({
+            'success': False,
+            'error': f"Transition impossible depuis le statut '{part.get_status_display()}'",
+        }, status=400)
+
+    part.refresh_from_db(fields=['status'])
+    return JsonResponse({'success': True, 'status_display': part.get_status_display()})
+
 @login_required
 @artisan_required
 @require_POST
@@ -266,29 +365,55 @@ def change_payment_status(request):
     
     return JsonResponse({'success': True, 'payment_status_display': order.get_payment_status_display()})
 
+def order_amounts(order, part=None):
+    """Montants affichés : ceux de la commande, ou la part de l'artisan (ses lignes seulement)"""
+    if part is not None:
+        return {'subtotal': str(part.subtotal), 'tax_amount': '0', 'shipping_cost': '0', 'total_amount': str(part.subtotal)}
+    return {
+        'subtotal': str(order.subtotal),
+        'tax_amount': str(order.tax_amount),
+        'shipping_cost': str(order.shipping_cost),
+        'total_amount': str(order.total_amount),
+    }
+
 @login_required
 @artisan_required
 def get_order_details(request, pk):
-    order = get_object_or_404(Order, pk=pk)
+    order = get_object_or_404(Order.objects.select_related('buyer'), pk=pk)
+    items = order.items.select_related('product').prefetch_related('product__images')
+    # Un artisan ne voit que sa part : ses lignes, son statut
+    part = None
+    if request.user.role != 'admin':
+        part = get_object_or_404(ArtisanOrder, artisan=request.user, order=order)
+        items = items.filter(artisan=request.user)
     
     items_data = []
-    for item in order.items.all():
+    for item in items:
+        main_image = item.product.main_image if item.product else None
         items_data.append({
             'product_name': item.product_name,
             'product_sku': item.product_sku,
-            'product_image': item.product.images.first().image.url if item.product and item.product.images.exists() else None,
+            'product_image': main_image.image.url if main_image else None,
             'unit_price': str(item.price),
             'quantity': item.quantity,
             'total_price': str(item.total),
         })
     
-    # Format notes
-    notes = []
+    # Historique (orders.events) : une requête sur l'index (order, created_at, id)
+    events = list(OrderEventService.timeline(order)[:TIMELINE_SIZE])
+    notes = [
+        {
+            'user': event_author(event),
+            'created_at': timezone.localtime(event.created_at).strftime("%d %b %Y %H:%M"),
+            'note': event.message,
+        }
+        for event in events if event.kind == OrderEvent.Kind.NOTE
+    ]
     if order.note:
-        # Assuming notes are just text for now, but JS expects structured
+        # Note laissée à la commande (et anciennes notes concaténées)
         notes.append({
             'user': 'Système/Admin',
-            'created_at': order.updated_at.strftime("%d %b %Y %H:%M"),
+            'created_at': order.created_at.strftime("%d %b %Y %H:%M"),
             'note': order.note
         })
 
@@ -297,8 +422,10 @@ def get_order_details(request, pk):
         'order': {
             'id': order.id,
             'order_number': order.order_number,
-            'status': order.status,
-            'status_display': order.get_status_display(),
+            'status': (part or order).status,
+            'status_display': (part or order).get_status_display(),
+            'order_status': order.status,
+            'order_status_display': order.get_status_display(),
             'created_at': order.created_at.strftime("%d %b %Y %H:%M"),
             'payment_method': order.payment_method,
             'payment_method_display': order.get_payment_method_display(),
@@ -306,10 +433,7 @@ def get_order_details(request, pk):
             'payment_status_display': order.get_payment_status_display(),
             'tracking_number': order.tracking_number,
             'estimated_delivery_date': order.estimated_delivery_date.strftime("%d %b %Y") if order.estimated_delivery_date else None,
-            'subtotal': str(order.subtotal),
-            'tax_amount': str(order.tax_amount),
-            'shipping_cost': str(order.shipping_cost),
-            'total_amount': str(order.total_amount),
+            **order_amounts(order, part),
             'shipping_address': order.shipping_address_text,
             'billing_address': order.shipping_address_text,
             'customer': {
@@ -321,6 +445,18 @@ def get_order_details(request, pk):
             },
             'items': items_data,
             'notes': notes,
+            'events': [
+                {
+                    'kind': event.kind,
+                    'kind_display': event.get_kind_display(),
+                    'user': event_author(event),
+                    'created_at': timezone.localtime(event.created_at).strftime("%d %b %Y %H:%M"),
+                    'old_status': event.old_status,
+                    'new_status': event.new_status,
+                    'message': event.message,
+                }
+                for event in events
+            ],
         }
     }
     return JsonResponse(data)
@@ -332,7 +468,8 @@ def update_tracking(request, pk):
     order = get_object_or_404(Order, pk=pk)
     tracking_number = request.POST.get('tracking_number')
     order.tracking_number = tracking_number
-    order.save()
+    order.save(update_fields=['tracking_number', 'updated_at'])
+    OrderEventService.record_tracking(order, tracking_number, author=request.user)
     return JsonResponse({'success': True})
 
 @login_required
@@ -340,16 +477,12 @@ def update_tracking(request, pk):
 @require_POST
 def add_note(request, pk):
     order = get_object_or_404(Order, pk=pk)
-    note_text = request.POST.get('note_text')
-    
-    timestamp = timezone.now().strftime("%Y-%m-%d %H:%M")
-    new_note = f"[{timestamp}] {request.user.get_full_name() or request.user.username}: {note_text}"
-    
-    if order.note:
-        order.note += "\n" + new_note
-    else:
-        order.note = new_note
-    order.save()
+    note_text = (request.POST.get('note_text') or '').strip()
+    if not note_text:
+        return JsonResponse({'success': False, 'error': 'Note vide'}, status=400)
+    # Ajout à l'historique, la ligne Order n'est pas réécrite
+    event = OrderEventService.add_note(order, note_text, author=request.user)
+    timestamp = timezone.localtime(event.created_at).strftime("%Y-%m-%d %H:%M")
     
     return JsonResponse({
         'success': True, 
@@ -362,27 +495,24 @@ def add_note(request, pk):
 @artisan_required
 @require_POST
 def batch_update_orders(request):
-    order_ids = request.POST.get('order_ids', '').split(',')
+    """Statut et note de plusieurs commandes, en requêtes groupées (orders.transitions)"""
+    order_ids, invalid_ids = parse_ids(request.POST.get('order_ids'))
     status = request.POST.get('status')
-    note = request.POST.get('note')
-    
-    updated_count = 0
-    for order_id in order_ids:
-        if not order_id: continue
-        try:
-            order = Order.objects.get(id=order_id)
-            if status:
-                order.status = status
-            if note:
-                timestamp = timezone.now().strftime("%Y-%m-%d %H:%M")
-                new_note = f"[{timestamp}] {request.user.get_full_name() or request.user.username}: {note}"
-                if order.note:
-                    order.note += "\n" + new_note
-                else:
-                    order.note = new_note
-            order.save()
-            updated_count += 1
-        except Order.DoesNotExist:
-            continue
-            
-    return JsonResponse({'success': True, 'updated_count': updated_count})
+    note = (request.POST.get('note') or '').strip()
+
+    try:
+        if request.user.role == 'admin':
+            outcomes = OrderStatusService.batch_update(
+                Order.objects.all(), order_ids, status=status, note=note, author=request.user
+            )
+        else:
+            # Sous-commandes de l'artisan seulement (orders.transitions)
+            outcomes = OrderStatusService.batch_update_artisan(
+                request.user, order_ids, status=status, note=note, author=request.user
+            )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    outcomes.update({value: NOT_FOUND for value in invalid_ids})
+
+    updated_count = sum(1 for outcome in outcomes.values() if outcome in (UPDATED, UNCHANGED))
+    return JsonResponse({'success': True, 'updated_count': updated_count, 'results': outcomes})
@@ -0,0 +1,33 @@
+# gunicorn_asgi.conf.py
+"""
+Profil ASGI, optionnel : le déploiement par défaut reste WSGI
+(gunicorn config.wsgi), plus rapide aux mesures de bench_api (SQLite,
+1 worker, 50 clients : 31 req/s en WSGI contre 23 en ASGI, avec ou sans
+les vues asynchrones). À n'adopter qu'après une mesure plus favorable
+sur PostgreSQL, là où les attentes réseau de la base peuvent se
+recouvrir.
+
+Les WebSocket (ws/) demandent ASGI : ce profil sert alors seulement
+/ws/ derrière le proxy, l'API et le site restant sur WSGI.
+
+    gunicorn -c gunicorn_asgi.conf.py config.asgi:application
+
+Workers uvicorn (HTTP + WebSocket) et lectures asynchrones de l'API
+(ASYNC_API_VIEWS, voir core/async_api.py). Chaque worker sert de
+nombreuses requêtes à la fois : prévoir un pool de connexions (DB_POOL=1
+ou PgBouncer) plutôt que des connexions persistantes par thread.
+"""
+import multiprocessing
+import os
+
+os.environ.setdefault('ASYNC_API_VIEWS', '1')
+# Connexions persistantes inadaptées en asynchrone : pool ou PgBouncer
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn_worker.UvicornWorker'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
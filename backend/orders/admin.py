@@ -1,6 +1,9 @@
 from django.contrib import admin
-from .models import Order,OrderItem
+from .models import ArtisanOrder, Order, OrderEvent, OrderItem, Payment
 
 # Register your models here.
 admin.site.register(Order)
-admin.site.register(OrderItem)
\ No newline at end of file
+admin.site.register(OrderItem)
+admin.site.register(Payment)
+admin.site.register(OrderEvent)
+admin.site.register(ArtisanOrder)
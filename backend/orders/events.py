@@ -0,0 +1,100 @@
+# orders/events.py
+"""
+Historique des commandes (OrderEvent), en ajout seul.
+
+Chaque fait est une ligne insérée : la ligne Order n'est pas réécrite
+et ne grossit pas. L'historique d'une commande se lit avec une requête
+sur l'index (order, created_at, id), page par page.
+
+Les changements de statut sont enregistrés depuis le signal
+order_status_changed (Order.save, changements groupés), les autres
+événements par les vues et services concernés.
+"""
+from django.dispatch import receiver
+
+from .models import OrderEvent
+from .signals import order_status_changed
+
+TIMELINE_SIZE = 50
+
+
+class OrderEventService:
+
+    @classmethod
+    def add_note(cls, order, message, author=None):
+        return OrderEvent.objects.create(order=order, kind=OrderEvent.Kind.NOTE, author=author, message=message)
+
+    @classmethod
+    def add_notes(cls, order_ids, message, author=None):
+        """Même note sur plusieurs commandes, un seul INSERT"""
+        return OrderEvent.objects.bulk_create(
+            [OrderEvent(order_id=order_id, kind=OrderEvent.Kind.NOTE, author=author, message=message) for order_id in order_ids],
+            batch_size=500,
+        )
+
+    @classmethod
+    def record_transitions(cls, transitions, author=None):
+        """transitions = {order_id: (ancien statut, nouveau statut)}"""
+        return OrderEvent.objects.bulk_create(
+            [
+                OrderEvent(
+                    order_id=order_id, kind=OrderEvent.Kind.STATUS, author=author,
+                    old_status=old_status, new_status=new_status,
+                )
+                for order_id, (old_status, new_status) in transitions.items()
+            ],
+            batch_size=500,
+        )
+
+    @classmethod
+    def record_artisan_transitions(cls, artisan, transitions, author=None):
+        """Avancement de la part d'un artisan : transitions = {order_id: (ancien, nouveau)}"""
+        return OrderEvent.objects.bulk_create(
+            [
+                OrderEvent(
+                    order_id=order_id, kind=OrderEvent.Kind.STATUS, author=author,
+                    old_status=old_status, new_status=new_status,
+                    message=f"Part de {artisan.get_full_name() or artisan.username}",
+                    data={'artisan_id': artisan.pk},
+                )
+                for order_id, (old_status, new_status) in transitions.items()
+            ],
+            batch_size=500,
+        )
+
+    @classmethod
+    def record_payment(cls, payment):
+        """Résultat d'un paiement (worker ou webhook du provider)"""
+        succeeded = payment.status == payment.Status.COMPLETED
+        return OrderEvent.objects.create(
+            order_id=payment.order_id,
+            kind=OrderEvent.Kind.PAYMENT,
+            message="Paiement réussi" if succeeded else f"Paiement échoué : {payment.error_message}",
+            data={
+                'reference': payment.reference,
+                'status': payment.status,
+                'payment_method': payment.payment_method,
+                'amount': str(payment.amount),
+                'transaction_id': payment.transaction_id or '',
+            },
+        )
+
+    @classmethod
+    def record_tracking(cls, order, tracking_number, author=None):
+        return OrderEvent.objects.create(
+            order=order,
+            kind=OrderEvent.Kind.TRACKING,
+            author=author,
+            message=f"Numéro de suivi : {tracking_number}" if tracking_number else "Numéro de suivi retiré",
+            data={'tracking_number': tracking_number or ''},
+        )
+
+    @classmethod
+    def timeline(cls, order):
+        """Événements de la commande, du plus récent au plus ancien (à paginer)"""
+        return OrderEvent.objects.filter(order=order).select_related('author').order_by('-created_at', '-id')
+
+
+@receiver(order_status_changed)
+def record_status_changes(sender, transitions, author=None, **kwargs):
+    OrderEventService.record_transitions(transitions, author=author)
@@ -0,0 +1,37 @@
+# orders/hot_queries.py
+"""Requêtes fréquentes des commandes (commande explain_hot_queries)"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.explain import hot_query
+from .models import ArtisanOrder, Order
+
+
+@hot_query('orders.buyer_orders')
+def buyer_orders():
+    return Order.objects.filter(buyer_id=1).order_by('-created_at', '-id')[:20]
+
+
+@hot_query('orders.status_period')
+def status_period():
+    end = timezone.now()
+    return Order.objects.filter(
+        status=Order.Status.PENDING,
+        created_at__gte=end - timedelta(days=30),
+        created_at__lt=end,
+    ).order_by('-created_at')[:10]
+
+
+@hot_query('orders.artisan_orders')
+def artisan_orders():
+    return Order.objects.filter(artisan_orders__artisan_id=1).order_by(
+        '-artisan_orders__created_at', '-artisan_orders__id'
+    )[:20]
+
+
+@hot_query('orders.artisan_orders_status')
+def artisan_orders_status():
+    return ArtisanOrder.objects.filter(artisan_id=1, status=Order.Status.PAID).select_related(
+        'order__buyer'
+    ).order_by('-created_at', '-id')[:10]
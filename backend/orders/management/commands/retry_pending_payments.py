@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.services import PaymentService
+
+
+class Command(BaseCommand):
+    help = (
+        "Relance les paiements restés en attente sans tentative récente "
+        "(worker arrêté, webhook jamais reçu) ; à lancer via cron ou en continu"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', type=int, default=0, metavar='SECONDES',
+            help="Tourne en continu avec cet intervalle entre deux passages",
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        interval = options['loop']
+        while True:
+            payment_ids = list(
+                PaymentService.stale_payments().order_by('created_at').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            for payment_id in payment_ids:
+                payment = PaymentService.execute_payment(payment_id)
+                self.stdout.write(f"Paiement {payment.reference} : {payment.get_status_display()}")
+            if not interval:
+                break
+            time.sleep(interval)
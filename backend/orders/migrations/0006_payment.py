@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_cursor_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(blank=True, max_length=40, unique=True)),
+                ('payment_method', models.CharField(choices=[('orange_money', 'Orange Money'), ('mtn_momo', 'MTN Mobile Money'), ('wave', 'Wave'), ('card', 'Carte bancaire'), ('delivery', 'Paiement à la livraison')], max_length=50)),
+                ('amount', models.DecimalField(decimal_places=0, max_digits=12)),
+                ('phone_number', models.CharField(blank=True, default='', max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('completed', 'Payé'), ('failed', 'Échoué')], default='pending', max_length=20)),
+                ('transaction_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('error_message', models.CharField(blank=True, default='', max_length=255)),
+                ('provider_response', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='orders.order')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('status', 'Changement de statut'), ('note', 'Note')], max_length=20)),
+                ('old_status', models.CharField(blank=True, choices=[('pending', 'En attente'), ('paid', 'Payé'), ('preparing', 'En préparation'), ('delivering', 'En livraison'), ('delivered', 'Livré'), ('cancelled', 'Annulé'), ('refunded', 'Remboursé')], default='', max_length=20)),
+                ('new_status', models.CharField(blank=True, choices=[('pending', 'En attente'), ('paid', 'Payé'), ('preparing', 'En préparation'), ('delivering', 'En livraison'), ('delivered', 'Livré'), ('cancelled', 'Annulé'), ('refunded', 'Remboursé')], default='', max_length=20)),
+                ('message', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='orders.order')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['order', 'created_at', 'id'], name='order_event_timeline_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderevent',
+            name='data',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='orderevent',
+            name='kind',
+            field=models.CharField(choices=[('status', 'Changement de statut'), ('note', 'Note'), ('payment', 'Paiement'), ('tracking', 'Suivi de livraison')], max_length=20),
+        ),
+    ]
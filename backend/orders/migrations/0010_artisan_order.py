@@ -0,0 +1,69 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+
+
+def fill_artisan_orders(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    ArtisanOrder = apps.get_model('orders', 'ArtisanOrder')
+    Product = apps.get_model('products', 'Product')
+    # Lignes dont le produit existe encore (les autres n'ont plus d'artisan connu)
+    OrderItem.objects.filter(product__isnull=False).update(
+        artisan_id=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('artisan_id')[:1])
+    )
+    shares = (
+        OrderItem.objects.filter(artisan__isnull=False)
+        .values('artisan_id', 'order_id', 'order__created_at')
+        .annotate(subtotal=Sum('total'), item_count=Sum('quantity'))
+        .order_by()
+    )
+    ArtisanOrder.objects.bulk_create(
+        (
+            ArtisanOrder(
+                artisan_id=share['artisan_id'],
+                order_id=share['order_id'],
+                created_at=share['order__created_at'],
+                subtotal=share['subtotal'],
+                item_count=share['item_count'],
+            )
+            for share in shares.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_order_event_kinds'),
+        ('products', '0010_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='artisan',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='ArtisanOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subtotal', models.DecimalField(decimal_places=0, default=0, max_digits=12)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('artisan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artisan_orders', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artisan_orders', to='orders.order')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['artisan', '-created_at', '-id'], name='artisan_order_created_idx')],
+                'constraints': [models.UniqueConstraint(fields=('artisan', 'order'), name='unique_artisan_order')],
+            },
+        ),
+        migrations.RunPython(fill_artisan_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:09
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_status(apps, schema_editor):
+    """Les sous-commandes existantes prennent le statut de leur commande"""
+    ArtisanOrder = apps.get_model('orders', 'ArtisanOrder')
+    Order = apps.get_model('orders', 'Order')
+    ArtisanOrder.objects.update(
+        status=Subquery(Order.objects.filter(pk=OuterRef('order_id')).values('status')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_artisan_order'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artisanorder',
+            name='status',
+            field=models.CharField(choices=[('pending', 'En attente'), ('paid', 'Payé'), ('preparing', 'En préparation'), ('delivering', 'En livraison'), ('delivered', 'Livré'), ('cancelled', 'Annulé'), ('refunded', 'Remboursé')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='artisanorder',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='artisanorder',
+            index=models.Index(fields=['artisan', 'status', '-created_at', '-id'], name='artisan_order_status_idx'),
+        ),
+        migrations.RunPython(fill_status, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,8 @@ from django.db import models
 from django.conf import settings
 import uuid
 
+from .signals import order_status_changed
+
 class Order(models.Model):
     class Status(models.TextChoices):
         PENDING = 'pending', 'En attente'
@@ -13,6 +15,21 @@ class Order(models.Model):
         CANCELLED = 'cancelled', 'Annulé'
         REFUNDED = 'refunded', 'Remboursé'
 
+    # Commande abandonnée (annulée, remboursée) : ne compte plus comme vente
+    VOID_STATUSES = (Status.CANCELLED, Status.REFUNDED)
+    # Avancement d'une commande en cours, dans l'ordre (statuts hors VOID_STATUSES)
+    PROGRESS = (Status.PENDING, Status.PAID, Status.PREPARING, Status.DELIVERING, Status.DELIVERED)
+    # Changements de statut autorisés (orders.transitions)
+    ALLOWED_TRANSITIONS = {
+        Status.PENDING: (Status.PAID, Status.CANCELLED),
+        Status.PAID: (Status.PREPARING, Status.CANCELLED, Status.REFUNDED),
+        Status.PREPARING: (Status.DELIVERING, Status.CANCELLED),
+        Status.DELIVERING: (Status.DELIVERED,),
+        Status.DELIVERED: (Status.REFUNDED,),
+        Status.CANCELLED: (Status.REFUNDED,),
+        Status.REFUNDED: (),
+    }
+
     class PaymentMethod(models.TextChoices):
         ORANGE_MONEY = 'orange_money', 'Orange Money'
         MTN_MOMO = 'mtn_momo', 'MTN Mobile Money'
@@ -97,10 +114,25 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Pagination par curseur (core.pagination)
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            # Commandes d'un acheteur (OrderViewSet)
+            models.Index(fields=['buyer', '-created_at', '-id'], name='order_buyer_created_idx'),
+            # Filtre par statut et période (dashboard.orders_list)
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Commande #{self.order_number or self.id} - {self.buyer.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut chargé, pour détecter les changements dans save()
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
     def save(self, *args, **kwargs):
         # Générer un numéro de commande si non défini
         if not self.order_number:
@@ -112,6 +144,16 @@ class Order(models.Model):
             
         super().save(*args, **kwargs)
 
+        old_status = getattr(self, '_loaded_status', None)
+        if old_status is not None and old_status != self.status:
+            order_status_changed.send(
+                sender=Order,
+                transitions={self.pk: (old_status, self.status)},
+                # Auteur du changement pour l'historique (order.changed_by = request.user)
+                author=getattr(self, 'changed_by', None),
+            )
+        self._loaded_status = self.status
+
     @property
     def shipping_address_text(self):
         """Retourne l'adresse de livraison formatée"""
@@ -124,6 +166,11 @@ class Order(models.Model):
         ]
         return '\n'.join(filter(None, parts))
 
+    @property
+    def can_be_cancelled(self):
+        """Annulable tant que la préparation n'a pas commencé"""
+        return self.status in (self.Status.PENDING, self.Status.PAID)
+
     @property
     def customer(self):
         """Alias pour buyer pour la compatibilité avec les templates"""
@@ -133,6 +180,14 @@ class Order(models.Model):
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey('products.Product', on_delete=models.SET_NULL, null=True)
+    # Artisan du produit au moment de la commande (conservé si le produit est supprimé)
+    artisan = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='order_items',
+    )
     product_name = models.CharField(max_length=255, blank=True)  # Sauvegarde du nom
     product_sku = models.CharField(max_length=50, blank=True)
     quantity = models.PositiveIntegerField(default=1)
@@ -151,6 +206,8 @@ class OrderItem(models.Model):
         # Sauvegarder le nom du produit
         if self.product and not self.product_name:
             self.product_name = self.product.name
+        if self.product and not self.artisan_id:
+            self.artisan_id = self.product.artisan_id
             
         super().save(*args, **kwargs)
 
@@ -163,4 +220,160 @@ class OrderItem(models.Model):
         return self.total or (self.price * self.quantity)
 
     def get_total(self):
-        return self.total_price
\ No newline at end of file
+        return self.total_price
+
+class ArtisanOrder(models.Model):
+    """
+    Part d'un artisan dans une commande (sous-commande) : une ligne par
+    (artisan, commande), créée au passage de la commande. Les listes de
+    commandes d'un artisan lisent cette table (index artisan, date) au
+    lieu de joindre les lignes et les produits avec DISTINCT.
+
+    Chaque artisan fait avancer sa part (préparation, livraison) sans
+    toucher à celles des autres ; la commande avance quand toutes ses
+    parts ont avancé (orders.transitions).
+    """
+    # Préparation et expédition par l'artisan ; paiement, annulation et
+    # livraison (confirmée par l'acheteur) restent au niveau de la commande
+    ALLOWED_TRANSITIONS = {
+        Order.Status.PAID: (Order.Status.PREPARING,),
+        Order.Status.PREPARING: (Order.Status.DELIVERING,),
+    }
+
+    artisan = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='artisan_orders')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='artisan_orders')
+    status = models.CharField(max_length=20, choices=Order.Status.choices, default=Order.Status.PENDING)
+    # Lignes de l'artisan dans la commande
+    subtotal = models.DecimalField(max_digits=12, decimal_places=0, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    # Date de la commande (tri sans jointure)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['artisan', 'order'], name='unique_artisan_order'),
+        ]
+        indexes = [
+            models.Index(fields=['artisan', '-created_at', '-id'], name='artisan_order_created_idx'),
+            # Filtre par statut du tableau de bord artisan
+            models.Index(fields=['artisan', 'status', '-created_at', '-id'], name='artisan_order_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.artisan} - commande #{self.order_id} ({self.get_status_display()})"
+
+    # Mêmes noms que Order pour les gabarits du tableau de bord
+    @property
+    def total_amount(self):
+        return self.subtotal
+
+
+class OrderEventQuerySet(models.QuerySet):
+    """Historique en ajout seul : ni UPDATE ni DELETE en masse"""
+
+    def update(self, **kwargs):
+        raise ValueError("L'historique d'une commande est en ajout seul")
+
+    def delete(self):
+        raise ValueError("L'historique d'une commande est en ajout seul")
+
+
+class OrderEvent(models.Model):
+    """
+    Historique d'une commande, en ajout seul (orders.events) : changements
+    de statut, notes, résultats de paiement, suivi de livraison. Remplace
+    la concaténation dans Order.note, qui ne garde que la note de l'acheteur.
+    """
+    class Kind(models.TextChoices):
+        STATUS = 'status', 'Changement de statut'
+        NOTE = 'note', 'Note'
+        PAYMENT = 'payment', 'Paiement'
+        TRACKING = 'tracking', 'Suivi de livraison'
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    old_status = models.CharField(max_length=20, choices=Order.Status.choices, blank=True, default='')
+    new_status = models.CharField(max_length=20, choices=Order.Status.choices, blank=True, default='')
+    message = models.TextField(blank=True, default='')
+    # Détails structurés (référence du paiement, numéro de suivi, ...)
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Suppression en cascade avec la commande seulement
+    objects = OrderEventQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            # Historique d'une commande, dans l'ordre
+            models.Index(fields=['order', 'created_at', 'id'], name='order_event_timeline_idx'),
+        ]
+
+    def __str__(self):
+        if self.kind == self.Kind.STATUS:
+            return f"Commande #{self.order_id} : {self.old_status} -> {self.new_status}"
+        return f"Commande #{self.order_id} : {self.message[:50]}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("L'historique d'une commande est en ajout seul")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("L'historique d'une commande est en ajout seul")
+
+
+class Payment(models.Model):
+    """
+    Tentative de paiement d'une commande.
+
+    Créée en attente par /api/orders/pay/, traitée par un worker puis
+    finalisée une seule fois (worker ou webhook du provider) : la
+    référence rend le callback idempotent.
+
+    La ligne sert aussi de tâche persistante : un paiement resté en
+    attente sans tentative récente (worker arrêté, webhook jamais reçu)
+    est relancé par la commande retry_pending_payments ou par un nouvel
+    essai de l'acheteur.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'En attente'
+        COMPLETED = 'completed', 'Payé'
+        FAILED = 'failed', 'Échoué'
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='payments')
+    reference = models.CharField(max_length=40, unique=True, blank=True)
+    payment_method = models.CharField(max_length=50, choices=Order.PaymentMethod.choices)
+    amount = models.DecimalField(max_digits=12, decimal_places=0)
+    phone_number = models.CharField(max_length=20, blank=True, default='')
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    transaction_id = models.CharField(max_length=100, blank=True, null=True)
+    error_message = models.CharField(max_length=255, blank=True, default='')
+    provider_response = models.JSONField(default=dict, blank=True)
+    # Appels au provider (PaymentService.execute_payment)
+    attempts = models.PositiveIntegerField(default=0)
+    last_attempt_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Paiements en attente à relancer (PaymentService.stale_payments)
+            models.Index(fields=['status', 'last_attempt_at'], name='payment_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Paiement {self.reference} ({self.get_status_display()})"
+
+    def save(self, *args, **kwargs):
+        if not self.reference:
+            self.reference = f"PAY-{uuid.uuid4().hex[:16].upper()}"
+        super().save(*args, **kwargs)
+
+    @property
+    def is_final(self):
+        return self.status != self.Status.PENDING
@@ -0,0 +1,83 @@
+# orders/providers.py
+"""
+Fournisseurs de paiement (Orange Money, MTN MoMo, Wave, ...).
+
+Un fournisseur reçoit un Payment et renvoie un dict :
+    {'success': True/False/None, 'transaction_id': ..., 'error': ..., 'provider_response': {...}}
+success = None signifie que le fournisseur confirmera plus tard via le
+webhook (/api/payments/callback/).
+
+Le fournisseur utilisé est défini par le setting PAYMENT_PROVIDER.
+"""
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BasePaymentProvider:
+    def charge(self, payment):
+        raise NotImplementedError
+
+
+class SimulatedProvider(BasePaymentProvider):
+    """
+    Simule l'appel à l'API du provider de paiement
+    En production, remplacer par les vrais appels API
+    """
+    delay = 0.5
+    success_rate = 0.9
+
+    def charge(self, payment):
+        transaction_id = f"TXN_{uuid.uuid4().hex[:12].upper()}"
+
+        # Simuler un délai de traitement (exécuté par un worker, hors requête)
+        time.sleep(self.delay)
+
+        if random.random() < self.success_rate:
+            return {
+                'success': True,
+                'transaction_id': transaction_id,
+                'message': 'Paiement effectué avec succès',
+                'provider_response': {
+                    'status': 'SUCCESSFUL',
+                    'reference': transaction_id,
+                }
+            }
+        return {
+            'success': False,
+            'error': 'Transaction refusée par le provider',
+            'provider_response': {'status': 'FAILED'},
+        }
+
+
+class FakePaymentProvider(BasePaymentProvider):
+    """
+    Fournisseur local déterministe, sans délai.
+    Un numéro de téléphone se terminant par '000' est refusé ; un numéro
+    se terminant par '999' reste en attente du webhook.
+    """
+    def charge(self, payment):
+        phone = payment.phone_number or ''
+        if phone.endswith('000'):
+            return {
+                'success': False,
+                'error': 'Transaction refusée par le provider',
+                'provider_response': {'status': 'FAILED'},
+            }
+        if phone.endswith('999'):
+            return {'success': None, 'provider_response': {'status': 'PENDING'}}
+        transaction_id = f"FAKE_{payment.reference}"
+        return {
+            'success': True,
+            'transaction_id': transaction_id,
+            'provider_response': {'status': 'SUCCESSFUL', 'reference': transaction_id},
+        }
+
+
+def get_payment_provider():
+    return import_string(
+        getattr(settings, 'PAYMENT_PROVIDER', 'orders.providers.SimulatedProvider')
+    )()
@@ -1,12 +1,12 @@
 # orders/serializers.py
 from rest_framework import serializers
-from .models import Order, OrderItem
+from .models import Order, OrderEvent, OrderItem, Payment
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_id = serializers.CharField(source='product.id', read_only=True)
     product_name = serializers.CharField(read_only=True)
     product_image = serializers.SerializerMethodField()
-    artisan_name = serializers.CharField(source='artisan.first_name', read_only=True)
+    artisan_name = serializers.CharField(source='artisan.first_name', read_only=True, default=None)
     total_price = serializers.SerializerMethodField()
 
     class Meta:
@@ -23,13 +23,13 @@ class OrderItemSerializer(serializers.ModelSerializer):
         ]
 
     def get_product_image(self, obj):
-        if obj.product and obj.product.images.exists():
+        # main_image lit les images préchargées (voir OrderViewSet)
+        image = obj.product.main_image if obj.product else None
+        if image and image.image:
             request = self.context.get('request')
-            image = obj.product.images.first()
-            if image and image.image:
-                if request:
-                    return request.build_absolute_uri(image.image.url)
-                return image.image.url
+            if request:
+                return request.build_absolute_uri(image.image.url)
+            return image.image.url
         return None
 
     def get_total_price(self, obj):
@@ -54,10 +54,58 @@ class OrderSerializer(serializers.ModelSerializer):
             'delivery_address',
             'delivery_phone',
             'payment_method',
+            'payment_status',
             'transaction_id',
             'is_paid',
             'created_at',
             'updated_at',
             'items',
         ]
-        read_only_fields = ['buyer_id', 'buyer_name', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['buyer_id', 'buyer_name', 'created_at', 'updated_at']
+
+
+class PaymentSerializer(serializers.ModelSerializer):
+    order_id = serializers.IntegerField(source='order.id', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = Payment
+        fields = [
+            'reference',
+            'order_id',
+            'payment_method',
+            'amount',
+            'status',
+            'status_display',
+            'transaction_id',
+            'error_message',
+            'created_at',
+            'processed_at',
+        ]
+        read_only_fields = fields
+
+
+class OrderEventSerializer(serializers.ModelSerializer):
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    author_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = OrderEvent
+        fields = [
+            'id',
+            'kind',
+            'kind_display',
+            'author',
+            'author_name',
+            'old_status',
+            'new_status',
+            'message',
+            'data',
+            'created_at',
+        ]
+        read_only_fields = fields
+
+    def get_author_name(self, obj):
+        if obj.author is None:
+            return 'Système'
+        return obj.author.get_full_name() or obj.author.username
@@ -1,14 +1,32 @@
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
 from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
-import uuid
 import logging
 
-from .models import Order, OrderItem
+from core.tasks import enqueue
+from .events import OrderEventService
+from .models import ArtisanOrder, Order, OrderItem, Payment
+from .providers import get_payment_provider
+from .signals import order_placed
 from products.models import Product
+from products.reservations import ReservationService
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PAYMENT_RETRY_AFTER = timedelta(minutes=2)
+DEFAULT_PAYMENT_MAX_ATTEMPTS = 5
+
+
+def payment_retry_after():
+    return getattr(settings, 'PAYMENT_RETRY_AFTER', DEFAULT_PAYMENT_RETRY_AFTER)
+
+
+def payment_max_attempts():
+    return getattr(settings, 'PAYMENT_MAX_ATTEMPTS', DEFAULT_PAYMENT_MAX_ATTEMPTS)
+
 
 class PaymentService:
     """Service de gestion des paiements"""
@@ -24,14 +42,60 @@ class PaymentService:
     
     @classmethod
     @transaction.atomic
-    def create_order_from_cart(cls, user, cart_items, delivery_address, delivery_phone, payment_method='orange_money', note=''):
+    def create_order_from_cart(cls, user, cart_items, delivery_address='', delivery_phone='', payment_method='orange_money', note='',
+                               session_key=None, shipping_cost=0, **order_fields):
         """
         Crée une commande à partir du panier
         Vérifie et décrémente le stock de manière atomique
+
+        Les réservations de l'acheteur (products.reservations) sont rendues
+        d'abord, dans la même transaction : les lignes qu'elles couvrent
+        entièrement sont converties sans verrouiller le produit, et une
+        réservation partielle ou expirée ne compte plus contre lui. Pour les
+        autres lignes, le nombre de requêtes ne dépend pas de la taille du
+        panier : un SELECT ... FOR UPDATE pour tous les produits, un UPDATE
+        conditionnel pour le stock et un INSERT groupé pour les lignes.
         """
         if not cart_items:
             raise ValueError("Le panier est vide")
         
+        quantities = cls._cart_quantities(cart_items)
+        
+        # 1. Réservations de l'acheteur rendues ; lignes couvertes décrémentées
+        covered = ReservationService.consume(quantities, user=user, session_key=session_key)
+        remaining = {pid: qty for pid, qty in quantities.items() if pid not in covered}
+        
+        products = {}
+        if covered:
+            products.update(Product.objects.in_bulk(list(covered)))
+        
+        # 2. Lignes sans réservation : verrouiller tous les produits en une
+        # requête, toujours dans l'ordre des ids pour que deux paniers
+        # concurrents ne s'interbloquent pas
+        if remaining:
+            products.update({
+                product.id: product
+                for product in Product.objects.select_for_update().filter(id__in=remaining).order_by('id')
+            })
+        
+        for product_id, quantity in remaining.items():
+            product = products.get(product_id)
+            if product is None:
+                raise ValueError(f"Produit {product_id} introuvable")
+            if product.available_stock < quantity:
+                raise ValueError(
+                    f"Stock insuffisant pour '{product.name}'. "
+                    f"Disponible: {product.available_stock}, Demandé: {quantity}"
+                )
+        
+        if remaining:
+            cls._decrement_stock(remaining)
+        
+        total = sum(
+            (products[product_id].price * quantity for product_id, quantity in quantities.items()),
+            Decimal('0')
+        )
+        
         # Créer la commande
         order = Order.objects.create(
             buyer=user,
@@ -39,135 +103,272 @@ class PaymentService:
             delivery_phone=delivery_phone,
             payment_method=payment_method,
             note=note,
-            total_amount=0,
+            subtotal=total,
+            shipping_cost=shipping_cost,
+            total_amount=total + shipping_cost,
+            **order_fields
         )
         
-        total = Decimal('0')
-        
-        for item_data in cart_items:
-            product_id = item_data.get('product_id') or item_data.get('id')
-            quantity = int(item_data.get('quantity', 1))
-            
-            # Verrouiller le produit pour éviter les conflits de stock
-            try:
-                product = Product.objects.select_for_update().get(id=product_id)
-            except Product.DoesNotExist:
-                raise ValueError(f"Produit {product_id} introuvable")
-            
-            # Vérifier le stock
-            if product.stock < quantity:
-                raise ValueError(
-                    f"Stock insuffisant pour '{product.name}'. "
-                    f"Disponible: {product.stock}, Demandé: {quantity}"
-                )
-            
-            # Décrémenter le stock
-            product.stock -= quantity
-            product.save()
-            
-            # Créer l'item de commande
-            unit_price = product.price
-            OrderItem.objects.create(
+        # Créer les lignes en un seul INSERT (bulk_create n'appelle pas save() :
+        # total, product_name et artisan sont renseignés ici)
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                product=product,
-                product_name=product.name,
+                product=products[product_id],
+                product_name=products[product_id].name,
+                artisan_id=products[product_id].artisan_id,
                 quantity=quantity,
-                unit_price=unit_price,
-                artisan=product.artisan,
-            )
-            
-            total += unit_price * quantity
-            
-            logger.info(
-                f"Stock décrémenté pour {product.name}: "
-                f"{product.stock + quantity} -> {product.stock}"
+                price=products[product_id].price,
+                total=products[product_id].price * quantity,
             )
+            for product_id, quantity in quantities.items()
+        ])
+        ArtisanOrder.objects.bulk_create(cls._artisan_orders(order, items))
         
-        # Mettre à jour le total
-        order.total_amount = total
-        order.save()
+        order_placed.send(sender=Order, order=order)
+        
+        logger.info(
+            f"Commande #{order.id}: stock décrémenté pour {len(quantities)} produit(s) "
+            f"({sum(quantities.values())} article(s))"
+        )
         
         return order
     
+    @classmethod
+    def _artisan_orders(cls, order, items):
+        """Part de chaque artisan : sous-total et nombre d'articles de ses lignes"""
+        shares = {}
+        for item in items:
+            share = shares.setdefault(
+                item.artisan_id,
+                ArtisanOrder(artisan_id=item.artisan_id, order=order, created_at=order.created_at),
+            )
+            share.subtotal += item.total
+            share.item_count += item.quantity
+        return list(shares.values())
+
+    @classmethod
+    def _cart_quantities(cls, cart_items):
+        """Regroupe les lignes du panier par produit : {product_id: quantité}"""
+        quantities = {}
+        for item_data in cart_items:
+            product_id = item_data.get('product_id') or item_data.get('id')
+            try:
+                product_id = int(product_id)
+                quantity = int(item_data.get('quantity', 1))
+            except (TypeError, ValueError):
+                raise ValueError(f"Ligne de panier invalide: {item_data}")
+            if quantity < 1:
+                raise ValueError(f"Quantité invalide pour le produit {product_id}")
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return quantities
+    
+    @classmethod
+    def _stock_delta(cls, quantities, sign):
+        """Expression CASE appliquant +/- quantité au stock de chaque produit"""
+        return Case(
+            *[
+                When(id=product_id, then=F('stock') + sign * quantity)
+                for product_id, quantity in quantities.items()
+            ],
+            default=F('stock'),
+            output_field=IntegerField(),
+        )
+    
+    @classmethod
+    def _decrement_stock(cls, quantities):
+        """
+        Décrémente le stock de tous les produits en un seul UPDATE.
+        Chaque ligne n'est modifiée que si le stock non réservé reste suffisant.
+        """
+        condition = Q()
+        for product_id, quantity in quantities.items():
+            condition |= Q(id=product_id, stock__gte=F('reserved_stock') + quantity)
+        updated = Product.objects.filter(condition).update(
+            stock=cls._stock_delta(quantities, -1),
+            updated_at=timezone.now(),
+        )
+        if updated != len(quantities):
+            # Annule la transaction englobante
+            raise ValueError("Stock insuffisant pour un ou plusieurs produits")
+    
+    @classmethod
+    def restore_stock(cls, order):
+        """Remet en stock les articles d'une commande (un seul UPDATE)"""
+        return cls.restore_orders_stock([order.pk])
+
+    @classmethod
+    def restore_orders_stock(cls, order_ids):
+        """Remet en stock les articles de plusieurs commandes (un SELECT, un UPDATE)"""
+        quantities = {}
+        items = OrderItem.objects.filter(order_id__in=order_ids, product__isnull=False)
+        for product_id, quantity in items.values_list('product_id', 'quantity'):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        if quantities:
+            Product.objects.filter(id__in=quantities).update(
+                stock=cls._stock_delta(quantities, 1),
+                updated_at=timezone.now(),
+            )
+        return quantities
+    
     @classmethod
     @transaction.atomic
     def process_payment(cls, order, payment_method, phone_number=None):
         """
-        Traite le paiement d'une commande
+        Démarre le paiement d'une commande et rend la main immédiatement.
+
+        Le paiement est enregistré en attente ; l'appel au provider est fait
+        par un worker après le commit (aucune transaction ni verrou ouvert
+        pendant l'aller-retour réseau). Le résultat est appliqué par
+        apply_payment_result, depuis le worker ou le webhook du provider.
         """
+        order = Order.objects.select_for_update().get(pk=order.pk)
         if order.is_paid:
             raise ValueError("Cette commande est déjà payée")
         
-        # Simuler l'appel à l'API du provider de paiement
-        payment_result = cls._call_payment_provider(
+        # Double clic / nouvel essai pendant un paiement en cours : même
+        # paiement, relancé si son worker ne s'en occupe plus
+        payment = order.payments.filter(status=Payment.Status.PENDING).first()
+        if payment:
+            if cls.stale_payments().filter(pk=payment.pk).exists():
+                enqueue(cls.execute_payment, payment.pk)
+                logger.info(f"Paiement {payment.reference} relancé pour commande #{order.id}")
+            return payment
+        
+        payment = Payment.objects.create(
             order=order,
             payment_method=payment_method,
-            phone_number=phone_number
+            amount=order.total_amount,
+            phone_number=phone_number or '',
+        )
+        order.payment_method = payment_method
+        order.payment_status = Order.PaymentStatus.PENDING
+        order.save(update_fields=['payment_method', 'payment_status', 'updated_at'])
+        
+        enqueue(cls.execute_payment, payment.pk)
+        logger.info(f"Paiement {payment.reference} planifié pour commande #{order.id}")
+        return payment
+    
+    @classmethod
+    def stale_payments(cls):
+        """
+        Paiements en attente dont aucune tentative n'est en cours : jamais
+        tentés ou dernière tentative plus ancienne que PAYMENT_RETRY_AFTER
+        (processus arrêté avant la fin, webhook jamais reçu).
+        """
+        cutoff = timezone.now() - payment_retry_after()
+        return Payment.objects.filter(status=Payment.Status.PENDING).filter(
+            Q(last_attempt_at__isnull=True, created_at__lt=cutoff) | Q(last_attempt_at__lt=cutoff)
+        )
+    
+    @classmethod
+    def execute_payment(cls, payment_id):
+        """
+        Tâche worker : appelle le provider puis applique son résultat.
+
+        La tentative est d'abord réservée par un UPDATE conditionnel : un
+        paiement relancé alors que sa tentative précédente est encore en
+        cours n'est pas appelé deux fois. Le provider reçoit la même
+        référence à chaque tentative et doit la traiter comme clé
+        d'idempotence (une relance vaut interrogation du statut).
+        """
+        now = timezone.now()
+        claimed = Payment.objects.filter(pk=payment_id, status=Payment.Status.PENDING).filter(
+            Q(last_attempt_at__isnull=True) | Q(last_attempt_at__lt=now - payment_retry_after())
+        ).update(attempts=F('attempts') + 1, last_attempt_at=now)
+        payment = Payment.objects.select_related('order').get(pk=payment_id)
+        if not claimed:
+            # Déjà finalisé, ou tentative en cours dans un autre worker
+            return payment
+        
+        if payment.attempts > payment_max_attempts():
+            return cls.apply_payment_result(
+                reference=payment.reference,
+                success=False,
+                error=f"Aucune réponse du provider après {payment.attempts - 1} tentative(s)",
+            )
+        
+        try:
+            result = get_payment_provider().charge(payment)
+        except Exception as e:
+            logger.exception(f"Erreur provider pour le paiement {payment.reference}")
+            result = {'success': False, 'error': f"Erreur provider: {e}"}
+        
+        if result.get('success') is None:
+            # Confirmation asynchrone : le webhook appliquera le résultat
+            Payment.objects.filter(pk=payment.pk).update(
+                provider_response=result.get('provider_response', {})
+            )
+            return payment
+        
+        return cls.apply_payment_result(
+            reference=payment.reference,
+            success=result['success'],
+            transaction_id=result.get('transaction_id'),
+            error=result.get('error', ''),
+            provider_response=result.get('provider_response', {}),
         )
+    
+    @classmethod
+    @transaction.atomic
+    def apply_payment_result(cls, reference, success, transaction_id=None, error='', provider_response=None):
+        """
+        Applique le résultat d'un paiement (worker ou webhook).
+        Idempotent : un paiement déjà finalisé est renvoyé tel quel.
+        """
+        try:
+            payment = Payment.objects.select_for_update().select_related('order').get(reference=reference)
+        except Payment.DoesNotExist:
+            raise ValueError(f"Paiement {reference} introuvable")
         
-        if payment_result['success']:
+        if payment.is_final:
+            logger.info(f"Paiement {reference} déjà traité ({payment.status}), callback ignoré")
+            return payment
+        
+        order = payment.order
+        payment.processed_at = timezone.now()
+        payment.provider_response = provider_response or {}
+        
+        if success:
+            payment.status = Payment.Status.COMPLETED
+            payment.transaction_id = transaction_id
+            
             order.is_paid = True
-            order.status = Order.Status.PAID
-            order.transaction_id = payment_result['transaction_id']
-            order.payment_method = payment_method
-            order.paid_at = timezone.now()
+            if order.status == Order.Status.PENDING:
+                order.status = Order.Status.PAID
+            order.payment_status = Order.PaymentStatus.COMPLETED
+            order.transaction_id = transaction_id
+            order.payment_method = payment.payment_method
+            order.paid_at = payment.processed_at
             order.save()
             
-            # Notifier l'artisan (à implémenter)
             cls._notify_artisans(order)
-            
             logger.info(f"Paiement réussi pour commande #{order.id}")
-            return payment_result
         else:
-            raise ValueError(payment_result.get('error', 'Échec du paiement'))
-    
-    @classmethod
-    def _call_payment_provider(cls, order, payment_method, phone_number=None):
-        """
-        Simule l'appel à l'API du provider de paiement
-        En production, remplacer par les vrais appels API
-        """
-        # SIMULATION - En production, intégrer les vrais providers
-        # Orange Money, MTN MoMo, Wave, etc.
-        
-        transaction_id = f"TXN_{uuid.uuid4().hex[:12].upper()}"
-        
-        # Simuler un délai de traitement
-        import time
-        time.sleep(0.5)
-        
-        # Simuler un succès (90% de chance)
-        import random
-        if random.random() > 0.1:
-            return {
-                'success': True,
-                'transaction_id': transaction_id,
-                'message': 'Paiement effectué avec succès',
-                'provider_response': {
-                    'status': 'SUCCESSFUL',
-                    'reference': transaction_id,
-                }
-            }
-        else:
-            return {
-                'success': False,
-                'error': 'Transaction refusée par le provider',
-            }
+            payment.status = Payment.Status.FAILED
+            payment.error_message = (error or 'Échec du paiement')[:255]
+            
+            # La commande reste en attente : l'acheteur peut réessayer
+            order.payment_status = Order.PaymentStatus.FAILED
+            order.save(update_fields=['payment_status', 'updated_at'])
+            logger.info(f"Paiement échoué pour commande #{order.id}: {payment.error_message}")
+        
+        payment.save()
+        OrderEventService.record_payment(payment)
+        return payment
     
     @classmethod
     def _notify_artisans(cls, order):
-        """Notifie les artisans d'une nouvelle commande"""
-        artisan_ids = set()
-        for item in order.items.all():
-            if item.artisan_id:
-                artisan_ids.add(item.artisan_id)
-        
-        # TODO: Envoyer des notifications (SMS, email, push)
-        logger.info(f"Notification envoyée aux artisans: {artisan_ids}")
+        """
+        Trace des artisans d'une commande payée. Le passage au statut payé
+        leur parvient par order_status_changed et l'historique (orders.events).
+        """
+        artisan_ids = set(order.artisan_orders.values_list('artisan_id', flat=True))
+        logger.info(f"Commande #{order.id} payée, artisans : {artisan_ids}")
     
     @classmethod
     @transaction.atomic
-    def cancel_order(cls, order, reason=''):
+    def cancel_order(cls, order, reason='', author=None):
         """
         Annule une commande et restaure le stock
         """
@@ -177,12 +378,14 @@ class PaymentService:
             )
         
         # Restaurer le stock
-        order.restore_stock()
+        cls.restore_stock(order)
         
         # Mettre à jour le statut
         order.status = Order.Status.CANCELLED
-        order.note = f"{order.note}\nAnnulation: {reason}" if order.note else f"Annulation: {reason}"
+        order.changed_by = author
         order.save()
+        if reason:
+            OrderEventService.add_note(order, f"Annulation : {reason}", author=author)
         
         # Si déjà payé, initier un remboursement
         if order.is_paid:
@@ -0,0 +1,15 @@
+# orders/signals.py
+"""
+Signaux métier des commandes, écoutés par les autres apps (dashboard, ...).
+
+order_placed          : commande créée avec ses lignes
+                        kwargs: order
+order_status_changed  : un ou plusieurs changements de statut
+                        kwargs: transitions = {order_id: (ancien, nouveau)},
+                                author (utilisateur ou None),
+                                synced (True : statut repris des sous-commandes)
+"""
+from django.dispatch import Signal
+
+order_placed = Signal()
+order_status_changed = Signal()
@@ -1,3 +1,514 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.models import Product, StockReservation
+from products.reservations import ReservationService
+from users.models import User
+from .events import OrderEventService
+from .models import ArtisanOrder, Order, OrderEvent, Payment
+from .services import PaymentService
+from .transitions import INVALID_TRANSITION, NOT_FOUND, UNCHANGED, UPDATED, OrderStatusService
+
+
+class CheckoutReservationTests(TestCase):
+    """La réservation de l'acheteur (complète, partielle, expirée) ne lui est jamais opposée"""
+
+    def setUp(self):
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.other = User.objects.create_user('other', password='x', role=User.Role.BUYER, phone='0102')
+        self.product = Product.objects.create(
+            artisan=self.artisan, name='Masque', description='d', price=1000, stock=3, category='other',
+        )
+
+    def checkout(self, quantity):
+        return PaymentService.create_order_from_cart(self.buyer, [{'product_id': self.product.pk, 'quantity': quantity}])
+
+    def assertStock(self, stock, reserved):
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved_stock), (stock, reserved))
+
+    def test_full_hold(self):
+        ReservationService.reserve(self.product.pk, 2, user=self.buyer)
+        self.checkout(2)
+        self.assertStock(1, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_partial_hold(self):
+        ReservationService.reserve(self.product.pk, 2, user=self.buyer)
+        self.checkout(3)
+        self.assertStock(0, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_hold(self):
+        ReservationService.reserve(self.product.pk, 3, user=self.buyer)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.checkout(3)
+        self.assertStock(0, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_missing_hold(self):
+        ReservationService.reserve(self.product.pk, 1, user=self.other)
+        with self.assertRaisesMessage(ValueError, 'Stock insuffisant'):
+            self.checkout(3)
+        self.assertStock(3, 1)
+        self.checkout(2)
+        self.assertStock(1, 1)
+
+    def test_refused_checkout_keeps_hold(self):
+        ReservationService.reserve(self.product.pk, 1, user=self.buyer)
+        ReservationService.reserve(self.product.pk, 2, user=self.other)
+        with self.assertRaises(ValueError):
+            self.checkout(2)
+        # Transaction annulée : la réservation de l'acheteur est intacte
+        self.assertStock(3, 3)
+        self.assertEqual(StockReservation.objects.get(user=self.buyer).quantity, 1)
+
+
+class ProcessPaymentStockTests(TestCase):
+    """Le contrôle de stock du paiement tient compte de la réservation du panier"""
+
+    def setUp(self):
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.product = Product.objects.create(
+            artisan=self.artisan, name='Masque', description='d', price=1000, stock=1, category='other',
+        )
+        self.client.force_login(self.buyer)
+
+    def test_last_unit_reserved_by_buyer(self):
+        self.client.get(f'/cart/add/{self.product.pk}/')
+        self.assertEqual(StockReservation.objects.get().quantity, 1)
+
+        response = self.client.post('/payment/process/', {'payment_method': 'orange_money'})
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(Order.objects.filter(buyer=self.buyer).exists())
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved_stock), (0, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_unit_reserved_by_another_buyer(self):
+        other = User.objects.create_user('other', password='x', role=User.Role.BUYER, phone='0102')
+        other_client = self.client_class()
+        other_client.force_login(other)
+        other_client.get(f'/cart/add/{self.product.pk}/')
+        session = self.client.session
+        session['cart'] = {str(self.product.pk): 1}
+        session.save()
+
+        response = self.client.post('/payment/process/', {'payment_method': 'orange_money'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['stock_errors'][0]['available'], 0)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderEventAppendOnlyTests(TestCase):
+    """L'historique n'est ni réécrit ni effacé, sauf avec sa commande"""
+
+    def setUp(self):
+        artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        product = Product.objects.create(
+            artisan=artisan, name='Masque', description='d', price=1000, stock=5, category='other',
+        )
+        self.order = PaymentService.create_order_from_cart(self.buyer, [{'product_id': product.pk, 'quantity': 1}])
+        self.event = OrderEventService.add_note(self.order, 'Emballage cadeau', author=self.buyer)
+
+    def test_update_refused(self):
+        self.event.message = 'Autre note'
+        with self.assertRaises(ValueError):
+            self.event.save()
+        with self.assertRaises(ValueError):
+            OrderEvent.objects.filter(pk=self.event.pk).update(message='Autre note')
+        self.assertEqual(OrderEvent.objects.get(pk=self.event.pk).message, 'Emballage cadeau')
+
+    def test_delete_refused(self):
+        with self.assertRaises(ValueError):
+            self.event.delete()
+        with self.assertRaises(ValueError):
+            self.order.events.all().delete()
+        self.assertTrue(OrderEvent.objects.filter(pk=self.event.pk).exists())
+
+    def test_cascade(self):
+        # Auteur supprimé : l'événement reste, sans auteur
+        self.buyer.orders.update(buyer=User.objects.get(username='artisan'))
+        self.buyer.delete()
+        self.event = OrderEvent.objects.get(pk=self.event.pk)
+        self.assertIsNone(self.event.author)
+
+        Order.objects.filter(pk=self.order.pk).delete()
+        self.assertFalse(OrderEvent.objects.exists())
+
+
+@override_settings(PAYMENT_PROVIDER='orders.providers.FakePaymentProvider', BACKGROUND_TASKS_EAGER=True)
+class WebsitePaymentTests(TestCase):
+    """Le paiement du site passe par PaymentService, comme l'API"""
+
+    def setUp(self):
+        artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.product = Product.objects.create(
+            artisan=artisan, name='Masque', description='d', price=1000, stock=5, category='other',
+        )
+        self.client.force_login(self.buyer)
+        self.client.get(f'/cart/add/{self.product.pk}/')
+
+    def pay(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/payment/process/', data)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.client.session['cart'], {})
+        return Order.objects.get(pk=response.json()['order_id'])
+
+    def test_paid(self):
+        order = self.pay(payment_method='orange_money', mobile_phone='0700000001')
+        payment = Payment.objects.get()
+        self.assertEqual((payment.order, payment.status), (order, Payment.Status.COMPLETED))
+        self.assertEqual(payment.phone_number, '0700000001')
+        self.assertEqual((order.status, order.payment_status), (Order.Status.PAID, Order.PaymentStatus.COMPLETED))
+        self.assertTrue(order.events.filter(kind=OrderEvent.Kind.PAYMENT).exists())
+
+    def test_failed_payment_keeps_order(self):
+        order = self.pay(payment_method='mtn_momo', mobile_phone='0700000000')
+        self.assertEqual(Payment.objects.get().status, Payment.Status.FAILED)
+        # Commande en attente d'un nouvel essai, stock toujours acquis
+        self.assertEqual((order.status, order.payment_status), (Order.Status.PENDING, Order.PaymentStatus.FAILED))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 4)
+
+    def test_cash_on_delivery(self):
+        order = self.pay(payment_method='cash_on_delivery')
+        self.assertEqual(Payment.objects.get().payment_method, Order.PaymentMethod.CASH_ON_DELIVERY)
+        self.assertEqual(order.payment_method, Order.PaymentMethod.CASH_ON_DELIVERY)
+
+    def test_unknown_method(self):
+        response = self.client.post('/payment/process/', {'payment_method': 'troc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderApiArtisanTests(TestCase):
+    """Actions paginées de l'API des commandes, vues par un artisan"""
+
+    def setUp(self):
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        product = Product.objects.create(
+            artisan=self.artisan, name='Masque', description='d', price=1000, stock=5, category='other',
+        )
+        self.order = PaymentService.create_order_from_cart(buyer, [{'product_id': product.pk, 'quantity': 1}])
+        OrderEventService.add_note(self.order, 'Emballage cadeau')
+        self.api = APIClient()
+        self.api.force_authenticate(self.artisan)
+
+    def test_list(self):
+        response = self.api.get('/api/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order['id'] for order in response.data['results']], [self.order.pk])
+
+    def test_events(self):
+        response = self.api.get(f'/api/orders/{self.order.pk}/events/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['message'], 'Emballage cadeau')
+
+    def test_delivery_confirmed_by_buyer(self):
+        self.order.status = Order.Status.PAID
+        self.order.save()
+        for status in (Order.Status.PREPARING, Order.Status.DELIVERING):
+            response = self.api.post(f'/api/orders/{self.order.pk}/update-status/', {'status': status})
+            self.assertEqual(response.status_code, 200)
+        part = self.order.artisan_orders.get()
+
+        # Ni l'API ni le tableau de bord ne laissent l'artisan déclarer la livraison
+        response = self.api.post(f'/api/orders/{self.order.pk}/update-status/', {'status': Order.Status.DELIVERED})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_login(self.artisan)
+        response = self.client.post(
+            '/dashboard/orders/change-status/', {'order_id': self.order.pk, 'status': Order.Status.DELIVERED},
+        )
+        self.assertEqual(response.status_code, 400)
+        part.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual((part.status, self.order.status), (Order.Status.DELIVERING, Order.Status.DELIVERING))
+
+        # Confirmation de l'acheteur : la commande entraîne ses parts
+        self.order.status = Order.Status.DELIVERED
+        self.order.save()
+        part.refresh_from_db()
+        self.assertEqual(part.status, Order.Status.DELIVERED)
+
+
+@override_settings(PAYMENT_PROVIDER='orders.providers.FakePaymentProvider', BACKGROUND_TASKS_EAGER=True)
+class PaymentPipelineTests(TestCase):
+    """
+    /api/orders/pay/ enregistre le paiement en attente ; le provider
+    (FakePaymentProvider) est appelé après le commit, puis le résultat est
+    appliqué une seule fois (worker, webhook ou relance).
+    """
+
+    def setUp(self):
+        artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        product = Product.objects.create(
+            artisan=artisan, name='Masque', description='d', price=1000, stock=5, category='other',
+        )
+        self.order = PaymentService.create_order_from_cart(self.buyer, [{'product_id': product.pk, 'quantity': 1}])
+        self.api = APIClient()
+        self.api.force_authenticate(self.buyer)
+
+    def pay(self, phone_number='0700000001', execute=True):
+        with self.captureOnCommitCallbacks(execute=execute) as callbacks:
+            response = self.api.post(
+                '/api/orders/pay/', {'order_id': self.order.pk, 'phone_number': phone_number}, format='json',
+            )
+        return response, callbacks
+
+    def test_pay_returns_pending_then_worker_completes(self):
+        response, callbacks = self.pay(execute=False)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['payment']['status'], Payment.Status.PENDING)
+        self.assertEqual(len(callbacks), 1)
+
+        callbacks[0]()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+        self.assertTrue(self.order.is_paid)
+        self.assertEqual(Payment.objects.get().attempts, 1)
+
+    def test_refused_payment(self):
+        self.pay(phone_number='0700000000')
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, Order.PaymentStatus.FAILED)
+        self.assertEqual(self.order.status, Order.Status.PENDING)
+
+    def test_webhook_applies_result_once(self):
+        self.pay(phone_number='0700000999')
+        payment = Payment.objects.get()
+        self.assertEqual(payment.status, Payment.Status.PENDING)
+
+        body = {'reference': payment.reference, 'status': 'SUCCESSFUL', 'transaction_id': 'TX1'}
+        with override_settings(DEBUG=True):
+            first = self.api.post('/api/payments/callback/', body, format='json')
+            second = self.api.post('/api/payments/callback/', {**body, 'status': 'FAILED'}, format='json')
+
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(second.data['status'], Payment.Status.COMPLETED)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+
+    def test_retry_redispatches_lost_job(self):
+        # Processus arrêté après le commit : le paiement n'a jamais été tenté
+        self.pay(execute=False)
+        Payment.objects.update(created_at=timezone.now() - timedelta(hours=1))
+
+        self.pay()
+
+        # Un seul envoi au provider (les agrégats s'ajoutent après le commit)
+        self.assertEqual(Payment.objects.get().attempts, 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+
+    def test_retry_does_not_redispatch_recent_attempt(self):
+        self.pay(phone_number='0700000999')
+
+        _, callbacks = self.pay(phone_number='0700000999')
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(Payment.objects.get().attempts, 1)
+
+    def test_sweeper_retries_then_gives_up(self):
+        self.pay(phone_number='0700000999')
+        with self.settings(PAYMENT_MAX_ATTEMPTS=2):
+            for _ in range(2):
+                Payment.objects.update(last_attempt_at=timezone.now() - timedelta(hours=1))
+                call_command('retry_pending_payments', stdout=StringIO())
+
+        payment = Payment.objects.get()
+        self.assertEqual(payment.status, Payment.Status.FAILED)
+        self.assertEqual(payment.attempts, 3)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, Order.PaymentStatus.FAILED)
+
+
+class OrderApiQueryTests(TestCase):
+    """Nombre de requêtes de l'API commandes, quel que soit le nombre de commandes"""
+
+    def setUp(self):
+        cache.clear()
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.products = [
+            Product.objects.create(
+                artisan=self.artisan, name=f'Masque {index}', description='d', price=1000, stock=50, category='other',
+            )
+            for index in range(2)
+        ]
+        self.api = APIClient()
+        self.add_orders(2)
+
+    def add_orders(self, count):
+        for _ in range(count):
+            PaymentService.create_order_from_cart(
+                self.buyer, [{'product_id': product.pk, 'quantity': 1} for product in self.products]
+            )
+
+    def get(self, user, url, queries):
+        cache.clear()
+        self.api.force_authenticate(user)
+        with self.assertNumQueries(queries):
+            response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_buyer_list(self):
+        # État (ETag), page, lignes avec produit et artisan, images
+        self.get(self.buyer, '/api/orders/', 4)
+        self.add_orders(3)
+        self.assertEqual(len(self.get(self.buyer, '/api/orders/', 4).data['results']), 5)
+
+    def test_artisan_list(self):
+        self.get(self.artisan, '/api/orders/', 4)
+        self.add_orders(3)
+        self.get(self.artisan, '/api/orders/', 4)
+
+    def test_retrieve(self):
+        order = Order.objects.first()
+        self.get(self.buyer, f'/api/orders/{order.pk}/', 4)
+
+
+class OrderStatusServiceTests(TestCase):
+    """Changements de statut groupés : résultat par id, historique, requêtes"""
+
+    def setUp(self):
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.other = User.objects.create_user('other', password='x', role=User.Role.ARTISAN, phone='0102')
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.product = self.product_of(self.artisan)
+        self.other_product = self.product_of(self.other)
+
+    def product_of(self, artisan):
+        return Product.objects.create(
+            artisan=artisan, name='Masque', description='d', price=1000, stock=50, category='other',
+        )
+
+    def order(self, *products, status=Order.Status.PENDING):
+        order = PaymentService.create_order_from_cart(
+            self.buyer, [{'product_id': product.pk, 'quantity': 1} for product in products]
+        )
+        if status != Order.Status.PENDING:
+            Order.objects.filter(pk=order.pk).update(status=status)
+            ArtisanOrder.objects.filter(order=order).update(status=status)
+        return order.pk
+
+    def statements(self, queries, verb, table):
+        """Requêtes `verb` portant sur `table` seule (sans jointure)"""
+        marker = {'SELECT': f' FROM "{table}" WHERE ', 'UPDATE': f'UPDATE "{table}" ', 'INSERT': f'INSERT INTO "{table}" '}[verb]
+        return [q['sql'] for q in queries if q['sql'].startswith(verb) and marker in q['sql']]
+
+    def test_batch_update_outcomes(self):
+        pending = self.order(self.product)
+        paid = self.order(self.product, status=Order.Status.PAID)
+        refunded = self.order(self.product, status=Order.Status.REFUNDED)
+        outside = self.order(self.other_product)
+
+        outcomes = OrderStatusService.batch_update(
+            Order.objects.filter(items__product__artisan=self.artisan), [pending, paid, refunded, outside, 0],
+            status=Order.Status.PAID, note='Virement reçu', author=self.artisan,
+        )
+
+        self.assertEqual(outcomes, {
+            pending: UPDATED, paid: UNCHANGED, refunded: INVALID_TRANSITION, outside: NOT_FOUND, 0: NOT_FOUND,
+        })
+        statuses = dict(Order.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[pending], statuses[refunded], statuses[outside]],
+            [Order.Status.PAID, Order.Status.REFUNDED, Order.Status.PENDING],
+        )
+        # Parts reportées sur la commande (propagate_status)
+        self.assertEqual(ArtisanOrder.objects.get(order_id=pending).status, Order.Status.PAID)
+
+        events = OrderEvent.objects.filter(author=self.artisan)
+        self.assertEqual(
+            sorted(events.filter(kind=OrderEvent.Kind.NOTE).values_list('order_id', flat=True)), [pending, paid],
+        )
+        self.assertEqual(
+            list(events.filter(kind=OrderEvent.Kind.STATUS).values_list('order_id', 'old_status', 'new_status')),
+            [(pending, Order.Status.PENDING, Order.Status.PAID)],
+        )
+
+    def test_batch_update_queries(self):
+        def update(count):
+            ids = [self.order(self.product) for _ in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                outcomes = OrderStatusService.batch_update(Order.objects.all(), ids, status=Order.Status.PAID)
+            self.assertEqual(set(outcomes.values()), {UPDATED})
+            return queries
+
+        # Première commande : crée la fiche client de l'artisan (dashboard)
+        update(1)
+        few, many = update(2), update(5)
+        self.assertEqual(len(few), len(many))
+        # Un SELECT (verrouillé) des statuts, un seul UPDATE des commandes
+        self.assertEqual(len(self.statements(many, 'SELECT', 'orders_order')), 1)
+        self.assertEqual(len(self.statements(many, 'UPDATE', 'orders_order')), 1)
+        self.assertEqual(len(self.statements(many, 'INSERT', 'orders_orderevent')), 1)
+
+    def test_batch_update_artisan(self):
+        shared = self.order(self.product, self.other_product, status=Order.Status.PAID)
+        own = self.order(self.product, status=Order.Status.PAID)
+        foreign = self.order(self.other_product, status=Order.Status.PAID)
+
+        outcomes = OrderStatusService.batch_update_artisan(
+            self.artisan, [shared, own, foreign], status=Order.Status.PREPARING, author=self.artisan,
+        )
+        self.assertEqual(outcomes, {shared: UPDATED, own: UPDATED, foreign: NOT_FOUND})
+        # La commande partagée attend la part de l'autre artisan
+        statuses = dict(Order.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[shared], statuses[own], statuses[foreign]],
+            [Order.Status.PAID, Order.Status.PREPARING, Order.Status.PAID],
+        )
+        self.assertEqual(
+            ArtisanOrder.objects.get(order_id=shared, artisan=self.other).status, Order.Status.PAID,
+        )
+
+        outcomes = OrderStatusService.batch_update_artisan(
+            self.artisan, [shared, own], status=Order.Status.DELIVERED, note='Livrée ?',
+        )
+        self.assertEqual(outcomes, {shared: INVALID_TRANSITION, own: INVALID_TRANSITION})
+        self.assertFalse(OrderEvent.objects.filter(kind=OrderEvent.Kind.NOTE).exists())
+
+        outcomes = OrderStatusService.batch_update_artisan(self.other, [shared], status=Order.Status.PREPARING)
+        self.assertEqual(outcomes, {shared: UPDATED})
+        self.assertEqual(Order.objects.get(pk=shared).status, Order.Status.PREPARING)
+        self.assertEqual(
+            list(OrderEvent.objects.filter(order_id=shared, kind=OrderEvent.Kind.STATUS).values_list('new_status', flat=True)),
+            [Order.Status.PREPARING] * 3,
+        )
+
+    def test_batch_update_artisan_queries(self):
+        def update(count):
+            ids = [self.order(self.product, status=Order.Status.PAID) for _ in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                outcomes = OrderStatusService.batch_update_artisan(self.artisan, ids, status=Order.Status.PREPARING)
+            self.assertEqual(set(outcomes.values()), {UPDATED})
+            return queries
+
+        few, many = update(2), update(5)
+        self.assertEqual(len(few), len(many))
+        # Parts verrouillées puis lues par sync_orders, qui ne les repropage pas
+        self.assertEqual(len(self.statements(many, 'SELECT', 'orders_artisanorder')), 2)
+        self.assertEqual(len(self.statements(many, 'UPDATE', 'orders_artisanorder')), 1)
+        self.assertEqual(len(self.statements(many, 'UPDATE', 'orders_order')), 1)
@@ -0,0 +1,221 @@
+# orders/transitions.py
+"""
+Changements de statut groupés (tableau de bord, expédition d'un jour de
+marché).
+
+Le nombre de requêtes ne dépend pas du nombre de commandes : un SELECT
+(verrouillé) lit les statuts actuels, les transitions sont vérifiées
+contre Order.ALLOWED_TRANSITIONS, un seul UPDATE les applique et les
+notes et changements sont ajoutés à l'historique (orders.events) par
+des INSERT groupés. Order.note n'est plus réécrit.
+
+Commandes de plusieurs artisans : chaque artisan fait avancer sa
+sous-commande (ArtisanOrder) sans verrouiller ni modifier celles des
+autres (batch_update_artisan). La commande prend le statut de sa part la
+moins avancée (sync_orders) ; à l'inverse, un changement au niveau de la
+commande (paiement, annulation, remboursement) est reporté sur les parts
+en retard (propagate_status).
+
+Chaque id reçoit un résultat :
+    updated             statut modifié
+    unchanged           déjà au statut demandé (la note est ajoutée)
+    invalid_transition  transition refusée, commande inchangée
+    not_found           commande inconnue ou hors du périmètre de l'artisan
+"""
+import logging
+
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .events import OrderEventService
+from .models import ArtisanOrder, Order
+from .services import PaymentService
+from .signals import order_status_changed
+
+logger = logging.getLogger(__name__)
+
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+INVALID_TRANSITION = 'invalid_transition'
+NOT_FOUND = 'not_found'
+
+
+def parse_ids(value):
+    """"12, 13,,x" -> ([12, 13], ['x'])"""
+    ids, invalid = [], []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if part.isdigit():
+            ids.append(int(part))
+        else:
+            invalid.append(part)
+    return list(dict.fromkeys(ids)), invalid
+
+
+class OrderStatusService:
+
+    @classmethod
+    def can_transition(cls, old_status, new_status):
+        return new_status in Order.ALLOWED_TRANSITIONS.get(old_status, ())
+
+    @classmethod
+    @transaction.atomic
+    def batch_update(cls, orders, order_ids, status=None, note='', author=None):
+        """
+        Applique `status` et/ou `note` aux commandes `order_ids` parmi le
+        queryset `orders` (périmètre de l'utilisateur).
+        Retourne {order_id: résultat} (voir le module).
+        """
+        if status and status not in Order.Status.values:
+            raise ValueError(f"Statut inconnu : {status}")
+
+        current = dict(
+            orders.filter(pk__in=order_ids).select_for_update(of=('self',)).order_by('pk').values_list('pk', 'status')
+        )
+        outcomes = {}
+        transitions = {}
+        for order_id in order_ids:
+            old_status = current.get(order_id)
+            if old_status is None:
+                outcomes[order_id] = NOT_FOUND
+            elif not status or status == old_status:
+                outcomes[order_id] = UNCHANGED
+            elif cls.can_transition(old_status, status):
+                outcomes[order_id] = UPDATED
+                transitions[order_id] = (old_status, status)
+            else:
+                outcomes[order_id] = INVALID_TRANSITION
+
+        if transitions:
+            Order.objects.filter(pk__in=transitions).update(status=status, updated_at=timezone.now())
+            if status == Order.Status.CANCELLED:
+                PaymentService.restore_orders_stock(list(transitions))
+
+        if note:
+            OrderEventService.add_notes(
+                [order_id for order_id, outcome in outcomes.items() if outcome in (UPDATED, UNCHANGED)],
+                note,
+                author=author,
+            )
+
+        if transitions:
+            # Historique (orders.events) et agrégats de ventes
+            order_status_changed.send(sender=Order, transitions=transitions, author=author)
+            logger.info(f"{len(transitions)} commande(s) passée(s) au statut {status}")
+        return outcomes
+
+    @classmethod
+    def can_transition_part(cls, old_status, new_status):
+        return new_status in ArtisanOrder.ALLOWED_TRANSITIONS.get(old_status, ())
+
+    @classmethod
+    @transaction.atomic
+    def batch_update_artisan(cls, artisan, order_ids, status=None, note='', author=None):
+        """
+        Comme batch_update, sur les sous-commandes de `artisan` : seules
+        ses lignes ArtisanOrder sont verrouillées et modifiées, puis les
+        commandes concernées sont synchronisées (sync_orders).
+        """
+        if status and status not in Order.Status.values:
+            raise ValueError(f"Statut inconnu : {status}")
+
+        current = dict(
+            ArtisanOrder.objects.filter(artisan=artisan, order_id__in=order_ids)
+            .select_for_update().order_by('order_id').values_list('order_id', 'status')
+        )
+        outcomes = {}
+        transitions = {}
+        for order_id in order_ids:
+            old_status = current.get(order_id)
+            if old_status is None:
+                outcomes[order_id] = NOT_FOUND
+            elif not status or status == old_status:
+                outcomes[order_id] = UNCHANGED
+            elif cls.can_transition_part(old_status, status):
+                outcomes[order_id] = UPDATED
+                transitions[order_id] = (old_status, status)
+            else:
+                outcomes[order_id] = INVALID_TRANSITION
+
+        if transitions:
+            ArtisanOrder.objects.filter(artisan=artisan, order_id__in=transitions).update(
+                status=status, updated_at=timezone.now()
+            )
+            OrderEventService.record_artisan_transitions(artisan, transitions, author=author)
+
+        if note:
+            OrderEventService.add_notes(
+                [order_id for order_id, outcome in outcomes.items() if outcome in (UPDATED, UNCHANGED)],
+                note,
+                author=author,
+            )
+
+        if transitions:
+            cls.sync_orders(list(transitions), author=author)
+            logger.info(f"{artisan.username} : {len(transitions)} sous-commande(s) passée(s) au statut {status}")
+        return outcomes
+
+    @classmethod
+    @transaction.atomic
+    def sync_orders(cls, order_ids, author=None):
+        """
+        Avance chaque commande au statut de sa sous-commande la moins
+        avancée (une commande n'est livrée que quand toutes ses parts le
+        sont). La ligne Order est verrouillée le temps du calcul : deux
+        artisans qui terminent en même temps ne laissent pas la commande
+        en retard. Retourne {order_id: (ancien, nouveau)}.
+        """
+        current = dict(
+            Order.objects.filter(pk__in=order_ids).select_for_update().order_by('pk').values_list('pk', 'status')
+        )
+        parts = {}
+        for order_id, status in ArtisanOrder.objects.filter(order_id__in=current).values_list('order_id', 'status'):
+            parts.setdefault(order_id, []).append(status)
+
+        transitions = {}
+        for order_id, statuses in parts.items():
+            old_status = current[order_id]
+            if old_status not in Order.PROGRESS or any(status not in Order.PROGRESS for status in statuses):
+                continue
+            new_status = min(statuses, key=Order.PROGRESS.index)
+            if Order.PROGRESS.index(new_status) > Order.PROGRESS.index(old_status):
+                transitions[order_id] = (old_status, new_status)
+
+        # Un UPDATE par statut atteint
+        for new_status in {new_status for _, new_status in transitions.values()}:
+            Order.objects.filter(
+                pk__in=[order_id for order_id, (_, status) in transitions.items() if status == new_status]
+            ).update(status=new_status, updated_at=timezone.now())
+        if transitions:
+            order_status_changed.send(sender=Order, transitions=transitions, author=author, synced=True)
+        return transitions
+
+
+@receiver(order_status_changed)
+def propagate_status(sender, transitions, synced=False, **kwargs):
+    """
+    Reporte le statut de la commande sur ses sous-commandes en retard :
+    paiement (parts en attente), annulation et remboursement (toutes les
+    parts), avancement décidé au niveau de la commande (parts moins
+    avancées). Un UPDATE par statut ; rien à faire après sync_orders (la
+    commande a rejoint sa part la moins avancée).
+    """
+    if synced:
+        return
+    by_status = {}
+    for order_id, (_, new_status) in transitions.items():
+        by_status.setdefault(new_status, []).append(order_id)
+
+    now = timezone.now()
+    for new_status, order_ids in by_status.items():
+        parts = ArtisanOrder.objects.filter(order_id__in=order_ids)
+        if new_status in Order.VOID_STATUSES:
+            parts = parts.exclude(status=new_status)
+        elif new_status in Order.PROGRESS:
+            parts = parts.filter(status__in=Order.PROGRESS[:Order.PROGRESS.index(new_status)])
+        else:
+            continue
+        parts.update(status=new_status, updated_at=now)
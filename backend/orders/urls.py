@@ -1,11 +1,22 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet, PaymentMethodViewSet
+from core.async_api import async_read_view
+from .views import OrderViewSet, PaymentMethodViewSet, payment_callback
 
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'payment-methods', PaymentMethodViewSet, basename='payment-method')
 
 urlpatterns = [
+    path('payments/callback/', payment_callback, name='payment_callback'),
+]
+if settings.ASYNC_API_VIEWS:
+    # Historique des commandes en asynchrone (profil ASGI)
+    urlpatterns += [
+        path('orders/', async_read_view(OrderViewSet, {'get': 'list', 'post': 'create'}, 'list')),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
 ]
@@ -1,10 +1,13 @@
 # orders/views.py
 from products.models import Product
+from products.reservations import ReservationService
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.conf import settings
 from django.db import transaction
+from django.db.models import F, Prefetch
 from django.utils import timezone
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
@@ -12,31 +15,54 @@ from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_protect
 from django.http import JsonResponse
 from django.contrib import messages
+import hashlib
+import hmac
 import json
 import logging
 
+from core.conditional import ConditionalGetMixin
+from core.mixins import QueryPlanMixin
 from .models import Order, OrderItem
 from users.models import Address  # Correction: Address est dans users.models
-from .serializers import OrderSerializer, OrderItemSerializer
+from .events import OrderEventService
+from .serializers import OrderEventSerializer, OrderSerializer, OrderItemSerializer, PaymentSerializer
 from .services import PaymentService
+from .transitions import OrderStatusService
 
 logger = logging.getLogger(__name__)
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    # Relations lues par OrderSerializer / OrderItemSerializer
+    select_related_fields = ('buyer',)
+    prefetch_related_fields = (
+        Prefetch('items', queryset=OrderItem.objects.select_related('product', 'artisan')),
+        'items__product__images',
+    )
+
+    @property
+    def cursor_ordering(self):
+        if self.action == 'list' and self.request.user.role == 'artisan':
+            # Index (artisan, created_at, id) de ArtisanOrder, voir get_queryset
+            return ('-artisan_created_at', '-artisan_order_id')
+        # Autres actions paginées (events) : (created_at, id) du queryset paginé
+        return ('-created_at', '-id')
 
     def get_queryset(self):
         user = self.request.user
         if user.role == 'artisan':
-            # Artisan voit les commandes contenant ses produits
-            return Order.objects.filter(
-                items__artisan=user
-            ).distinct().order_by('-created_at')
+            # Artisan voit les commandes contenant ses produits : une ligne
+            # ArtisanOrder par commande, lue dans l'ordre de son index
+            queryset = Order.objects.filter(artisan_orders__artisan=user).annotate(
+                artisan_created_at=F('artisan_orders__created_at'),
+                artisan_order_id=F('artisan_orders__id'),
+            ).order_by('-artisan_created_at', '-artisan_order_id')
         else:
             # Acheteur voit ses propres commandes
-            return Order.objects.filter(buyer=user).order_by('-created_at')
+            queryset = Order.objects.filter(buyer=user).order_by('-created_at')
+        return self.apply_query_plan(queryset)
 
     @transaction.atomic
     def create(self, request, *args, **kwargs):
@@ -115,18 +141,19 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            result = PaymentService.process_payment(
+            payment = PaymentService.process_payment(
                 order=order,
                 payment_method=payment_method,
                 phone_number=phone_number
             )
             
+            # Le provider est appelé en arrière-plan : suivre l'état via
+            # GET /api/orders/{id}/payment/ (ou le statut de la commande)
             return Response({
                 "success": True,
-                "message": "Paiement effectué avec succès",
-                "transaction_id": result['transaction_id'],
-                "order": OrderSerializer(order).data
-            })
+                "message": "Paiement en cours de traitement",
+                "payment": PaymentSerializer(payment).data,
+            }, status=status.HTTP_202_ACCEPTED)
             
         except ValueError as e:
             return Response(
@@ -134,6 +161,32 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=True, methods=['get'], url_path='payment')
+    def payment_state(self, request, pk=None):
+        """
+        GET /api/orders/{id}/payment/
+        Dernier paiement de la commande
+        """
+        order = self.get_object()
+        payment = order.payments.order_by('-created_at').first()
+        if payment is None:
+            return Response(
+                {"error": "Aucun paiement pour cette commande"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(PaymentSerializer(payment).data)
+
+    @action(detail=True, methods=['get'])
+    def events(self, request, pk=None):
+        """
+        GET /api/orders/{id}/events/
+        Historique de la commande (statuts, notes, paiements, suivi), du plus
+        récent au plus ancien, paginé par curseur
+        """
+        order = self.get_object()
+        page = self.paginate_queryset(OrderEventService.timeline(order))
+        return self.get_paginated_response(OrderEventSerializer(page, many=True).data)
+
     @action(detail=True, methods=['post'], url_path='cancel')
     def cancel_order(self, request, pk=None):
         """
@@ -151,7 +204,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         reason = request.data.get('reason', 'Annulation par le client')
 
         try:
-            order = PaymentService.cancel_order(order, reason)
+            order = PaymentService.cancel_order(order, reason, author=request.user)
             return Response({
                 "success": True,
                 "message": "Commande annulée avec succès",
@@ -185,6 +238,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         try:
             order.status = Order.Status.DELIVERED
+            order.changed_by = request.user
             order.save()
             
             # Libérer l'escrow pour payer les artisans
@@ -217,28 +271,76 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        valid_transitions = {
-            Order.Status.PAID: [Order.Status.PREPARING],
-            Order.Status.PREPARING: [Order.Status.DELIVERING],
-        }
+        # Sous-commande de l'artisan : les parts des autres artisans ne
+        # sont ni verrouillées ni modifiées (orders.transitions)
+        part = order.artisan_orders.filter(artisan=request.user).first()
+        if part is None:
+            return Response(
+                {"error": "Aucun produit de cet artisan dans la commande"},
+                status=status.HTTP_403_FORBIDDEN
+            )
         
-        allowed = valid_transitions.get(order.status, [])
-        if new_status not in allowed:
+        # La livraison est confirmée par l'acheteur (confirm-delivery)
+        if not OrderStatusService.can_transition_part(part.status, new_status):
             return Response(
-                {"error": f"Transition de statut non autorisée"},
+                {"error": "Transition de statut non autorisée"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        order.status = new_status
-        order.save()
+        OrderStatusService.batch_update_artisan(request.user, [order.pk], status=new_status, author=request.user)
+        part.refresh_from_db(fields=['status'])
+        order.refresh_from_db()
         
         return Response({
             "success": True,
-            "message": f"Statut mis à jour: {order.get_status_display()}",
+            "message": f"Statut mis à jour: {part.get_status_display()}",
             "order": OrderSerializer(order).data
         })
 
 
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def payment_callback(request):
+    """
+    POST /api/payments/callback/
+    Webhook des providers de paiement.
+    Body: reference, status ('SUCCESSFUL' / 'FAILED'), transaction_id, error
+    Signature: en-tête X-Payment-Signature = HMAC-SHA256 du corps brut
+    avec PAYMENT_WEBHOOK_SECRET.
+    """
+    secret = getattr(settings, 'PAYMENT_WEBHOOK_SECRET', '')
+    if secret:
+        expected = hmac.new(secret.encode(), request.body, hashlib.sha256).hexdigest()
+        signature = request.headers.get('X-Payment-Signature', '')
+        if not hmac.compare_digest(expected, signature):
+            return Response({"error": "Signature invalide"}, status=status.HTTP_403_FORBIDDEN)
+    elif not settings.DEBUG:
+        return Response({"error": "Webhook non configuré"}, status=status.HTTP_403_FORBIDDEN)
+
+    reference = request.data.get('reference')
+    provider_status = str(request.data.get('status', '')).upper()
+    if not reference or provider_status not in ('SUCCESSFUL', 'FAILED'):
+        return Response(
+            {"error": "reference et status (SUCCESSFUL/FAILED) requis"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        payment = PaymentService.apply_payment_result(
+            reference=reference,
+            success=provider_status == 'SUCCESSFUL',
+            transaction_id=request.data.get('transaction_id'),
+            error=request.data.get('error', ''),
+            provider_response=dict(request.data),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+    # Toujours 200 pour un paiement connu, même déjà traité (idempotence)
+    return Response(PaymentSerializer(payment).data)
+
+
 class PaymentMethodViewSet(viewsets.ViewSet):
     """
     Liste les méthodes de paiement disponibles
@@ -298,19 +400,20 @@ def payment(request):
     cart_items = []
     subtotal = 0
     
+    # Un seul chargement pour tout le panier (images préchargées pour le template)
+    products = Product.objects.prefetch_related('images').in_bulk(list(cart.keys()))
     for product_id, item in cart.items():
-        try:
-            product = Product.objects.get(pk=product_id)
-            item_total = product.price * item['quantity']
-            cart_items.append({
-                'product': product,
-                'quantity': item['quantity'],
-                'total': item_total,
-                'options': item.get('options', {})
-            })
-            subtotal += item_total
-        except Product.DoesNotExist:
+        product = products.get(int(product_id))
+        if product is None:
             continue
+        item_total = product.price * item['quantity']
+        cart_items.append({
+            'product': product,
+            'quantity': item['quantity'],
+            'total': item_total,
+            'options': item.get('options', {})
+        })
+        subtotal += item_total
     
     # Frais de livraison (exemple: gratuit au-dessus de 50000 FCFA)
     shipping_cost = 0 if subtotal >= 50000 else 2500
@@ -346,7 +449,12 @@ def process_payment(request):
         # Récupérer les données du formulaire
         data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
         
+        # Le formulaire du site nomme 'cash_on_delivery' le paiement à la livraison
         payment_method = data.get('payment_method', 'card')
+        if payment_method == 'cash_on_delivery':
+            payment_method = Order.PaymentMethod.CASH_ON_DELIVERY
+        if payment_method not in Order.PaymentMethod.values:
+            return JsonResponse({'success': False, 'error': 'Moyen de paiement inconnu'}, status=400)
         
         # Informations de livraison
         shipping_data = {
@@ -360,37 +468,33 @@ def process_payment(request):
             'country': data.get('shipping_country', 'Côte d\'Ivoire'),
         }
         
-        # Vérifier le stock avant de procéder
+        # Vérifier le stock disponible (stock - réservations des autres
+        # acheteurs : celles de ce panier seront converties à la commande)
         stock_errors = []
-        cart_items = []
+        cart_lines = []
         subtotal = 0
+        products = Product.objects.in_bulk([int(pid) for pid in cart.keys()])
+        available = ReservationService.available_for(
+            products.values(), user=request.user, session_key=request.session.session_key
+        )
         
         for product_id, item in cart.items():
-            try:
-                product = Product.objects.select_for_update().get(pk=product_id)
-                quantity = item['quantity']
-                
-                if product.stock < quantity:
-                    stock_errors.append({
-                        'product': product.name,
-                        'requested': quantity,
-                        'available': product.stock
-                    })
-                else:
-                    item_total = product.price * quantity
-                    cart_items.append({
-                        'product': product,
-                        'quantity': quantity,
-                        'price': product.price,
-                        'total': item_total,
-                        'options': item.get('options', {})
-                    })
-                    subtotal += item_total
-            except Product.DoesNotExist:
+            product = products.get(int(product_id))
+            quantity = item['quantity'] if isinstance(item, dict) else int(item)
+            if product is None:
                 stock_errors.append({
                     'product': f'Produit #{product_id}',
                     'error': 'Produit introuvable'
                 })
+            elif available[product.id] < quantity:
+                stock_errors.append({
+                    'product': product.name,
+                    'requested': quantity,
+                    'available': available[product.id]
+                })
+            else:
+                cart_lines.append({'product_id': product.id, 'quantity': quantity})
+                subtotal += product.price * quantity
         
         if stock_errors:
             return JsonResponse({
@@ -399,25 +503,18 @@ def process_payment(request):
                 'stock_errors': stock_errors
             }, status=400)
         
-        # Calculer les frais et le total
+        # Calculer les frais
         shipping_cost = 0 if subtotal >= 50000 else 2500
-        total = subtotal + shipping_cost
         
-        # Créer la commande
-        with transaction.atomic():
-            # Générer un numéro de commande unique
-            import uuid
-            order_number = f"NSK-{uuid.uuid4().hex[:8].upper()}"
-            
-            order = Order.objects.create(
-                order_number=order_number,
-                buyer=request.user,
-                status='pending',
-                subtotal=subtotal,
-                shipping_cost=shipping_cost,
-                total_amount=total,  # CORRECTION ICI: total_amount au lieu de total
+        # Créer la commande : les réservations du panier sont converties,
+        # le reste du stock est décrémenté en un seul UPDATE conditionnel
+        try:
+            order = PaymentService.create_order_from_cart(
+                user=request.user,
+                cart_items=cart_lines,
                 payment_method=payment_method,
-                payment_status='pending',
+                session_key=request.session.session_key,
+                shipping_cost=shipping_cost,
                 shipping_first_name=shipping_data['first_name'],
                 shipping_last_name=shipping_data['last_name'],
                 shipping_email=shipping_data['email'],
@@ -427,60 +524,29 @@ def process_payment(request):
                 shipping_postal_code=shipping_data['postal_code'],
                 shipping_country=shipping_data['country'],
             )
-            
-            # Créer les items de commande et diminuer le stock
-            for item in cart_items:
-                product = item['product']
-                quantity = item['quantity']
-                
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    price=item['price'],
-                    total=item['total'],
-                    options=item.get('options', {})
-                )
-                
-                # DIMINUER LE STOCK
-                product.stock -= quantity
-                product.save(update_fields=['stock'])
-                
-                logger.info(f"Stock mis à jour pour {product.name}: -{quantity} (nouveau stock: {product.stock})")
-            
-            # Simuler le traitement du paiement selon la méthode
-            payment_success = simulate_payment(payment_method, total, data)
-            
-            if payment_success:
-                order.payment_status = 'completed'
-                order.status = 'paid'
-                order.save()
-                
-                # Vider le panier
-                request.session['cart'] = {}
-                request.session.modified = True
-                
-                return JsonResponse({
-                    'success': True,
-                    'order_id': order.id,
-                    'order_number': order.order_number,
-                    'redirect_url': f'/confirmation/?order={order.order_number}'
-                })
-            else:
-                # Annuler la commande et restaurer le stock
-                for item in cart_items:
-                    product = item['product']
-                    product.stock += item['quantity']
-                    product.save(update_fields=['stock'])
-                
-                order.payment_status = 'failed'
-                order.status = 'cancelled'
-                order.save()
-                
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Le paiement a échoué. Veuillez réessayer.'
-                }, status=400)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        
+        # Même chemin que l'API : paiement enregistré, provider appelé par un
+        # worker, résultat appliqué par apply_payment_result. Un échec laisse
+        # la commande en attente, l'acheteur peut relancer le paiement.
+        payment = PaymentService.process_payment(
+            order=order,
+            payment_method=payment_method,
+            phone_number=data.get('mobile_phone') or shipping_data['phone'],
+        )
+        
+        # Vider le panier : le stock est acquis à la commande
+        request.session['cart'] = {}
+        request.session.modified = True
+        
+        return JsonResponse({
+            'success': True,
+            'order_id': order.id,
+            'order_number': order.order_number,
+            'payment_reference': payment.reference,
+            'redirect_url': f'/confirmation/?order={order.order_number}'
+        })
     
     except json.JSONDecodeError:
         return JsonResponse({'success': False, 'error': 'Données invalides'}, status=400)
@@ -489,40 +555,6 @@ def process_payment(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
-def simulate_payment(payment_method, amount, data):
-    """
-    Simuler le traitement du paiement
-    En production, intégrer avec les vrais services de paiement
-    """
-    # Pour la démo, on simule un succès
-    # En production, intégrer:
-    # - Orange Money API
-    # - MTN MoMo API
-    # - Stripe/PayPal pour cartes
-    
-    if payment_method == 'orange_money':
-        phone = data.get('mobile_phone', '')
-        # Intégrer Orange Money API ici
-        return True
-    
-    elif payment_method == 'mtn_momo':
-        phone = data.get('mobile_phone', '')
-        # Intégrer MTN MoMo API ici
-        return True
-    
-    elif payment_method == 'card':
-        # Intégrer Stripe/autre gateway ici
-        card_number = data.get('card_number', '')
-        # Validation basique pour la démo
-        return True
-    
-    elif payment_method == 'cash_on_delivery':
-        # Paiement à la livraison - toujours accepté
-        return True
-    
-    return False
-
-
 @login_required
 def confirmation(request):
     """Page de confirmation de commande"""
@@ -534,7 +566,7 @@ def confirmation(request):
     
     try:
         order = Order.objects.get(order_number=order_number, buyer=request.user)
-        order_items = order.items.all()
+        order_items = order.items.select_related('product').prefetch_related('product__images')
         
         context = {
             'order': order,
@@ -557,10 +589,14 @@ def check_stock(request):
             quantity = data.get('quantity', 1)
             
             product = Product.objects.get(pk=product_id)
+            # La réservation du panier de l'acheteur reste disponible pour lui
+            stock = ReservationService.available_for(
+                [product], user=request.user, session_key=request.session.session_key
+            )[product.id]
             
             return JsonResponse({
-                'available': product.stock >= quantity,
-                'stock': product.stock,
+                'available': stock >= quantity,
+                'stock': stock,
                 'product_name': product.name
             })
         except Product.DoesNotExist:
@@ -1,6 +1,8 @@
 from django.contrib import admin
-from .models import Product, ProductImage
+from .models import Product, ProductImage, StockReservation, VideoTranscodeJob
 
 # Register your models here.
 admin.site.register(Product)
-admin.site.register(ProductImage)
\ No newline at end of file
+admin.site.register(ProductImage)
+admin.site.register(StockReservation)
+admin.site.register(VideoTranscodeJob)
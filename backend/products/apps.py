@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ProductsConfig(AppConfig):
     name = 'products'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from core.images import register
+
+        register(self.get_model('ProductImage'), 'image', 'variants')
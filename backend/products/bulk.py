@@ -0,0 +1,347 @@
+# products/bulk.py
+"""
+Import et export du catalogue en masse (artisans, agents communautaires).
+
+Import : POST /api/products/import/ (multipart)
+    file    CSV avec en-tête, ou JSON lines (un objet par ligne)
+    images  archive zip facultative ; la colonne `images` d'une ligne
+            nomme ses fichiers dans l'archive (séparés par | en CSV), ou
+            des images déjà stockées (noms donnés par l'export)
+
+Le fichier est lu ligne à ligne et traité par lots de
+PRODUCT_IMPORT_BATCH_SIZE : validation, artisans lus en une requête,
+images rangées comme les envois (products.uploads), puis un bulk_create
+des produits et un des images par lot. Une ligne invalide n'arrête pas
+l'import : elle figure dans le rapport avec son numéro de ligne.
+
+Export : GET /api/products/export/?type=csv|jsonl, en flux (produits lus
+par blocs, mémoire constante). Le fichier exporté se réimporte sans
+archive : `images` donne les noms des fichiers stockés, retrouvés tels
+quels. L'import crée toujours de nouveaux produits : les colonnes `id`,
+`created_at` et `updated_at` de l'export sont ignorées, comme toute
+colonne inconnue, et listées dans `ignored_columns` du rapport.
+"""
+import codecs
+import csv
+import json
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+
+from core.images import schedule_for
+from core.streaming import Echo, batches
+from users.models import User
+from .models import Product, ProductImage
+from .search import get_search_backend
+from .serializers import ProductImportRowSerializer
+from .uploads import UploadError, UploadService, chunk_size, max_upload_size
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 500
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+LIST_COLUMNS = ('tags', 'images')
+LIST_SEPARATOR = '|'
+EXPORT_COLUMNS = (
+    'id', 'artisan', 'name', 'description', 'price', 'stock', 'category',
+    'is_limited_edition', 'limited_quantity', 'origin', 'tags', 'images',
+    'created_at', 'updated_at',
+)
+# Colonnes acceptées à l'import (les autres figurent dans ignored_columns)
+IMPORT_COLUMNS = frozenset(ProductImportRowSerializer.Meta.fields)
+# Rôles autorisés à importer / exporter (agents et administrateurs : pour tout artisan)
+CATALOG_MANAGERS = (User.Role.COMMUNITY_AGENT, User.Role.ADMIN)
+
+
+class BulkImportError(ValueError):
+    pass
+
+
+def batch_size():
+    return getattr(settings, 'PRODUCT_IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def manages_catalog(user):
+    """Agent communautaire ou administrateur : agit pour tous les artisans"""
+    return user.is_staff or user.role in CATALOG_MANAGERS
+
+
+def can_bulk_edit(user):
+    return user.is_authenticated and (user.role == User.Role.ARTISAN or manages_catalog(user))
+
+
+def file_format(filename, requested=None):
+    """'csv' ou 'jsonl', d'après ?type= ou l'extension du fichier"""
+    if requested:
+        if requested not in FORMATS.values():
+            raise BulkImportError(f"Format inconnu : {requested} (csv ou jsonl)")
+        return requested
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in FORMATS:
+        raise BulkImportError("Fichier .csv ou .jsonl attendu")
+    return FORMATS[extension]
+
+
+def read_rows(fileobj, file_format):
+    """
+    (numéro de ligne, données ou message d'erreur), au fil du fichier.
+    Les cellules CSV vides sont omises (valeur par défaut du modèle).
+    """
+    lines = codecs.iterdecode(fileobj, 'utf-8-sig')
+    try:
+        if file_format == 'csv':
+            reader = csv.DictReader(lines)
+            for row in reader:
+                data = {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                for column in LIST_COLUMNS:
+                    if column in data:
+                        data[column] = [item.strip() for item in data[column].split(LIST_SEPARATOR) if item.strip()]
+                yield reader.line_num, data
+        else:
+            for line_number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError as e:
+                    yield line_number, f"JSON invalide : {e}"
+                    continue
+                yield line_number, data if isinstance(data, dict) else "Objet JSON attendu"
+    except UnicodeDecodeError:
+        raise BulkImportError("Le fichier doit être encodé en UTF-8")
+    except csv.Error as e:
+        raise BulkImportError(f"CSV invalide : {e}")
+
+
+class ImageArchive:
+    """
+    Images d'un zip, désignées par leur chemin ou leur nom de fichier.
+    Chaque image est extraite dans un fichier temporaire (mémoire bornée),
+    rangée une seule fois, puis réutilisée par les lignes suivantes.
+    Un nom absent de l'archive peut désigner une image déjà stockée
+    (products/<sha256>.<ext>, colonne `images` de l'export).
+    """
+
+    def __init__(self, fileobj=None):
+        self.members = {}
+        self.stored = {}
+        self.existing = {}
+        if fileobj is None:
+            self.zip = None
+            return
+        try:
+            self.zip = zipfile.ZipFile(fileobj)
+        except (zipfile.BadZipFile, OSError):
+            raise BulkImportError("L'archive d'images doit être un fichier zip")
+        for info in self.zip.infolist():
+            if not info.is_dir():
+                self.members.setdefault(info.filename, info)
+                self.members.setdefault(os.path.basename(info.filename), info)
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+
+    def load_existing(self, names):
+        """Images déjà stockées parmi `names` hors archive, en une requête par lot"""
+        paths = {
+            f"products/{os.path.basename(name)}": name
+            for name in names if name not in self.members and name not in self.existing
+        }
+        if not paths:
+            return
+        found = ProductImage.objects.filter(image__in=paths).values_list('image', 'content_hash').distinct()
+        for path, content_hash in found:
+            self.existing[paths[path]] = (path, content_hash)
+
+    def store(self, name):
+        """(nom dans le stockage, hash) de l'image `name` ; UploadError sinon"""
+        info = self.members.get(name)
+        if info is None:
+            if name in self.existing:
+                return self.existing[name]
+            raise UploadError(f"Image absente de l'archive : {name}")
+        if info.filename not in self.stored:
+            if info.file_size > max_upload_size():
+                raise UploadError(f"Image trop volumineuse : {name}")
+            with self.zip.open(info) as source, tempfile.SpooledTemporaryFile(max_size=chunk_size()) as spool:
+                shutil.copyfileobj(source, spool, chunk_size())
+                self.stored[info.filename] = UploadService.store(spool)
+        return self.stored[info.filename]
+
+
+class ProductImportService:
+
+    @classmethod
+    def import_file(cls, user, fileobj, file_format, archive=None):
+        """
+        Importe les produits de `fileobj` pour `user` (voir le module).
+        Retourne {'rows', 'created', 'product_ids', 'errors': [{'line', 'errors'}], 'ignored_columns'}.
+        """
+        report = {'rows': 0, 'created': 0, 'product_ids': [], 'errors': [], 'ignored_columns': set()}
+        with cls._open_archive(archive) as images:
+            for batch in batches(read_rows(fileobj, file_format), batch_size()):
+                report['rows'] += len(batch)
+                cls._import_batch(user, batch, images, report)
+        report['errors'].sort(key=lambda error: error['line'])
+        report['ignored_columns'] = sorted(report['ignored_columns'])
+        logger.info(
+            f"Import de {user.username} : {report['created']} produit(s) créé(s), "
+            f"{len(report['errors'])} ligne(s) en erreur"
+        )
+        return report
+
+    @classmethod
+    @contextmanager
+    def _open_archive(cls, fileobj):
+        images = ImageArchive(fileobj)
+        try:
+            yield images
+        finally:
+            images.close()
+
+    @classmethod
+    def _import_batch(cls, user, batch, images, report):
+        def fail(line, errors):
+            report['errors'].append({'line': line, 'errors': errors})
+
+        rows = []
+        for line, data in batch:
+            if isinstance(data, str):
+                fail(line, {'non_field_errors': [data]})
+                continue
+            report['ignored_columns'].update(data.keys() - IMPORT_COLUMNS)
+            serializer = ProductImportRowSerializer(data=data)
+            if not serializer.is_valid():
+                fail(line, serializer.errors)
+                continue
+            rows.append((line, serializer.validated_data))
+
+        artisans = cls._artisans(user, [row.get('artisan', '') for _, row in rows])
+        images.load_existing({name for _, row in rows for name in row.get('images', [])})
+        products, product_images = [], []
+        for line, row in rows:
+            reference = row.pop('artisan', '')
+            artisan = artisans.get(reference)
+            if artisan is None:
+                fail(line, {'artisan': [cls._artisan_error(user, reference)]})
+                continue
+            try:
+                stored = [images.store(name) for name in row.pop('images', [])]
+            except UploadError as e:
+                fail(line, {'images': [str(e)]})
+                continue
+            products.append(Product(artisan=artisan, **row))
+            product_images.append(stored)
+
+        if not products:
+            return
+        with transaction.atomic():
+            Product.objects.bulk_create(products)
+            created_images = ProductImage.objects.bulk_create([
+                ProductImage(product=product, image=name, content_hash=content_hash, is_main=index == 0)
+                for product, stored in zip(products, product_images)
+                for index, (name, content_hash) in enumerate(stored)
+            ])
+            # bulk_create n'envoie pas post_save : index et variantes ici
+            # (cache catalogue : ProductQuerySet.bulk_create)
+            transaction.on_commit(lambda: cls._after_create(products, created_images))
+        report['created'] += len(products)
+        report['product_ids'] += [product.pk for product in products]
+
+    @classmethod
+    def _after_create(cls, products, created_images):
+        get_search_backend().index_products(products)
+        schedule_for(created_images)
+
+    @classmethod
+    def _artisans(cls, user, references):
+        """
+        {référence: artisan} en une requête. Un artisan importe pour
+        lui-même (colonne vide) ; un agent désigne l'artisan par id,
+        nom d'utilisateur ou téléphone.
+        """
+        if not manages_catalog(user):
+            return {'': user, str(user.pk): user, user.username: user}
+        references = {reference for reference in references if reference}
+        if not references:
+            return {}
+        artisans = User.objects.filter(role=User.Role.ARTISAN, is_active=True).filter(
+            Q(username__in=references)
+            | Q(phone__in=references)
+            | Q(pk__in=[reference for reference in references if reference.isdigit()])
+        )
+        found = {}
+        for artisan in artisans:
+            for reference in (str(artisan.pk), artisan.username, artisan.phone):
+                if reference in references:
+                    found[reference] = artisan
+        return found
+
+    @classmethod
+    def _artisan_error(cls, user, reference):
+        if not manages_catalog(user):
+            return "Un artisan n'importe que ses propres produits"
+        if not reference:
+            return "Artisan requis (id, nom d'utilisateur ou téléphone)"
+        return f"Artisan introuvable : {reference}"
+
+
+class ProductExportService:
+
+    @classmethod
+    def queryset_for(cls, user, artisan=None):
+        """Produits exportables : les siens pour un artisan, tous (ou d'un artisan) pour un agent"""
+        queryset = Product.objects.all()
+        if not manages_catalog(user):
+            return queryset.filter(artisan=user)
+        if artisan and str(artisan).isdigit():
+            queryset = queryset.filter(artisan_id=artisan)
+        return queryset
+
+    @classmethod
+    def rows(cls, queryset):
+        queryset = queryset.select_related('artisan').prefetch_related('images').order_by('pk')
+        for product in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield {
+                'id': product.pk,
+                'artisan': product.artisan.username,
+                'name': product.name,
+                'description': product.description,
+                'price': product.price,
+                'stock': product.stock,
+                'category': product.category,
+                'is_limited_edition': product.is_limited_edition,
+                'limited_quantity': product.limited_quantity,
+                'origin': product.origin,
+                'tags': product.tags if isinstance(product.tags, list) else [],
+                'images': [
+                    os.path.basename(image.image.name)
+                    for image in sorted(product.images.all(), key=lambda image: (not image.is_main, image.pk))
+                ],
+                'created_at': product.created_at,
+                'updated_at': product.updated_at,
+            }
+
+    @classmethod
+    def stream(cls, queryset, file_format):
+        """Morceaux de texte du fichier exporté, produit par produit"""
+        if file_format == 'csv':
+            writer = csv.DictWriter(Echo(), fieldnames=EXPORT_COLUMNS)
+            yield writer.writeheader()
+            for row in cls.rows(queryset):
+                for column in LIST_COLUMNS:
+                    row[column] = LIST_SEPARATOR.join(str(item) for item in row[column])
+                yield writer.writerow(row)
+        else:
+            for row in cls.rows(queryset):
+                yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
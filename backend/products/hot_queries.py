@@ -0,0 +1,25 @@
+# products/hot_queries.py
+"""Requêtes fréquentes du catalogue (commande explain_hot_queries)"""
+from core.explain import hot_query
+from .models import Product
+from .search import filter_category
+
+
+@hot_query('products.category_listing')
+def category_listing():
+    return filter_category(Product.objects.all(), 'sculpture').order_by('-created_at', '-id')[:20]
+
+
+@hot_query('products.in_stock_newest')
+def in_stock_newest():
+    return Product.objects.filter(stock__gt=0).order_by('-created_at')[:8]
+
+
+@hot_query('products.artisan_products')
+def artisan_products():
+    return Product.objects.filter(artisan_id=1).order_by('-created_at', '-id')[:20]
+
+
+@hot_query('products.popular')
+def popular():
+    return Product.objects.order_by('-average_rating', '-review_count', '-id')[:20]
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.video import VideoTranscodeService
+
+
+class Command(BaseCommand):
+    help = "Convertit en HLS les vidéos produits en attente (worker ffmpeg, à lancer à part ou via cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', type=int, default=0, metavar='SECONDES',
+            help="Tourne en continu avec cet intervalle quand la file est vide",
+        )
+
+    def handle(self, *args, **options):
+        interval = options['loop']
+        while True:
+            job = VideoTranscodeService.claim_next()
+            if job is not None:
+                job = VideoTranscodeService.process(job)
+                self.stdout.write(f"Vidéo #{job.id} (produit #{job.product_id}) : {job.get_status_display()}")
+                continue
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from products.uploads import UploadService
+
+
+class Command(BaseCommand):
+    help = "Supprime les envois d'images inachevés ou jamais rattachés à un produit (à lancer via cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=24,
+            help="Âge minimum des envois à supprimer (24 h par défaut)",
+        )
+
+    def handle(self, *args, **options):
+        purged = UploadService.purge_stale(age=timedelta(hours=options['hours']))
+        self.stdout.write(f"{purged} envoi(s) supprimé(s)")
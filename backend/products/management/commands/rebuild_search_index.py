@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des produits"
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f"Backend: {backend.__class__.__name__}")
+        count = backend.rebuild(Product.objects.order_by('pk'))
+        self.stdout.write(self.style.SUCCESS(f"{count} produit(s) indexé(s)"))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.reservations import ReservationService
+
+
+class Command(BaseCommand):
+    help = "Libère les réservations de stock expirées (à lancer via cron ou avec --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', type=int, default=0, metavar='SECONDES',
+            help="Tourne en continu avec cet intervalle entre deux passages",
+        )
+
+    def handle(self, *args, **options):
+        interval = options['loop']
+        while True:
+            released = ReservationService.release_expired()
+            self.stdout.write(f"{released} réservation(s) libérée(s)")
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:12
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from products.search import SQLiteFTS5Backend, product_document
+
+    backend = SQLiteFTS5Backend()
+    backend.create_index()
+    Product = apps.get_model('products', 'Product')
+    with schema_editor.connection.cursor() as cursor:
+        for product in Product.objects.iterator(chunk_size=500):
+            doc = product_document(product)
+            cursor.execute(
+                f"INSERT INTO {backend.table} (rowid, name, description, category, tags, origin) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [product.pk, doc['name'], doc['description'], doc['category'], doc['tags'], doc['origin']],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from products.search import SQLiteFTS5Backend
+
+    SQLiteFTS5Backend().drop_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Réunit les réservations en double d'un même acheteur sur un produit :
+    quantités additionnées (reserved_stock les compte déjà toutes),
+    échéance la plus tardive.
+    """
+    StockReservation = apps.get_model('products', 'StockReservation')
+    kept = {}
+    merged = {}
+    duplicates = []
+    for reservation in StockReservation.objects.order_by('id'):
+        key = (
+            (reservation.user_id, reservation.product_id) if reservation.user_id
+            else (None, reservation.session_key, reservation.product_id)
+        )
+        first = kept.setdefault(key, reservation)
+        if first is reservation:
+            continue
+        first.quantity += reservation.quantity
+        first.expires_at = max(first.expires_at, reservation.expires_at)
+        merged[first.id] = first
+        duplicates.append(reservation.id)
+    StockReservation.objects.filter(id__in=duplicates).delete()
+    for reservation in merged.values():
+        reservation.save(update_fields=['quantity', 'expires_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='stockreservation',
+            name='reservation_user_product_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='stockreservation',
+            name='reservation_session_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='stockreservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'product'), name='unique_user_reservation'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockreservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('session_key', 'product'), name='unique_session_reservation'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:52
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from products.search import PostgresSearchBackend
+
+    backend = PostgresSearchBackend()
+    backend.create_index()
+    Product = apps.get_model('products', 'Product')
+    with schema_editor.connection.cursor() as cursor:
+        for product in Product.objects.iterator(chunk_size=500):
+            cursor.execute(backend.upsert_sql(), backend.document_params(product))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from products.search import PostgresSearchBackend
+
+    PostgresSearchBackend().drop_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_updated_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,5 +1,46 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Lower
 from django.conf import settings
+from django.utils.functional import cached_property
+
+from core import cache, images
+from core.conditional import bump_state
+
+# Version des réponses qui listent des produits (core.conditional)
+PRODUCT_STATE = 'products'
+# Espace du cache applicatif : accueil, produits similaires, catégories (core.cache)
+CATALOG_CACHE = 'catalog'
+
+
+def bump_catalog():
+    """Nouvelle version du cache catalogue, après le commit"""
+    transaction.on_commit(lambda: cache.bump(CATALOG_CACHE))
+
+
+class ProductQuerySet(models.QuerySet):
+    """
+    Les écritures en masse (stock, réservations, notes, images) ne passent
+    pas par save() : elles incrémentent ici la version des listes de
+    produits (ETag de /api/products/) et celle du cache catalogue.
+    """
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            bump_state(PRODUCT_STATE)
+            bump_catalog()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            bump_state(PRODUCT_STATE)
+            bump_catalog()
+        return objs
+
 
 class Product(models.Model):
     # Lien avec l'artisan (User)
@@ -9,6 +50,8 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=0) # FCFA n'a pas de décimales habituellement
     stock = models.IntegerField(default=1)
+    # Somme des réservations en cours (voir StockReservation / products.reservations)
+    reserved_stock = models.IntegerField(default=0)
     
     # Catégories vues dans BuyerHomeScreen (Sculpture, Mobilier, Mode, etc.)
     category = models.CharField(max_length=100)
@@ -23,15 +66,65 @@ class Product(models.Model):
     tags = models.JSONField(default=list, blank=True) # Ex: ['Bronze', 'Luxe']
     
     # Métriques (calculées ou mises en cache)
+    # Notes : maintenues par social.ratings à chaque avis (somme et nombre)
     average_rating = models.FloatField(default=0.0)
     review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # État des pages produit (core.conditional, MAX(updated_at))
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+            # Pagination par curseur (core.pagination)
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            # Tri "popular" (website.products_list)
+            models.Index(fields=['-average_rating', '-review_count', '-id'], name='product_popular_idx'),
+            # Filtre par catégorie sans casse (products.search.filter_category), du plus récent au plus ancien
+            models.Index(Lower('category'), F('created_at').desc(), F('id').desc(), name='product_category_idx'),
+            # Produits d'un artisan (my_products, tableau de bord)
+            models.Index(fields=['artisan', '-created_at', '-id'], name='product_artisan_created_idx'),
+            # Produits en stock, les plus récents (accueil)
+            models.Index(
+                fields=['-created_at', '-id'], condition=Q(stock__gt=0), name='product_in_stock_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
+    @property
+    def video_job(self):
+        """Dernière conversion de la vidéo actuelle (lit video_jobs.all(), préchargeable)"""
+        if not self.video_url:
+            return None
+        for job in sorted(self.video_jobs.all(), key=lambda job: job.pk, reverse=True):
+            if job.source == self.video_url.name:
+                return job
+        return None
+
+    @property
+    def available_stock(self):
+        """Stock vendable : stock moins les réservations en cours"""
+        return max(self.stock - self.reserved_stock, 0)
+
+    @cached_property
+    def main_image(self):
+        """
+        Image principale (is_main, sinon la plus ancienne).
+        Lit images.all() : aucune requête si les images sont préchargées
+        avec prefetch_related('images').
+        """
+        images = sorted(self.images.all(), key=lambda image: image.pk)
+        for image in images:
+            if image.is_main:
+                return image
+        return images[0] if images else None
+
     @property
     def category_icon(self):
         icons = {
@@ -61,4 +154,106 @@ class Product(models.Model):
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='products/')
-    is_main = models.BooleanField(default=False) # L'image principale affichée dans la liste
\ No newline at end of file
+    is_main = models.BooleanField(default=False) # L'image principale affichée dans la liste
+    # SHA-256 du fichier (products.uploads : un contenu identique n'est stocké qu'une fois)
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    # Copies réduites WebP/JPEG (core.images), générées en arrière-plan
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    @property
+    def srcset(self):
+        return images.srcset(self.image, self.variants)
+
+
+class ImageUpload(models.Model):
+    """
+    Envoi d'une image, en une fois (multipart) ou par morceaux reprenables.
+    Les morceaux sont ajoutés à un fichier temporaire sur disque ; une fois
+    complet, le fichier est haché et rangé sous products/<sha256>.<ext>.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'En cours'
+        COMPLETE = 'complete', 'Terminé'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='image_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    file = models.ImageField(upload_to='products/', blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+
+class StockReservation(models.Model):
+    """
+    Réservation temporaire de stock (panier) pour un utilisateur ou une
+    session anonyme. Expire après STOCK_RESERVATION_TTL ; les réservations
+    expirées sont libérées par la commande release_expired_reservations.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_reservations')
+    session_key = models.CharField(max_length=40, blank=True, default='')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Une réservation par acheteur et par produit (ReservationService.reserve) ;
+        # ces contraintes servent aussi d'index aux recherches par acheteur
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'product'], condition=models.Q(user__isnull=False),
+                name='unique_user_reservation',
+            ),
+            models.UniqueConstraint(
+                fields=['session_key', 'product'], condition=models.Q(user__isnull=True),
+                name='unique_session_reservation',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product} (jusqu'à {self.expires_at:%H:%M})"
+
+
+class VideoTranscodeJob(models.Model):
+    """
+    Conversion de la vidéo d'un produit en HLS multi-débits (products.video).
+    La table sert de file d'attente : la commande process_video_jobs
+    traite les tâches en attente.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'En attente'
+        PROCESSING = 'processing', 'En cours'
+        READY = 'ready', 'Prête'
+        FAILED = 'failed', 'Échec'
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='video_jobs')
+    source = models.CharField(max_length=255)  # nom du fichier Product.video_url converti
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    playlist = models.CharField(max_length=255, blank=True)  # master.m3u8 dans le stockage
+    poster = models.CharField(max_length=255, blank=True)
+    renditions = models.JSONField(default=list, blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='video_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"Vidéo {self.product} ({self.get_status_display()})"
@@ -0,0 +1,259 @@
+# products/reservations.py
+"""
+Réservations de stock avec durée de vie (TTL).
+
+Product.reserved_stock est la somme des réservations en cours ; il est
+modifié uniquement par des UPDATE conditionnels (F()), sans SELECT ...
+FOR UPDATE : chaque acheteur ne tient le verrou de la ligne produit que
+le temps d'un UPDATE, même sur une édition limitée très demandée.
+
+Disponible = stock - reserved_stock. Au paiement, consume() convertit les
+réservations en décrément de stock, sans reverrouiller les produits.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.utils import timezone
+
+from .models import Product, StockReservation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = timedelta(minutes=15)
+# Donnée de session : clé des réservations anonymes, conservée à la
+# connexion (login() change la clé de session mais garde ses données)
+SESSION_RESERVATION_KEY = 'stock_reservation_key'
+
+
+def reservation_ttl():
+    return getattr(settings, 'STOCK_RESERVATION_TTL', DEFAULT_TTL)
+
+
+def owner_filter(user=None, session_key=None):
+    """Réservations d'un utilisateur connecté, sinon de la session anonyme"""
+    if user is not None and user.is_authenticated:
+        return Q(user=user)
+    if session_key:
+        return Q(user__isnull=True, session_key=session_key)
+    raise ValueError("Utilisateur ou session requis pour réserver du stock")
+
+
+def _delta_case(field, deltas):
+    """CASE appliquant un delta par produit à `field`"""
+    return Case(
+        *[When(id=product_id, then=F(field) + delta) for product_id, delta in deltas.items()],
+        default=F(field),
+        output_field=IntegerField(),
+    )
+
+
+class ReservationService:
+
+    @classmethod
+    @transaction.atomic
+    def reserve(cls, product_id, quantity, user=None, session_key=None):
+        """
+        Fixe la réservation de l'acheteur sur un produit à `quantity`
+        (0 libère la réservation). Prolonge le TTL.
+        """
+        quantity = int(quantity)
+        if quantity < 0:
+            raise ValueError("Quantité invalide")
+
+        owner = owner_filter(user, session_key)
+        # Ligne de réservation verrouillée (créée vide au besoin) : deux
+        # ajouts simultanés du même acheteur ne réservent pas deux fois
+        reservation = cls._locked_reservation(owner, product_id, user, session_key, create=quantity > 0)
+        held = reservation.quantity if reservation else 0
+        delta = quantity - held
+
+        if delta > 0 and not cls._hold(product_id, delta):
+            # Des réservations expirées bloquent peut-être encore le stock
+            # (pas la nôtre, verrouillée ici : `held` la compte déjà)
+            cls.release_expired(product_ids=[product_id], exclude_ids=[reservation.pk])
+            if not cls._hold(product_id, delta):
+                product = Product.objects.filter(id=product_id).only('name', 'stock', 'reserved_stock').first()
+                if product is None:
+                    raise ValueError(f"Produit {product_id} introuvable")
+                raise ValueError(
+                    f"Stock insuffisant pour '{product.name}'. "
+                    f"Disponible: {product.available_stock}, Demandé: {quantity}"
+                )
+        elif delta < 0:
+            Product.objects.filter(id=product_id).update(
+                reserved_stock=F('reserved_stock') + delta, updated_at=timezone.now()
+            )
+
+        if quantity == 0:
+            if reservation:
+                reservation.delete()
+            return None
+
+        reservation.quantity = quantity
+        reservation.expires_at = timezone.now() + reservation_ttl()
+        reservation.save(update_fields=['quantity', 'expires_at'])
+        return reservation
+
+    @classmethod
+    def _locked_reservation(cls, owner, product_id, user, session_key, create):
+        """
+        Réservation de l'acheteur sur le produit, verrouillée (SELECT ...
+        FOR UPDATE). Si elle n'existe pas et `create`, une ligne vide est
+        insérée ; les contraintes d'unicité font attendre puis échouer une
+        insertion concurrente, qui relit alors la ligne existante.
+        """
+        reservations = StockReservation.objects.select_for_update().filter(owner, product_id=product_id)
+        reservation = reservations.first()
+        if reservation is not None or not create:
+            return reservation
+        authenticated = user is not None and user.is_authenticated
+        try:
+            with transaction.atomic():
+                return StockReservation.objects.create(
+                    product_id=product_id,
+                    user=user if authenticated else None,
+                    session_key='' if authenticated else session_key,
+                    quantity=0,
+                    expires_at=timezone.now() + reservation_ttl(),
+                )
+        except IntegrityError:
+            reservation = reservations.first()
+            if reservation is None:
+                raise ValueError(f"Produit {product_id} introuvable")
+            return reservation
+
+    @classmethod
+    @transaction.atomic
+    def claim_session(cls, session_key, user):
+        """
+        Réservations de la session anonyme reprises par l'utilisateur qui
+        se connecte (fusionnées avec les siennes sur le même produit).
+        reserved_stock ne change pas. Retourne le nombre reprises.
+        """
+        holds = list(StockReservation.objects.select_for_update().filter(user__isnull=True, session_key=session_key))
+        if not holds:
+            return 0
+        own = {
+            r.product_id: r
+            for r in StockReservation.objects.select_for_update().filter(
+                user=user, product_id__in=[hold.product_id for hold in holds]
+            )
+        }
+        for hold in holds:
+            mine = own.get(hold.product_id)
+            if mine is None:
+                hold.user = user
+                hold.session_key = ''
+                hold.save(update_fields=['user', 'session_key'])
+            else:
+                mine.quantity += hold.quantity
+                mine.expires_at = max(mine.expires_at, hold.expires_at)
+                mine.save(update_fields=['quantity', 'expires_at'])
+                hold.delete()
+        return len(holds)
+
+    @classmethod
+    def held(cls, product_ids, user=None, session_key=None):
+        """{product_id: quantité} réservée en ce moment par l'acheteur"""
+        try:
+            owner = owner_filter(user, session_key)
+        except ValueError:
+            return {}
+        return dict(
+            StockReservation.objects.filter(owner, product_id__in=product_ids, expires_at__gt=timezone.now())
+            .values_list('product_id', 'quantity')
+        )
+
+    @classmethod
+    def available_for(cls, products, user=None, session_key=None):
+        """
+        {product_id: stock disponible pour cet acheteur} : sa propre
+        réservation lui reste acquise (stock - réservations des autres).
+        """
+        held = cls.held([product.id for product in products], user=user, session_key=session_key)
+        return {product.id: product.available_stock + held.get(product.id, 0) for product in products}
+
+    @classmethod
+    def release(cls, product_id, user=None, session_key=None):
+        return cls.reserve(product_id, 0, user=user, session_key=session_key)
+
+    @classmethod
+    def _hold(cls, product_id, quantity):
+        """Augmente reserved_stock si le stock disponible le permet (un UPDATE)"""
+        return Product.objects.filter(
+            id=product_id,
+            stock__gte=F('reserved_stock') + quantity,
+        ).update(reserved_stock=F('reserved_stock') + quantity, updated_at=timezone.now()) == 1
+
+    @classmethod
+    @transaction.atomic
+    def consume(cls, quantities, user=None, session_key=None):
+        """
+        Libère toutes les réservations de l'acheteur sur `quantities`
+        ({product_id: quantité}), en cours ou expirées (pas encore
+        balayées) : son propre stock réservé ne lui est jamais opposé.
+        Les lignes entièrement couvertes par une réservation en cours sont
+        décrémentées dans le même UPDATE ; retourne l'ensemble de ces
+        produits. Les autres lignes passent par le contrôle de stock
+        classique, sur un reserved_stock déjà crédité de la réservation.
+        """
+        try:
+            owner = owner_filter(user, session_key)
+        except ValueError:
+            return set()
+
+        reservations = list(
+            StockReservation.objects.select_for_update().filter(owner, product_id__in=quantities)
+        )
+        if not reservations:
+            return set()
+        now = timezone.now()
+        covered = {
+            r.product_id for r in reservations
+            if r.expires_at > now and r.quantity >= quantities[r.product_id]
+        }
+
+        # Un seul UPDATE : réservations rendues, stock des lignes couvertes décrémenté
+        Product.objects.filter(id__in=[r.product_id for r in reservations]).update(
+            stock=_delta_case('stock', {pid: -quantities[pid] for pid in covered}),
+            reserved_stock=_delta_case('reserved_stock', {r.product_id: -r.quantity for r in reservations}),
+            updated_at=now,
+        )
+        StockReservation.objects.filter(id__in=[r.id for r in reservations]).delete()
+        return covered
+
+    @classmethod
+    def release_expired(cls, product_ids=None, batch_size=500, exclude_ids=()):
+        """Libère les réservations expirées, par lots. Retourne le nombre libéré"""
+        released = 0
+        while True:
+            with transaction.atomic():
+                expired = StockReservation.objects.select_for_update(skip_locked=True).filter(
+                    expires_at__lte=timezone.now()
+                )
+                if product_ids is not None:
+                    expired = expired.filter(product_id__in=product_ids)
+                if exclude_ids:
+                    expired = expired.exclude(id__in=exclude_ids)
+                batch = list(expired.values_list('id', 'product_id', 'quantity')[:batch_size])
+                if not batch:
+                    break
+
+                deltas = {}
+                for _, product_id, quantity in batch:
+                    deltas[product_id] = deltas.get(product_id, 0) - quantity
+                StockReservation.objects.filter(id__in=[row[0] for row in batch]).delete()
+                Product.objects.filter(id__in=deltas).update(
+                    reserved_stock=_delta_case('reserved_stock', deltas),
+                    updated_at=timezone.now(),
+                )
+                released += len(batch)
+            if len(batch) < batch_size:
+                break
+
+        if released:
+            logger.info(f"{released} réservation(s) expirée(s) libérée(s)")
+        return released
@@ -0,0 +1,288 @@
+# products/search.py
+"""
+Index de recherche plein texte du catalogue.
+
+Le backend est choisi via le setting PRODUCT_SEARCH_BACKEND. En local
+(SQLite) on utilise une table virtuelle FTS5 dont le tokenizer supprime
+les accents : "tissé" trouve "tisse" et inversement. Sur PostgreSQL, une
+table de documents tsvector (unaccent) indexée en GIN. Sur les autres
+bases, DatabaseSearchBackend reprend l'ancien filtre icontains.
+"""
+import logging
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximum de résultats classés renvoyés par une recherche : borne
+# aussi le CASE WHEN du tri par pertinence (une branche par résultat)
+DEFAULT_MAX_RESULTS = 1000
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize_text(value):
+    """Minuscules et suppression des accents ("Tissé" -> "tisse")"""
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    return ''.join(c for c in value if not unicodedata.combining(c)).lower()
+
+
+def tokenize(query):
+    """Découpe une requête utilisateur en termes normalisés"""
+    return TOKEN_RE.findall(normalize_text(query))
+
+
+def product_document(product):
+    """Champs indexés d'un produit"""
+    tags = product.tags if isinstance(product.tags, list) else []
+    return {
+        'name': product.name or '',
+        'description': product.description or '',
+        'category': product.category or '',
+        'tags': ' '.join(str(tag) for tag in tags),
+        'origin': product.origin or '',
+    }
+
+
+class BaseSearchBackend:
+    """Interface commune des backends de recherche"""
+
+    def __init__(self, max_results=None):
+        self.max_results = max_results or getattr(
+            settings, 'PRODUCT_SEARCH_MAX_RESULTS', DEFAULT_MAX_RESULTS
+        )
+
+    def create_index(self):
+        pass
+
+    def drop_index(self):
+        pass
+
+    def index_product(self, product):
+        pass
+
+    def index_products(self, products):
+        for product in products:
+            self.index_product(product)
+
+    def remove_product(self, product_id):
+        pass
+
+    def search_ids(self, query):
+        """Retourne les ids des produits correspondants, les plus pertinents d'abord"""
+        raise NotImplementedError
+
+    def filter_queryset(self, queryset, query):
+        """
+        Restreint un queryset aux résultats de la recherche, triés par
+        pertinence. L'ordre de l'index est reporté par un CASE WHEN d'au
+        plus max_results branches : au-delà, les résultats les moins
+        pertinents ne sont pas renvoyés.
+        """
+        ids = self.search_ids(query)[:self.max_results]
+        if not ids:
+            return queryset.none()
+        ranking = Case(
+            *[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.filter(pk__in=ids).annotate(search_rank=ranking).order_by('search_rank')
+
+    def rebuild(self, queryset):
+        self.drop_index()
+        self.create_index()
+        count = 0
+        for product in queryset.iterator(chunk_size=500):
+            self.index_product(product)
+            count += 1
+        return count
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Repli sans index : filtre icontains sur le nom et la description"""
+
+    def search_ids(self, query):
+        from .models import Product
+
+        return list(
+            self.filter_queryset(Product.objects.all(), query)
+            .values_list('pk', flat=True)[:self.max_results]
+        )
+
+    def filter_queryset(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(
+                Q(name__icontains=term) | Q(description__icontains=term)
+            )
+        return queryset
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """Index inversé FTS5, classement bm25 (nom > catégorie/tags > description)"""
+
+    table = 'products_product_fts'
+    # Poids bm25 dans l'ordre des colonnes de la table
+    weights = (10.0, 1.0, 4.0, 4.0, 2.0)
+
+    def create_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                "name, description, category, tags, origin, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+
+    def drop_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def index_product(self, product):
+        doc = product_document(product)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, name, description, category, tags, origin) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [product.pk, doc['name'], doc['description'], doc['category'], doc['tags'], doc['origin']],
+            )
+
+    def index_products(self, products):
+        # Import en masse (products.bulk) : deux requêtes pour tout le lot
+        rows = [(product.pk, product_document(product)) for product in products]
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [[pk] for pk, _ in rows])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, name, description, category, tags, origin) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [[pk, doc['name'], doc['description'], doc['category'], doc['tags'], doc['origin']] for pk, doc in rows],
+            )
+
+    def remove_product(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [product_id])
+
+    def build_match(self, query):
+        # Chaque terme est cité (pas de syntaxe FTS5 injectée) et cherché en préfixe
+        return ' '.join(f'"{term}"*' for term in tokenize(query))
+
+    def search_ids(self, query):
+        match = self.build_match(query)
+        if not match:
+            return []
+        weights = ', '.join(str(w) for w in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, {weights}) LIMIT %s",
+                [match, self.max_results],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Documents tsvector (configuration 'simple', accents retirés par
+    unaccent) dans une table indexée en GIN, classement ts_rank
+    (nom > catégorie/tags > origine > description). L'extension unaccent
+    est créée par la migration : le rôle doit en avoir le droit.
+    """
+
+    table = 'products_product_search'
+    config = 'simple'
+    # Poids tsvector par champ (A le plus fort)
+    weights = (('name', 'A'), ('category', 'B'), ('tags', 'B'), ('origin', 'C'), ('description', 'D'))
+
+    def create_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "product_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_gin ON {self.table} USING GIN (document)"
+            )
+
+    def drop_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def document_sql(self):
+        return ' || '.join(
+            f"setweight(to_tsvector('{self.config}', unaccent(%s)), '{weight}')" for _, weight in self.weights
+        )
+
+    def document_params(self, product):
+        doc = product_document(product)
+        return [product.pk, *(doc[field] for field, _ in self.weights)]
+
+    def upsert_sql(self):
+        return (
+            f"INSERT INTO {self.table} (product_id, document) VALUES (%s, {self.document_sql()}) "
+            "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document"
+        )
+
+    def index_product(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(self.upsert_sql(), self.document_params(product))
+
+    def index_products(self, products):
+        with connection.cursor() as cursor:
+            cursor.executemany(self.upsert_sql(), [self.document_params(product) for product in products])
+
+    def remove_product(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE product_id = %s", [product_id])
+
+    def build_query(self, query):
+        # Termes réduits à \w+ (pas de syntaxe tsquery injectée), cherchés en préfixe
+        return ' & '.join(f'{term}:*' for term in tokenize(query))
+
+    def search_ids(self, query):
+        tsquery = self.build_query(query)
+        if not tsquery:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT product_id FROM {self.table}, to_tsquery('{self.config}', %s) query "
+                "WHERE document @@ query ORDER BY ts_rank(document, query) DESC, product_id LIMIT %s",
+                [tsquery, self.max_results],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def get_search_backend():
+    path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTS5Backend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return DatabaseSearchBackend()
+
+
+def search_products(queryset, query):
+    """Point d'entrée utilisé par les vues"""
+    return get_search_backend().filter_queryset(queryset, query)
+
+
+def filter_category(queryset, category):
+    """
+    Produits d'une catégorie, sans tenir compte de la casse.
+    LOWER(category) = LOWER(...) utilise l'index product_category_idx,
+    contrairement à category__iexact (UPPER / LIKE selon la base).
+    `category` peut être une valeur ou une expression (Subquery).
+    """
+    if not hasattr(category, 'resolve_expression'):
+        category = Value(category)
+    return queryset.alias(category_key=Lower('category')).filter(category_key=Lower(category))
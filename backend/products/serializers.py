@@ -1,21 +1,46 @@
 import base64
-import uuid
+import logging
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
 from rest_framework import serializers
-from .models import Product, ProductImage
+from core import images
+from core.serializers import DynamicFieldsMixin
+from .models import ImageUpload, Product, ProductImage, VideoTranscodeJob
+from .uploads import UploadError, UploadService
 from users.serializers import UserSerializer
 
-class ProductImageSerializer(serializers.ModelSerializer):
+logger = logging.getLogger(__name__)
+
+class ProductImageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'is_main']
+        fields = ['id', 'image', 'is_main', 'variants']
+        field_dependencies = {'variants': ('image', 'variants')}
 
-class ProductSerializer(serializers.ModelSerializer):
+    def get_variants(self, obj):
+        return images.variants_payload(obj.image, obj.variants, self.context.get('request'))
+
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     # Pour l'affichage (GET)
     images_details = ProductImageSerializer(source='images', many=True, read_only=True)
     artisan_details = UserSerializer(source='artisan', read_only=True)
+    main_image = serializers.SerializerMethodField()
+    # Copies réduites de l'image principale (grilles du catalogue)
+    main_image_variants = serializers.SerializerMethodField()
+    # Vidéo convertie en HLS (products.video) et état de la conversion
+    video = serializers.SerializerMethodField()
+    available_stock = serializers.IntegerField(read_only=True)
     
-    # Pour l'écriture (POST/PUT) : Accepte une liste de Base64
+    # Pour l'écriture (POST/PUT) : ids d'envois terminés (/api/uploads/)
+    upload_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        write_only=True,
+        required=False
+    )
+    # Ancien format : liste de Base64 (déconseillé, tout le fichier transite en JSON)
     images = serializers.ListField(
         child=serializers.CharField(),
         write_only=True,
@@ -25,41 +50,120 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'description', 'price', 'stock', 
+            'id', 'name', 'description', 'price', 'stock', 'available_stock',
             'category', 'is_limited_edition', 'artisan', 
-            'artisan_details', 'images', 'images_details',
+            'artisan_details', 'upload_ids', 'images', 'images_details', 'main_image', 'main_image_variants',
+            'video_url', 'video', 'average_rating', 'review_count',
             'created_at', 'updated_at'
         ]
+        # Attributs lus par les champs calculés (?fields=, voir core.serializers)
+        field_dependencies = {
+            'available_stock': ('stock', 'reserved_stock'),
+            'main_image': ('images',),
+            'main_image_variants': ('images',),
+            'video': ('video_url', 'video_jobs'),
+        }
         extra_kwargs = {
-            'artisan': {'read_only': True} # L'artisan est défini automatiquement par la vue
+            'artisan': {'read_only': True}, # L'artisan est défini automatiquement par la vue
+            # Maintenus par social.ratings
+            'average_rating': {'read_only': True},
+            'review_count': {'read_only': True},
         }
 
+    def get_main_image(self, obj):
+        image = obj.main_image
+        if not image or not image.image:
+            return None
+        request = self.context.get('request')
+        if request:
+            return request.build_absolute_uri(image.image.url)
+        return image.image.url
+
+    def get_main_image_variants(self, obj):
+        image = obj.main_image
+        if not image:
+            return None
+        return images.variants_payload(image.image, image.variants, self.context.get('request'))
+
+    def get_video(self, obj):
+        if not obj.video_url:
+            return None
+        job = obj.video_job
+        ready = job is not None and job.status == VideoTranscodeJob.Status.READY
+        url = self._absolute_url
+        return {
+            'status': job.status if job else VideoTranscodeJob.Status.PENDING,
+            'hls_url': url(default_storage.url(job.playlist)) if ready else None,
+            'poster_url': url(default_storage.url(job.poster)) if ready else None,
+            'duration': job.duration if ready else None,
+            'renditions': [r['name'] for r in job.renditions] if ready else [],
+        }
+
+    def _absolute_url(self, url):
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    @transaction.atomic
     def create(self, validated_data):
-        # 1. Extraire les images (liste de strings base64)
+        upload_ids = validated_data.pop('upload_ids', [])
         images_data = validated_data.pop('images', [])
-        
-        # 2. Créer le produit
+
         product = Product.objects.create(**validated_data)
-        
-        # 3. Traiter chaque image Base64
+
+        if upload_ids:
+            try:
+                UploadService.attach(product, upload_ids, owner=product.artisan)
+            except UploadError as e:
+                raise serializers.ValidationError({'upload_ids': str(e)})
+
+        # Ancien format : "data:image/jpeg;base64,....."
         for index, img_str in enumerate(images_data):
             try:
-                # Format attendu: "data:image/jpeg;base64,....."
                 if ';base64,' in img_str:
-                    format, imgstr = img_str.split(';base64,')
-                    ext = format.split('/')[-1] # ex: jpg
-                    
-                    # Décoder
-                    data = base64.b64decode(imgstr)
-                    file_name = f"{product.id}_{index}_{uuid.uuid4()}.{ext}"
-                    
-                    # Créer l'objet ProductImage
+                    imgstr = img_str.split(';base64,', 1)[1]
+                    name, content_hash = UploadService.store(ContentFile(base64.b64decode(imgstr)))
                     ProductImage.objects.create(
                         product=product,
-                        image=ContentFile(data, name=file_name),
-                        is_main=(index == 0) # La première image est principale
+                        image=name,
+                        content_hash=content_hash,
+                        is_main=(index == 0 and not upload_ids) # La première image est principale
                     )
-            except Exception as e:
-                print(f"Erreur image: {e}")
-                
-        return product
\ No newline at end of file
+            except (ValueError, UploadError) as e:
+                logger.warning(f"Image base64 ignorée pour le produit #{product.id}: {e}")
+
+        return product
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        upload_ids = validated_data.pop('upload_ids', [])
+        validated_data.pop('images', None)
+        instance = super().update(instance, validated_data)
+        if upload_ids:
+            try:
+                UploadService.attach(instance, upload_ids, owner=instance.artisan)
+            except UploadError as e:
+                raise serializers.ValidationError({'upload_ids': str(e)})
+        return instance
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImageUpload
+        fields = ['id', 'filename', 'size', 'received', 'status', 'file', 'content_hash', 'created_at']
+        read_only_fields = ['received', 'status', 'file', 'content_hash', 'created_at']
+
+
+class ProductImportRowSerializer(serializers.ModelSerializer):
+    """Une ligne d'import en masse (products.bulk)"""
+    # id, nom d'utilisateur ou téléphone de l'artisan (agents communautaires)
+    artisan = serializers.CharField(required=False, allow_blank=True)
+    tags = serializers.ListField(child=serializers.CharField(), required=False)
+    # Noms des fichiers dans l'archive zip, le premier est l'image principale
+    images = serializers.ListField(child=serializers.CharField(), required=False)
+
+    class Meta:
+        model = Product
+        fields = [
+            'artisan', 'name', 'description', 'price', 'stock', 'category',
+            'is_limited_edition', 'limited_quantity', 'origin', 'tags', 'images',
+        ]
@@ -0,0 +1,88 @@
+# products/signals.py
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.conditional import bump_state
+from core.images import variants_ready
+from users.models import User
+from .models import PRODUCT_STATE, Product, ProductImage, bump_catalog
+from .reservations import SESSION_RESERVATION_KEY, ReservationService
+from .search import get_search_backend
+from .video import VideoTranscodeService
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, raw=False, **kwargs):
+    """Met à jour l'index de recherche après la sauvegarde d'un produit"""
+    if raw:
+        return
+    transaction.on_commit(lambda: get_search_backend().index_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_index(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: get_search_backend().remove_product(product_id))
+
+
+@receiver(post_save, sender=Product)
+def schedule_video_transcode(sender, instance, raw=False, **kwargs):
+    """Nouvelle vidéo : conversion HLS par le worker process_video_jobs"""
+    if raw or not instance.video_url:
+        return
+    VideoTranscodeService.schedule(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_catalog_cache(sender, raw=False, **kwargs):
+    """Accueil, produits similaires, catégories : nouvelle version du cache catalogue"""
+    if raw:
+        return
+    bump_catalog()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_product_state(sender, raw=False, **kwargs):
+    """ETag des listes de produits (les écritures en masse : ProductQuerySet)"""
+    if raw:
+        return
+    bump_state(PRODUCT_STATE)
+
+
+@receiver(post_save, sender=User)
+def bump_product_state_on_artisan_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Les listes de produits exposent l'artisan (artisan_details)"""
+    if raw or instance.role != User.Role.ARTISAN or update_fields == frozenset({'last_login'}):
+        return
+    bump_state(PRODUCT_STATE)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def touch_product_on_image_change(sender, instance, raw=False, **kwargs):
+    """Les images font partie de la représentation du produit (ETag)"""
+    if raw:
+        return
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(variants_ready, sender=ProductImage)
+def refresh_product_on_variants(sender, pk, **kwargs):
+    """Variantes prêtes : srcset à jour dans l'API et les pages en cache (update)"""
+    Product.objects.filter(images__pk=pk).update(updated_at=timezone.now())
+
+
+@receiver(user_logged_in)
+def claim_session_reservations(sender, request, user, **kwargs):
+    """Le panier anonyme garde son stock réservé après la connexion"""
+    session = getattr(request, 'session', None)
+    session_key = session.pop(SESSION_RESERVATION_KEY, None) if session is not None else None
+    if session_key:
+        ReservationService.claim_session(session_key, user)
@@ -1,3 +1,527 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core import cache as versioned_cache
+from orders.services import PaymentService
+from users.models import User
+from .models import CATALOG_CACHE, ImageUpload, Product, ProductImage, StockReservation, VideoTranscodeJob
+from .reservations import ReservationService
+from .search import PostgresSearchBackend, SQLiteFTS5Backend, search_products
+from .uploads import UploadService
+from .video import MAX_ATTEMPTS, TranscodeError, VideoTranscodeService, claim_timeout
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def image_bytes(color='red', size=(8, 8), image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+class MediaRootMixin:
+    """Fichiers stockés dans un dossier temporaire, supprimé après le test"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class ReservationServiceTests(TestCase):
+
+    def setUp(self):
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.product = Product.objects.create(
+            artisan=self.artisan, name='Panier', description='d', price=1000, stock=5, category='other',
+        )
+
+    def test_reserve_updates_single_row(self):
+        ReservationService.reserve(self.product.pk, 2, user=self.buyer)
+        ReservationService.reserve(self.product.pk, 3, user=self.buyer)
+
+        self.assertEqual(StockReservation.objects.get().quantity, 3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_stock, 3)
+
+    def test_reserve_refused_keeps_no_row(self):
+        with self.assertRaises(ValueError):
+            ReservationService.reserve(self.product.pk, 6, user=self.buyer)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_available_for_includes_own_reservation(self):
+        ReservationService.reserve(self.product.pk, 5, user=self.buyer)
+        self.product.refresh_from_db()
+        other = User.objects.create_user('other', password='x', role=User.Role.BUYER, phone='0102')
+
+        self.assertEqual(ReservationService.available_for([self.product], user=self.buyer), {self.product.pk: 5})
+        self.assertEqual(ReservationService.available_for([self.product], user=other), {self.product.pk: 0})
+
+    def test_reserve_keeps_own_expired_hold(self):
+        other = User.objects.create_user('other', password='x', role=User.Role.BUYER, phone='0102')
+        ReservationService.reserve(self.product.pk, 2, user=self.buyer)
+        ReservationService.reserve(self.product.pk, 3, user=other)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        # Le balayage libère la réservation de l'autre, pas la nôtre (verrouillée)
+        reservation = ReservationService.reserve(self.product.pk, 4, user=self.buyer)
+        self.assertEqual(reservation.quantity, 4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_stock, 4)
+        self.assertFalse(StockReservation.objects.filter(user=other).exists())
+
+    def test_session_holds_follow_login(self):
+        self.client.get(f'/cart/add/{self.product.pk}/')
+        session_key = self.client.session.session_key
+        self.assertEqual(StockReservation.objects.get().session_key, session_key)
+        ReservationService.reserve(self.product.pk, 1, user=self.buyer)
+
+        self.client.force_login(self.buyer)
+        reservation = StockReservation.objects.get()
+        self.assertEqual((reservation.user, reservation.session_key, reservation.quantity), (self.buyer, '', 2))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_stock, 2)
+
+
+@override_settings(CONDITIONAL_STATE_VERSIONS=True)
+class ProductListStateTests(TestCase):
+    """ETag de /api/products/ tiré de la version des produits (sans agrégat)"""
+
+    def setUp(self):
+        self.api = APIClient()
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.product = Product.objects.create(
+            artisan=self.artisan, name='Panier', description='d', price=1000, stock=5, category='other',
+        )
+
+    def etag(self):
+        response = self.api.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_not_modified_without_query(self):
+        etag = self.etag()
+        with self.assertNumQueries(0):
+            response = self.api.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_save_changes_etag(self):
+        etag = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 1200
+            self.product.save()
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_bulk_update_changes_etag(self):
+        etag = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            ReservationService.reserve(self.product.pk, 2, user=self.buyer)
+        self.assertNotEqual(self.etag(), etag)
+
+
+class ProductApiQueryTests(TestCase):
+    """Nombre de requêtes de l'API produits, quel que soit le nombre de lignes"""
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.add_products(3)
+
+    def add_products(self, count):
+        products = Product.objects.bulk_create(
+            Product(artisan=self.artisan, name=f'Panier {index}', description='d', price=1000, stock=5, category='other')
+            for index in range(count)
+        )
+        # Sans signaux : pas de génération de variantes
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f'products/{product.pk}.jpg', is_main=True) for product in products
+        )
+        return products
+
+    def get(self, url, queries):
+        cache.clear()
+        with self.assertNumQueries(queries):
+            response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        # État (ETag), page avec l'artisan, images, vidéos
+        self.get('/api/products/', 4)
+        self.add_products(5)
+        self.assertEqual(len(self.get('/api/products/', 4).data['results']), 8)
+
+    def test_retrieve(self):
+        product = Product.objects.first()
+        self.get(f'/api/products/{product.pk}/', 4)
+
+    def test_my_products(self):
+        self.api.force_authenticate(self.artisan)
+        self.get('/api/products/my_products/', 3)
+        self.add_products(5)
+        self.get('/api/products/my_products/', 3)
+
+
+class SQLiteSearchBackendTests(TestCase):
+    """Index FTS5 (base de test SQLite) : accents, synchronisation, reconstruction"""
+
+    def setUp(self):
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+
+    def create(self, name, description='d'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                artisan=self.artisan, name=name, description=description, price=1000, stock=5, category='other',
+            )
+
+    def search(self, query):
+        return list(search_products(Product.objects.all(), query).values_list('name', flat=True))
+
+    def test_accent_insensitive(self):
+        self.create('Pagne tissé')
+        self.create('Pagne tisse main')
+        self.assertCountEqual(self.search('tisse'), ['Pagne tissé', 'Pagne tisse main'])
+        self.assertCountEqual(self.search('TISSÉ'), ['Pagne tissé', 'Pagne tisse main'])
+
+    def test_index_follows_save_and_delete(self):
+        product = self.create('Masque Baoulé')
+        self.assertEqual(self.search('masque'), ['Masque Baoulé'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Statuette Baoulé'
+            product.save()
+        self.assertEqual(self.search('masque'), [])
+        self.assertEqual(self.search('statuette'), ['Statuette Baoulé'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.search('baoule'), [])
+
+    def test_rebuild_command(self):
+        self.create('Panier tressé')
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLiteFTS5Backend.table}")
+        self.assertEqual(self.search('panier'), [])
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('1 produit(s)', out.getvalue())
+        self.assertEqual(self.search('panier'), ['Panier tressé'])
+
+    @override_settings(PRODUCT_SEARCH_MAX_RESULTS=2)
+    def test_ranked_and_capped(self):
+        self.create('Tabouret', description='Bois de teck')
+        self.create('Teck massif')
+        self.create('Bol', description='Teck')
+        # Nom avant description, au plus PRODUCT_SEARCH_MAX_RESULTS résultats
+        results = self.search('teck')
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0], 'Teck massif')
+
+
+class PostgresSearchBackendTests(TestCase):
+    """Requête tsquery construite à partir des termes normalisés"""
+
+    def test_build_query(self):
+        backend = PostgresSearchBackend()
+        self.assertEqual(backend.build_query("Tissé & d'Abidjan:*"), 'tisse:* & d:* & abidjan:*')
+        self.assertEqual(backend.build_query('!!'), '')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog-tests'}})
+class CatalogCacheTests(TestCase):
+    """Le cache catalogue (accueil, similaires, catégories) suit les écritures"""
+
+    def setUp(self):
+        cache.clear()
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.product = Product.objects.create(
+            artisan=self.artisan, name='Panier', description='d', price=1000, stock=5, category='other',
+        )
+        self.loads = 0
+
+    def featured(self):
+        def load():
+            self.loads += 1
+            return list(Product.objects.order_by('-created_at').values_list('name', flat=True))
+        return versioned_cache.get_or_set(CATALOG_CACHE, 'home:featured', load)
+
+    def stock(self):
+        def load():
+            self.loads += 1
+            return list(Product.objects.values_list('stock', 'reserved_stock'))
+        return versioned_cache.get_or_set(CATALOG_CACHE, 'home:stock', load)
+
+    def test_served_from_cache(self):
+        self.assertEqual(self.featured(), ['Panier'])
+        self.assertEqual(self.featured(), ['Panier'])
+        self.assertEqual(self.loads, 1)
+
+    def test_invalidated_after_commit(self):
+        self.featured()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Panier tressé'
+            self.product.save()
+        self.assertEqual(self.featured(), ['Panier tressé'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        self.assertEqual(self.featured(), [])
+        self.assertEqual(self.loads, 3)
+
+    def test_invalidated_by_bulk_updates(self):
+        buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.assertEqual(self.stock(), [(5, 0)])
+
+        # Réservation puis checkout : queryset.update(), sans post_save
+        with self.captureOnCommitCallbacks(execute=True):
+            ReservationService.reserve(self.product.pk, 2, user=buyer)
+        self.assertEqual(self.stock(), [(5, 2)])
+        with self.captureOnCommitCallbacks(execute=True):
+            PaymentService.create_order_from_cart(buyer, [{'product_id': self.product.pk, 'quantity': 2}])
+        self.assertEqual(self.stock(), [(3, 0)])
+        self.assertEqual(self.loads, 3)
+
+    def test_not_invalidated_before_commit(self):
+        self.stock()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Product.objects.filter(pk=self.product.pk).update(stock=1)
+            self.assertEqual(self.stock(), [(5, 0)])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.stock(), [(1, 0)])
+
+
+@skipUnless(fakeredis, 'fakeredis non installé')
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': 'redis://catalog-tests:6379/0',
+    'OPTIONS': {'connection_class': getattr(fakeredis, 'FakeConnection', None)},
+}})
+class RedisCatalogCacheTests(CatalogCacheTests):
+    """Mêmes règles avec le cache Redis de la production (versions partagées entre processus)"""
+
+    def test_version_shared_between_processes(self):
+        self.featured()
+        # Un autre processus (autre pool de connexions, même serveur) écrit
+        other = RedisCache('redis://catalog-tests:6379/0', {'OPTIONS': {'connection_class': fakeredis.FakeConnection}})
+        other.incr('cachens:catalog:version')
+        self.featured()
+        self.assertEqual(self.loads, 2)
+
+
+class ProductBulkRoundTripTests(MediaRootMixin, TestCase):
+    """Un export se réimporte sans archive : images stockées retrouvées, colonnes d'export signalées"""
+
+    def setUp(self):
+        super().setUp()
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.product = Product.objects.create(
+            artisan=self.artisan, name='Pagne tissé', description='Kita', price=15000, stock=3,
+            category='mode', tags=['Coton', 'Main'], is_limited_edition=True, limited_quantity=10,
+        )
+        for index, color in enumerate(('red', 'blue')):
+            name, content_hash = UploadService.store(BytesIO(image_bytes(color)))
+            ProductImage.objects.create(product=self.product, image=name, content_hash=content_hash, is_main=index == 0)
+        self.api = APIClient()
+        self.api.force_authenticate(self.artisan)
+
+    def export(self, file_format):
+        response = self.api.get(f'/api/products/export/?type={file_format}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def reimport(self, content, file_format):
+        response = self.api.post(
+            '/api/products/import/', {'file': SimpleUploadedFile(f'produits.{file_format}', content)},
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def test_round_trip(self):
+        fields = ('name', 'description', 'price', 'stock', 'category', 'tags', 'is_limited_edition', 'limited_quantity', 'origin')
+        expected = Product.objects.filter(pk=self.product.pk).values(*fields).get()
+        images = list(self.product.images.order_by('pk').values_list('image', 'content_hash', 'is_main'))
+
+        for file_format in ('csv', 'jsonl'):
+            with self.subTest(file_format=file_format):
+                report = self.reimport(self.export(file_format), file_format)
+                self.assertEqual(report['errors'], [])
+                self.assertEqual(report['ignored_columns'], ['created_at', 'id', 'updated_at'])
+                copy = Product.objects.get(pk=report['product_ids'][0])
+                self.assertNotEqual(copy.pk, self.product.pk)
+                self.assertEqual(Product.objects.filter(pk=copy.pk).values(*fields).get(), expected)
+                self.assertEqual(list(copy.images.order_by('pk').values_list('image', 'content_hash', 'is_main')), images)
+
+    def test_unknown_image_reported(self):
+        row = json.loads(self.export('jsonl'))
+        row['images'] = ['inconnue.png']
+        response = self.api.post('/api/products/import/', {
+            'file': SimpleUploadedFile('produits.jsonl', json.dumps(row).encode()),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['errors'], [
+            {'line': 1, 'errors': {'images': ["Image absente de l'archive : inconnue.png"]}},
+        ])
+
+
+
+class ImageUploadTests(MediaRootMixin, TestCase):
+    """Envoi par morceaux reprenable, position refusée, contenu stocké une seule fois"""
+
+    def setUp(self):
+        super().setUp()
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.api = APIClient()
+        self.api.force_authenticate(self.artisan)
+        self.content = image_bytes(size=(64, 64))
+
+    def start(self):
+        response = self.api.post('/api/uploads/', {'filename': 'pagne.png', 'size': len(self.content)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def put(self, upload_id, start, end):
+        return self.api.put(
+            f'/api/uploads/{upload_id}/', self.content[start:end + 1], content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(self.content)}',
+        )
+
+    def send(self):
+        upload_id = self.start()
+        middle = len(self.content) // 2
+        self.put(upload_id, 0, middle - 1)
+        return self.put(upload_id, middle, len(self.content) - 1)
+
+    def test_resume_after_interruption(self):
+        upload_id = self.start()
+        middle = len(self.content) // 2
+        self.assertEqual(self.put(upload_id, 0, middle - 1).data['received'], middle)
+
+        # Reprise : le client demande la position, puis envoie la suite
+        received = self.api.get(f'/api/uploads/{upload_id}/').data['received']
+        response = self.put(upload_id, received, len(self.content) - 1)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], ImageUpload.Status.COMPLETE)
+        self.assertTrue(response.data['file'].endswith(f"{response.data['content_hash']}.png"))
+
+    def test_wrong_offset_refused(self):
+        upload_id = self.start()
+        self.put(upload_id, 0, 9)
+
+        # Morceau rejoué (deux PUT au même offset) puis morceau sauté
+        for start in (0, 20):
+            response = self.put(upload_id, start, start + 9)
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.data['received'], 10)
+        self.assertEqual(ImageUpload.objects.get().received, 10)
+
+    def test_same_content_stored_once(self):
+        first, second = self.send().data, self.send().data
+        self.assertEqual(first['file'], second['file'])
+        self.assertEqual(first['content_hash'], second['content_hash'])
+
+    def test_variants_scheduled_after_commit(self):
+        product = Product.objects.create(
+            artisan=self.artisan, name='Pagne', description='d', price=1000, stock=5, category='mode',
+        )
+        upload_id = self.send().data['id']
+        with mock.patch('products.uploads.schedule_for') as schedule_for:
+            with self.captureOnCommitCallbacks(execute=True):
+                images = UploadService.attach(product, [upload_id], owner=self.artisan)
+                schedule_for.assert_not_called()
+        schedule_for.assert_called_once_with(images)
+        self.assertTrue(images[0].is_main)
+        self.assertFalse(ImageUpload.objects.exists())
+
+
+def fake_ffmpeg(command, timeout=None):
+    """ffmpeg simulé : écrit le fichier de sortie (dernier argument)"""
+    with open(command[-1], 'wb') as output:
+        output.write(b'#EXTM3U\n' if command[-1].endswith('.m3u8') else b'\xff\xd8')
+    return ''
+
+
+@override_settings(FFMPEG_BINARY='ffmpeg', FFPROBE_BINARY='ffprobe')
+class VideoTranscodeTests(MediaRootMixin, TestCase):
+    """File des conversions HLS : traitement, nouvel essai, tâche d'un worker perdu"""
+
+    def setUp(self):
+        super().setUp()
+        artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.product = Product.objects.create(
+            artisan=artisan, name='Masque', description='d', price=1000, stock=5, category='other',
+            video_url='product_videos/masque.mp4',
+        )
+
+    @mock.patch('products.video.run', side_effect=fake_ffmpeg)
+    @mock.patch('products.video.probe', return_value=(1280, 720, 12.0))
+    def test_pipeline(self, probe, run):
+        job = VideoTranscodeService.claim_next()
+        self.assertEqual((job.product_id, job.status, job.attempts), (self.product.pk, VideoTranscodeJob.Status.PROCESSING, 1))
+
+        job = VideoTranscodeService.process(job)
+
+        self.assertEqual(job.status, VideoTranscodeJob.Status.READY)
+        self.assertEqual([rendition['name'] for rendition in job.renditions], ['240p', '480p', '720p'])
+        self.assertEqual(run.call_count, 4)  # trois qualités et l'aperçu
+        with default_storage.open(job.playlist) as master:
+            playlist = master.read().decode()
+        self.assertIn('RESOLUTION=426x240\n240p/index.m3u8', playlist)
+        for name in ('720p/index.m3u8', 'poster.jpg'):
+            self.assertTrue(default_storage.exists(f'product_videos/hls/{job.id}/{name}'))
+        self.assertIsNone(VideoTranscodeService.claim_next())
+
+    @mock.patch('products.video.run', side_effect=fake_ffmpeg)
+    @mock.patch('products.video.probe', return_value=(640, 360, 12.0))
+    def test_no_upscaling(self, probe, run):
+        job = VideoTranscodeService.process(VideoTranscodeService.claim_next())
+        self.assertEqual([rendition['name'] for rendition in job.renditions], ['240p'])
+
+    @mock.patch('products.video.VideoTranscodeService.transcode', side_effect=TranscodeError('codec'))
+    def test_failure_retried_then_failed(self, transcode):
+        statuses = []
+        with self.assertLogs('products.video', 'WARNING'):
+            while (job := VideoTranscodeService.claim_next()) is not None:
+                statuses.append(VideoTranscodeService.process(job).status)
+        self.assertEqual(statuses, ['pending'] * (MAX_ATTEMPTS - 1) + ['failed'])
+
+    def test_lost_worker_recovered(self):
+        job = VideoTranscodeService.claim_next()
+        self.assertIsNone(VideoTranscodeService.claim_next())
+
+        # Worker arrêté : la tâche reste "En cours" au-delà du délai
+        VideoTranscodeJob.objects.update(started_at=timezone.now() - claim_timeout() - timedelta(minutes=1))
+        with self.assertLogs('products.video', 'WARNING'):
+            again = VideoTranscodeService.claim_next()
+        self.assertEqual((again.pk, again.attempts), (job.pk, 2))
+
+        VideoTranscodeJob.objects.update(attempts=MAX_ATTEMPTS, started_at=timezone.now() - claim_timeout() * 2)
+        with self.assertLogs('products.video', 'WARNING'):
+            self.assertIsNone(VideoTranscodeService.claim_next())
+        self.assertEqual(VideoTranscodeJob.objects.get().status, VideoTranscodeJob.Status.FAILED)
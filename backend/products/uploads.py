@@ -0,0 +1,208 @@
+# products/uploads.py
+"""
+Envoi des images produits, sans charger le fichier en mémoire.
+
+- Multipart (un seul appel) : Django écrit déjà les gros fichiers dans un
+  fichier temporaire (FILE_UPLOAD_MAX_MEMORY_SIZE).
+- Par morceaux (reprenable) : chaque PUT ajoute un morceau au fichier
+  temporaire de la session ; la mémoire utilisée est bornée par
+  IMAGE_UPLOAD_CHUNK_SIZE.
+
+Le fichier complet est haché (SHA-256) et rangé sous
+products/<sha256>.<ext> : un contenu déjà stocké n'est pas réécrit.
+Les ProductImage sont rattachées ensuite via attach().
+"""
+import hashlib
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from core.images import schedule_for
+from .models import ImageUpload, Product, ProductImage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_SIZE = 20 * 1024 * 1024
+ALLOWED_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+
+def chunk_size():
+    return getattr(settings, 'IMAGE_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def max_upload_size():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_SIZE', DEFAULT_MAX_SIZE)
+
+
+def spool_dir():
+    path = getattr(settings, 'IMAGE_UPLOAD_SPOOL_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'uploads', 'partial')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def spool_path(upload):
+    return os.path.join(spool_dir(), f"{upload.id}.part")
+
+
+class UploadError(ValueError):
+    pass
+
+
+class UploadService:
+
+    @classmethod
+    def start(cls, owner, filename, size):
+        """Ouvre une session d'envoi par morceaux"""
+        size = int(size)
+        if size <= 0 or size > max_upload_size():
+            raise UploadError(f"Taille invalide (maximum {max_upload_size()} octets)")
+        upload = ImageUpload.objects.create(owner=owner, filename=os.path.basename(filename or 'image'), size=size)
+        open(spool_path(upload), 'wb').close()
+        return upload
+
+    @classmethod
+    @transaction.atomic
+    def append_chunk(cls, upload, stream, offset, length):
+        """
+        Ajoute `length` octets lus sur `stream` à la position `offset`.
+        Un offset différent de upload.received est refusé : le client
+        reprend à partir de upload.received. La ligne de l'envoi est
+        verrouillée pendant l'écriture : de deux PUT au même offset, le
+        second voit la position avancée et est refusé.
+        """
+        upload = ImageUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status == ImageUpload.Status.COMPLETE:
+            raise UploadError("Envoi déjà terminé")
+        if offset != upload.received:
+            raise UploadError(f"Position attendue : {upload.received}")
+        if length <= 0 or offset + length > upload.size:
+            raise UploadError("Morceau hors des limites du fichier")
+
+        written = 0
+        with open(spool_path(upload), 'r+b') as spool:
+            spool.seek(offset)
+            while written < length:
+                data = stream.read(min(chunk_size(), length - written))
+                if not data:
+                    break
+                spool.write(data)
+                written += len(data)
+            spool.truncate(offset + written)
+
+        upload.received = offset + written
+        upload.save(update_fields=['received', 'updated_at'])
+        if upload.received == upload.size:
+            with open(spool_path(upload), 'rb') as spool:
+                cls.complete(upload, spool)
+            os.remove(spool_path(upload))
+        return upload
+
+    @classmethod
+    def upload_file(cls, owner, uploaded_file):
+        """Envoi en une fois (UploadedFile multipart)"""
+        if uploaded_file.size > max_upload_size():
+            raise UploadError(f"Fichier trop volumineux (maximum {max_upload_size()} octets)")
+        upload = ImageUpload.objects.create(
+            owner=owner,
+            filename=os.path.basename(uploaded_file.name or 'image'),
+            size=uploaded_file.size,
+            received=uploaded_file.size,
+        )
+        cls.complete(upload, uploaded_file)
+        return upload
+
+    @classmethod
+    def complete(cls, upload, fileobj):
+        name, content_hash = cls.store(fileobj)
+        upload.file.name = name
+        upload.content_hash = content_hash
+        upload.status = ImageUpload.Status.COMPLETE
+        upload.save(update_fields=['file', 'content_hash', 'status', 'updated_at'])
+
+    @classmethod
+    def store(cls, fileobj):
+        """
+        Vérifie l'image, calcule son SHA-256 par blocs et la range dans le
+        stockage sous un nom dérivé du contenu. Retourne (nom, hash).
+        """
+        fileobj.seek(0)
+        try:
+            with Image.open(fileobj) as image:
+                image_format = image.format
+                image.verify()
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            raise UploadError("Le fichier n'est pas une image valide")
+        if image_format not in ALLOWED_FORMATS:
+            raise UploadError(f"Format non supporté : {image_format}")
+
+        fileobj.seek(0)
+        digest = hashlib.sha256()
+        for block in iter(lambda: fileobj.read(chunk_size()), b''):
+            digest.update(block)
+        content_hash = digest.hexdigest()
+
+        name = f"products/{content_hash}.{ALLOWED_FORMATS[image_format]}"
+        if not default_storage.exists(name):
+            fileobj.seek(0)
+            name = default_storage.save(name, File(fileobj, name=name))
+        else:
+            logger.info(f"Image déjà stockée, réutilisée : {name}")
+        return name, content_hash
+
+    @classmethod
+    @transaction.atomic
+    def attach(cls, product, upload_ids, owner):
+        """Crée les ProductImage des envois terminés (dans l'ordre donné)"""
+        uploads = ImageUpload.objects.filter(
+            id__in=upload_ids, owner=owner, status=ImageUpload.Status.COMPLETE
+        ).in_bulk()
+        ordered = [uploads[pk] for pk in cls._as_uuids(upload_ids) if pk in uploads]
+        if len(ordered) != len(upload_ids):
+            raise UploadError("Envoi inconnu ou incomplet")
+
+        has_main = product.images.filter(is_main=True).exists()
+        images = ProductImage.objects.bulk_create([
+            ProductImage(
+                product=product,
+                image=upload.file.name,
+                content_hash=upload.content_hash,
+                is_main=not has_main and index == 0,
+            )
+            for index, upload in enumerate(ordered)
+        ])
+        ImageUpload.objects.filter(id__in=[upload.id for upload in ordered]).delete()
+        Product.objects.filter(pk=product.pk).update(updated_at=timezone.now())
+        # bulk_create n'envoie pas post_save : variantes planifiées ici,
+        # après le commit (le worker doit lire les lignes créées)
+        transaction.on_commit(lambda: schedule_for(images))
+        return images
+
+    @classmethod
+    def _as_uuids(cls, upload_ids):
+        return [ImageUpload._meta.pk.to_python(pk) for pk in upload_ids]
+
+    @classmethod
+    def purge_stale(cls, age=timedelta(days=1)):
+        """
+        Supprime les envois plus vieux que `age` jamais rattachés à un
+        produit. Les fichiers stockés (partagés par hash) sont conservés.
+        """
+        stale = ImageUpload.objects.filter(updated_at__lt=timezone.now() - age)
+        count = 0
+        for upload in stale.iterator():
+            if upload.status == ImageUpload.Status.PENDING:
+                try:
+                    os.remove(spool_path(upload))
+                except FileNotFoundError:
+                    pass
+            upload.delete()
+            count += 1
+        return count
@@ -1,10 +1,23 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet
+from core.async_api import async_read_view
+from .views import ImageUploadViewSet, ProductViewSet
 
 router = DefaultRouter()
 router.register(r'products', ProductViewSet)
+router.register(r'uploads', ImageUploadViewSet)
 
-urlpatterns = [
+urlpatterns = []
+if settings.ASYNC_API_VIEWS:
+    # Lectures asynchrones (profil ASGI), prioritaires sur les routes du router
+    urlpatterns += [
+        path('products/', async_read_view(ProductViewSet, {'get': 'list', 'post': 'create'}, 'list')),
+        path('products/<int:pk>/', async_read_view(ProductViewSet, {
+            'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+        }, 'retrieve')),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
 ]
@@ -0,0 +1,251 @@
+# products/video.py
+"""
+Conversion des vidéos produits en HLS (HTTP Live Streaming).
+
+Une vidéo envoyée (Product.video_url, souvent un MP4 WhatsApp) crée une
+VideoTranscodeJob. Un worker (commande process_video_jobs) la convertit
+avec ffmpeg en plusieurs qualités découpées en segments de quelques
+secondes, plus une image d'aperçu :
+
+    product_videos/hls/<job>/master.m3u8
+    product_videos/hls/<job>/240p/index.m3u8, seg_000.ts, ...
+    product_videos/hls/<job>/poster.jpg
+
+Le lecteur démarre sur le premier segment de la qualité adaptée au
+réseau, sans télécharger tout le fichier.
+
+Une tâche prise par un worker arrêté en cours de route (processus tué,
+machine redémarrée) reste "En cours" : passé VIDEO_CLAIM_TIMEOUT, elle est
+remise en attente, ou marquée en échec après MAX_ATTEMPTS essais.
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Product, VideoTranscodeJob
+
+logger = logging.getLogger(__name__)
+
+# (hauteur, débit vidéo kb/s, débit audio kb/s)
+DEFAULT_RENDITIONS = ((240, 400, 64), (480, 1000, 96), (720, 2500, 128))
+DEFAULT_SEGMENT_SECONDS = 4
+DEFAULT_CLAIM_TIMEOUT = 3 * 3600  # secondes : au-delà, la tâche en cours est considérée perdue
+MAX_ATTEMPTS = 3
+
+
+class TranscodeError(Exception):
+    pass
+
+
+def claim_timeout():
+    return timedelta(seconds=getattr(settings, 'VIDEO_CLAIM_TIMEOUT', DEFAULT_CLAIM_TIMEOUT))
+
+
+def renditions():
+    return getattr(settings, 'VIDEO_HLS_RENDITIONS', DEFAULT_RENDITIONS)
+
+
+def ffmpeg_binary(name='ffmpeg'):
+    path = getattr(settings, 'FFMPEG_BINARY' if name == 'ffmpeg' else 'FFPROBE_BINARY', None) or shutil.which(name)
+    if not path:
+        raise TranscodeError(f"{name} introuvable (installer ffmpeg ou définir FFMPEG_BINARY / FFPROBE_BINARY)")
+    return path
+
+
+def run(command, timeout=None):
+    try:
+        result = subprocess.run(
+            command, capture_output=True, text=True,
+            timeout=timeout or getattr(settings, 'VIDEO_TRANSCODE_TIMEOUT', 1800),
+        )
+    except subprocess.TimeoutExpired:
+        raise TranscodeError(f"Délai dépassé : {os.path.basename(command[0])}")
+    if result.returncode != 0:
+        raise TranscodeError(result.stderr.strip()[-2000:] or f"Code de sortie {result.returncode}")
+    return result.stdout
+
+
+def probe(path):
+    """Dimensions et durée de la vidéo source"""
+    output = run([
+        ffmpeg_binary('ffprobe'), '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height:format=duration', '-of', 'json', path,
+    ], timeout=60)
+    data = json.loads(output or '{}')
+    streams = data.get('streams') or []
+    if not streams:
+        raise TranscodeError("Aucune piste vidéo dans le fichier")
+    duration = (data.get('format') or {}).get('duration')
+    return int(streams[0]['width']), int(streams[0]['height']), float(duration) if duration else None
+
+
+@contextmanager
+def local_source(name):
+    """Chemin local du fichier source (copie temporaire si le stockage est distant)"""
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        path = None
+    if path:
+        yield path
+        return
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(name)[1]) as temporary:
+        with default_storage.open(name, 'rb') as source:
+            for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                temporary.write(chunk)
+        temporary.flush()
+        yield temporary.name
+
+
+class VideoTranscodeService:
+
+    @classmethod
+    def schedule(cls, product):
+        """Crée une conversion pour la vidéo actuelle du produit, sauf si elle existe déjà"""
+        if not product.video_url:
+            return None
+        job = VideoTranscodeJob.objects.filter(product=product, source=product.video_url.name).first()
+        if job is None:
+            job = VideoTranscodeJob.objects.create(product=product, source=product.video_url.name)
+        return job
+
+    @classmethod
+    def recover_stale(cls):
+        """
+        Tâches "En cours" depuis plus de claim_timeout() : worker perdu.
+        Remises en attente, ou en échec si les essais sont épuisés.
+        Retourne le nombre de tâches reprises.
+        """
+        now = timezone.now()
+        stale = VideoTranscodeJob.objects.filter(
+            status=VideoTranscodeJob.Status.PROCESSING, started_at__lt=now - claim_timeout()
+        )
+        error = "Worker interrompu pendant la conversion"
+        failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+            status=VideoTranscodeJob.Status.FAILED, error=error, finished_at=now
+        )
+        requeued = stale.update(status=VideoTranscodeJob.Status.PENDING, error=error)
+        if failed or requeued:
+            logger.warning(f"Conversions vidéo perdues : {requeued} remise(s) en attente, {failed} en échec")
+        return failed + requeued
+
+    @classmethod
+    def claim_next(cls):
+        """Prend la plus ancienne tâche en attente (verrou sans attente entre workers)"""
+        cls.recover_stale()
+        with transaction.atomic():
+            job = (
+                VideoTranscodeJob.objects.select_for_update(skip_locked=True)
+                .filter(status=VideoTranscodeJob.Status.PENDING)
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            job.status = VideoTranscodeJob.Status.PROCESSING
+            job.started_at = timezone.now()
+            job.attempts += 1
+            job.save(update_fields=['status', 'started_at', 'attempts'])
+        return job
+
+    @classmethod
+    def process(cls, job):
+        try:
+            with tempfile.TemporaryDirectory(prefix='nsapka-hls-') as workdir:
+                result = cls.transcode(job.source, workdir)
+                prefix = f"product_videos/hls/{job.id}"
+                cls.upload_directory(workdir, prefix)
+        except (TranscodeError, OSError) as e:
+            retry = job.attempts < MAX_ATTEMPTS
+            job.status = VideoTranscodeJob.Status.PENDING if retry else VideoTranscodeJob.Status.FAILED
+            job.error = str(e)
+            job.finished_at = None if retry else timezone.now()
+            job.save(update_fields=['status', 'error', 'finished_at'])
+            logger.warning(f"Conversion vidéo #{job.id} échouée (essai {job.attempts}): {e}")
+            return job
+
+        job.status = VideoTranscodeJob.Status.READY
+        job.playlist = f"{prefix}/master.m3u8"
+        job.poster = f"{prefix}/poster.jpg"
+        job.renditions = result['renditions']
+        job.duration = result['duration']
+        job.error = ''
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'playlist', 'poster', 'renditions', 'duration', 'error', 'finished_at'])
+        Product.objects.filter(pk=job.product_id).update(updated_at=timezone.now())
+        logger.info(f"Vidéo du produit #{job.product_id} convertie en HLS ({len(job.renditions)} qualité(s))")
+        return job
+
+    @classmethod
+    def transcode(cls, source_name, workdir):
+        """Produit master.m3u8, les qualités et poster.jpg dans `workdir`"""
+        with local_source(source_name) as source_path:
+            width, height, duration = probe(source_path)
+            ffmpeg = ffmpeg_binary()
+            segment = str(getattr(settings, 'VIDEO_HLS_SEGMENT_SECONDS', DEFAULT_SEGMENT_SECONDS))
+
+            # Pas d'agrandissement : on garde les qualités <= source (au moins la plus basse)
+            targets = [r for r in renditions() if r[0] <= height] or [renditions()[0]]
+            produced = []
+            for target_height, video_kbps, audio_kbps in targets:
+                name = f"{target_height}p"
+                os.makedirs(os.path.join(workdir, name))
+                run([
+                    ffmpeg, '-y', '-v', 'error', '-i', source_path,
+                    '-map', '0:v:0', '-map', '0:a:0?',
+                    '-vf', f"scale=-2:{target_height}",
+                    '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main',
+                    '-b:v', f"{video_kbps}k", '-maxrate', f"{int(video_kbps * 1.07)}k",
+                    '-bufsize', f"{video_kbps * 2}k",
+                    # Une image clé par segment : chaque segment se lit seul
+                    '-force_key_frames', f"expr:gte(t,n_forced*{segment})",
+                    '-c:a', 'aac', '-b:a', f"{audio_kbps}k", '-ac', '2',
+                    '-f', 'hls', '-hls_time', segment, '-hls_playlist_type', 'vod',
+                    '-hls_segment_filename', os.path.join(workdir, name, 'seg_%03d.ts'),
+                    os.path.join(workdir, name, 'index.m3u8'),
+                ])
+                produced.append({
+                    'name': name,
+                    'width': int(round(width * target_height / height / 2) * 2),
+                    'height': target_height,
+                    'bandwidth': (video_kbps + audio_kbps) * 1000,
+                })
+
+            run([
+                ffmpeg, '-y', '-v', 'error', '-ss', str(min(1.0, (duration or 0) / 2)), '-i', source_path,
+                '-frames:v', '1', '-vf', f"scale=-2:{min(height, 720)}", '-q:v', '3',
+                os.path.join(workdir, 'poster.jpg'),
+            ])
+
+        with open(os.path.join(workdir, 'master.m3u8'), 'w') as master:
+            master.write("#EXTM3U\n#EXT-X-VERSION:3\n")
+            for rendition in produced:
+                master.write(
+                    f"#EXT-X-STREAM-INF:BANDWIDTH={rendition['bandwidth']},"
+                    f"RESOLUTION={rendition['width']}x{rendition['height']}\n"
+                    f"{rendition['name']}/index.m3u8\n"
+                )
+        return {'renditions': produced, 'duration': duration}
+
+    @classmethod
+    def upload_directory(cls, workdir, prefix):
+        for root, _, files in os.walk(workdir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = f"{prefix}/{os.path.relpath(path, workdir)}".replace(os.sep, '/')
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                with open(path, 'rb') as f:
+                    default_storage.save(name, File(f, name=name))
+
@@ -1,13 +1,42 @@
-from rest_framework import viewsets, permissions, status
+import re
+
+from django.http import StreamingHttpResponse
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import Product
-from .serializers import ProductSerializer
+from core.conditional import ConditionalGetMixin
+from core.mixins import QueryPlanMixin
+from core.pagination import SearchResultsPagination
+from .models import PRODUCT_STATE, ImageUpload, Product
+from .serializers import ImageUploadSerializer, ProductSerializer
+from .bulk import BulkImportError, ProductExportService, ProductImportService, can_bulk_edit, file_format
+from .reservations import ReservationService
+from .search import filter_category, search_products
+from .uploads import UploadError, UploadService
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all().order_by('-created_at')
+class ProductViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
+    queryset = Product.objects.all().order_by('-created_at', '-id')
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cursor_ordering = ('-created_at', '-id')
+    # Relations lues par ProductSerializer (artisan_details, images_details, main_image, video)
+    select_related_fields = ('artisan',)
+    prefetch_related_fields = ('images', 'video_jobs')
+    # Images, notes, stock et vidéo mettent aussi à jour Product.updated_at
+    conditional_fields = ('updated_at', 'artisan__updated_at')
+    # Liste : ETag tiré de la version des produits, sans agrégat sur le catalogue
+    conditional_versions = (PRODUCT_STATE,)
+
+    @property
+    def paginator(self):
+        # Une recherche est triée par pertinence : pagination par numéro de page
+        if not hasattr(self, '_paginator') and self.request.query_params.get('search'):
+            self._paginator = SearchResultsPagination()
+        return super().paginator
 
     def get_queryset(self):
         # Filtrer par catégorie ou recherche si nécessaire
@@ -16,9 +45,10 @@ class ProductViewSet(viewsets.ModelViewSet):
         search = self.request.query_params.get('search')
         
         if category:
-            queryset = queryset.filter(category__iexact=category)
+            queryset = filter_category(queryset, category)
         if search:
-            queryset = queryset.filter(name__icontains=search)
+            # Index plein texte, résultats triés par pertinence
+            queryset = search_products(queryset, search)
             
         return queryset
 
@@ -31,17 +61,142 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def my_products(self, request):
         # /api/products/my_products/
-        products = Product.objects.filter(artisan=request.user)
+        products = self.apply_query_plan(Product.objects.filter(artisan=request.user))
         
         # Appliquer les filtres
         category = request.query_params.get('category')
         search = request.query_params.get('search')
         
         if category:
-            products = products.filter(category__iexact=category)
+            products = filter_category(products, category)
+        products = products.order_by('-created_at', '-id')
         if search:
-            products = products.filter(name__icontains=search)
-            
-        products = products.order_by('-created_at')
+            products = search_products(products, search)
+
+        page = self.paginate_queryset(products)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(products, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+    @action(
+        detail=False, methods=['post'], url_path='import',
+        permission_classes=[permissions.IsAuthenticated], parser_classes=[MultiPartParser],
+    )
+    def bulk_import(self, request):
+        """
+        POST /api/products/import/  multipart `file` (.csv / .jsonl) et `images` (.zip)
+        Crée les produits valides, rapport ligne par ligne (voir products/bulk.py).
+        """
+        if not can_bulk_edit(request.user):
+            raise PermissionDenied("Réservé aux artisans et agents communautaires")
+        uploaded_file = request.FILES.get('file')
+        if uploaded_file is None:
+            return Response({'error': 'Fichier requis (champ file)'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = ProductImportService.import_file(
+                request.user,
+                uploaded_file,
+                file_format(uploaded_file.name, request.data.get('type')),
+                archive=request.FILES.get('images'),
+            )
+        except BulkImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def export(self, request):
+        """
+        GET /api/products/export/?type=csv|jsonl[&artisan=<id>]
+        Catalogue de l'artisan (ou de tous les artisans pour un agent), en flux.
+        """
+        if not can_bulk_edit(request.user):
+            raise PermissionDenied("Réservé aux artisans et agents communautaires")
+        try:
+            export_format = file_format(None, request.query_params.get('type', 'csv'))
+        except BulkImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = ProductExportService.queryset_for(request.user, request.query_params.get('artisan'))
+        content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(
+            ProductExportService.stream(queryset, export_format),
+            content_type=f'{content_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="produits.{export_format}"'
+        return response
+
+    @action(detail=True, methods=['post', 'delete'], permission_classes=[permissions.IsAuthenticated])
+    def reserve(self, request, pk=None):
+        """
+        POST /api/products/{id}/reserve/  {"quantity": 2}
+        Réserve du stock pour le panier de l'utilisateur (durée limitée).
+        DELETE libère la réservation.
+        """
+        product = self.get_object()
+        quantity = 0 if request.method == 'DELETE' else request.data.get('quantity', 1)
+        try:
+            reservation = ReservationService.reserve(product.id, quantity, user=request.user)
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        product.refresh_from_db(fields=['stock', 'reserved_stock'])
+        return Response({
+            'product_id': product.id,
+            'reserved_quantity': reservation.quantity if reservation else 0,
+            'expires_at': reservation.expires_at if reservation else None,
+            'available_stock': product.available_stock,
+        })
+
+
+class ImageUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Envoi d'images produits (voir products/uploads.py).
+
+    POST /api/uploads/  multipart `file`          -> envoi en une fois
+    POST /api/uploads/  {"filename", "size"}      -> session par morceaux
+    PUT  /api/uploads/{id}/  corps binaire + Content-Range: bytes <début>-<fin>/<taille>
+    GET  /api/uploads/{id}/                       -> position pour reprendre (received)
+    """
+    queryset = ImageUpload.objects.all()
+    serializer_class = ImageUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser, JSONParser]
+    pagination_class = None
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        try:
+            uploaded_file = request.FILES.get('file')
+            if uploaded_file is not None:
+                upload = UploadService.upload_file(request.user, uploaded_file)
+            else:
+                upload = UploadService.start(request.user, request.data.get('filename'), request.data.get('size'))
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data, status=status.HTTP_201_CREATED)
+
+    def update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        match = CONTENT_RANGE_RE.match(request.headers.get('Content-Range', ''))
+        if not match:
+            return Response(
+                {'error': 'En-tête Content-Range requis : bytes <début>-<fin>/<taille>'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        start, end, total = (int(value) for value in match.groups())
+        if total != upload.size or end < start:
+            return Response({'error': 'Content-Range invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Lecture du corps par blocs, sans passer par request.data
+            upload = UploadService.append_chunk(upload, request.stream, start, end - start + 1)
+        except UploadError as e:
+            upload.refresh_from_db(fields=['received'])
+            return Response(
+                {'error': str(e), 'received': upload.received},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(self.get_serializer(upload).data)
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class SocialConfig(AppConfig):
     name = 'social'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from core.images import register
+
+        register(self.get_model('Message'), 'image', 'image_variants')
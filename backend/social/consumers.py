@@ -0,0 +1,108 @@
+# social/consumers.py
+"""
+Canal WebSocket d'une conversation : ws/conversations/<id>/
+
+Messages du client (JSON) :
+    {"type": "message", "content": "..."}
+    {"type": "typing", "is_typing": true}
+    {"type": "read", "up_to": <id message>}        (up_to optionnel)
+    {"type": "history", "before": <id message>, "limit": 30}
+
+Évènements envoyés aux participants :
+    {"type": "message", "message": {...}}
+    {"type": "typing", "user_id": ..., "is_typing": ...}
+    {"type": "read", "user_id": ..., "message_ids": [...]}
+    {"type": "history", "messages": [...], "next": <id message ou null>}
+    {"type": "error", "error": "..."}
+"""
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .services import MessagingService, conversation_group, serialize_message
+
+
+class ConversationConsumer(AsyncJsonWebsocketConsumer):
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        if self.user is None or not self.user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        conversation_id = self.scope['url_route']['kwargs']['conversation_id']
+        self.conversation = await database_sync_to_async(MessagingService.get_conversation)(
+            conversation_id, self.user
+        )
+        if self.conversation is None:
+            await self.close(code=4403)
+            return
+
+        self.group_name = conversation_group(self.conversation.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if getattr(self, 'group_name', None):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        handler = {
+            'message': self.handle_message,
+            'typing': self.handle_typing,
+            'read': self.handle_read,
+            'history': self.handle_history,
+        }.get(content.get('type'))
+        if handler is None:
+            await self.send_json({'type': 'error', 'error': "Type d'évènement inconnu"})
+            return
+        try:
+            await handler(content)
+        except (TypeError, ValueError) as e:
+            await self.send_json({'type': 'error', 'error': str(e)})
+
+    # Évènements du client
+
+    async def handle_message(self, content):
+        text = (content.get('content') or '').strip()
+        if not text:
+            raise ValueError("Message vide")
+        # La diffusion au groupe (expéditeur compris) est faite par le service
+        await database_sync_to_async(MessagingService.post_message)(self.conversation, self.user, text)
+
+    async def handle_typing(self, content):
+        await self.channel_layer.group_send(self.group_name, {
+            'type': 'chat.typing',
+            'user_id': self.user.id,
+            'is_typing': bool(content.get('is_typing', True)),
+            'sender_channel': self.channel_name,
+        })
+
+    async def handle_read(self, content):
+        up_to = content.get('up_to')
+        await database_sync_to_async(MessagingService.mark_read)(
+            self.conversation, self.user, int(up_to) if up_to is not None else None
+        )
+
+    async def handle_history(self, content):
+        before = content.get('before')
+        messages, next_cursor = await database_sync_to_async(MessagingService.history)(
+            self.conversation, int(before) if before is not None else None, content.get('limit'),
+        )
+        await self.send_json({
+            'type': 'history',
+            'messages': [serialize_message(m) for m in messages],
+            'next': next_cursor,
+        })
+
+    # Évènements du groupe
+
+    async def chat_message(self, event):
+        await self.send_json({'type': 'message', 'message': event['message']})
+
+    async def chat_typing(self, event):
+        if event.get('sender_channel') == self.channel_name:
+            return
+        await self.send_json({'type': 'typing', 'user_id': event['user_id'], 'is_typing': event['is_typing']})
+
+    async def chat_read(self, event):
+        await self.send_json({'type': 'read', 'user_id': event['user_id'], 'message_ids': event['message_ids']})
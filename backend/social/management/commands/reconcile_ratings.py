@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from social.ratings import RatingService
+
+
+class Command(BaseCommand):
+    help = "Recalcule les notes moyennes des produits et des artisans depuis les avis"
+
+    def handle(self, *args, **options):
+        RatingService.reconcile()
+        self.stdout.write(self.style.SUCCESS("Notes des produits et des artisans recalculées"))
@@ -0,0 +1,40 @@
+# social/middleware.py
+"""
+Authentification des WebSockets par jeton JWT (application Flutter) :
+ws/conversations/<id>/?token=<access token>
+
+Sans jeton, la session Django (site web) est utilisée.
+"""
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+@database_sync_to_async
+def get_user_from_token(raw_token):
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return AnonymousUser()
+    User = get_user_model()
+    return User.objects.filter(id=token.get('user_id'), is_active=True).first() or AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        token = query.get('token')
+        if token:
+            scope = dict(scope, user=await get_user_from_token(token[0]))
+        return await super().__call__(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    return AuthMiddlewareStack(JWTAuthMiddleware(inner))
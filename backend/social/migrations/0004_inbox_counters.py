@@ -0,0 +1,81 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_inbox_counters(apps, schema_editor):
+    Conversation = apps.get_model('social', 'Conversation')
+    ConversationParticipant = apps.get_model('social', 'ConversationParticipant')
+    Message = apps.get_model('social', 'Message')
+
+    for conversation in Conversation.objects.iterator():
+        last = Message.objects.filter(conversation=conversation).order_by('-timestamp', '-id').first()
+        if last is not None:
+            Conversation.objects.filter(id=conversation.id).update(
+                last_message_preview=(last.content or '')[:255],
+                last_message_sender_id=last.sender_id,
+                last_message_at=last.timestamp,
+            )
+
+    for membership in ConversationParticipant.objects.iterator():
+        unread = Message.objects.filter(
+            conversation_id=membership.conversation_id, is_read=False
+        ).exclude(sender_id=membership.user_id).count()
+        if unread:
+            ConversationParticipant.objects.filter(id=membership.id).update(unread_count=unread)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0003_cursor_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        # La table de la relation ManyToMany existe déjà : seul l'état change
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ConversationParticipant',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='social.conversation')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'social_conversation_participants',
+                        'unique_together': {('conversation', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='conversation',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='conversations', through='social.ConversationParticipant', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_inbox_counters, migrations.RunPython.noop),
+    ]
@@ -12,17 +12,65 @@ class Review(models.Model):
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Pagination par curseur (core.pagination)
+            models.Index(fields=['created_at', 'id'], name='review_created_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Note et cible chargées, retirées des agrégats si l'avis change (social.ratings)
+        fields = ('rating', 'product_id', 'artisan_id')
+        if all(field in instance.__dict__ for field in fields):
+            instance._loaded_rating = instance.rating_state()
+        return instance
+
+    def rating_state(self):
+        """(note, product_id, artisan_id) comptés dans les agrégats"""
+        return self.rating, self.product_id, self.artisan_id
+
 class Conversation(models.Model):
-    participants = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='conversations')
+    participants = models.ManyToManyField(
+        settings.AUTH_USER_MODEL, related_name='conversations', through='ConversationParticipant'
+    )
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Dernier message (copie dénormalisée, maintenue par social.services)
+    last_message_preview = models.CharField(max_length=255, blank=True, default='')
+    last_message_sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='conversation_updated_id_idx'),
+        ]
+
+class ConversationParticipant(models.Model):
+    """Participation à une conversation, avec le compteur de messages non lus"""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversation_memberships')
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Table de l'ancienne relation ManyToMany implicite
+        db_table = 'social_conversation_participants'
+        unique_together = [('conversation', 'user')]
+
 class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField(null=True, blank=True) # null si c'est juste une image
     image = models.ImageField(upload_to='chat_images/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # core.images
     is_read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['timestamp']
\ No newline at end of file
+        ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='message_timestamp_id_idx'),
+        ]
\ No newline at end of file
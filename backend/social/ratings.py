@@ -0,0 +1,118 @@
+# social/ratings.py
+"""
+Agrégats des avis : somme et nombre de notes par produit et par artisan.
+
+Chaque création / modification / suppression d'avis applique un delta
+(UPDATE ... SET rating_sum = rating_sum + x) puis recalcule la moyenne
+sur la même ligne : Product.average_rating et User.rating restent des
+colonnes indexables, sans AVG() au moment du tri.
+
+Un avis compte pour le produit noté et pour son artisan ; un avis
+laissé directement à un artisan (sans produit) compte pour l'artisan.
+À la création et à la modification, l'artisan d'un produit est résolu
+dans l'UPDATE lui-même (jointure), sans requête de lecture par avis.
+"""
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from products.models import Product
+from .models import Review
+
+logger = logging.getLogger(__name__)
+
+
+def average_expression():
+    """rating_sum / review_count, 0 si aucun avis"""
+    return Coalesce(
+        Cast(F('rating_sum'), FloatField()) / NullIf(F('review_count'), 0),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def product_artisan(product_id):
+    """Artisan d'un produit (suppression d'avis, avant celle du produit)"""
+    if product_id is None:
+        return None
+    return Product.objects.filter(id=product_id).values_list('artisan_id', flat=True).first()
+
+
+def review_subquery(filters, aggregate):
+    """Agrégat des avis correspondant à `filters` (sous-requête corrélée), 0 si aucun"""
+    reviews = (
+        Review.objects.filter(filters).order_by()
+        .annotate(group=Value(1)).values('group')
+        .annotate(value=aggregate).values('value')[:1]
+    )
+    return Coalesce(Subquery(reviews, output_field=IntegerField()), Value(0))
+
+
+class RatingService:
+
+    @classmethod
+    @transaction.atomic
+    def apply(cls, product_id, artisan_id, rating, count):
+        """
+        Ajoute (count=1) ou retire (count=-1) une note des agrégats.
+        Sans artisan_id, l'avis compte pour l'artisan du produit.
+        """
+        if product_id is not None:
+            cls._apply_delta(Product.objects.filter(id=product_id), 'average_rating', rating * count, count)
+        if artisan_id is not None:
+            artisans = get_user_model().objects.filter(id=artisan_id)
+        elif product_id is not None:
+            artisans = get_user_model().objects.filter(products__id=product_id)
+        else:
+            return
+        cls._apply_delta(artisans, 'rating', rating * count, count)
+
+    @classmethod
+    def _apply_delta(cls, queryset, average_field, delta_sum, delta_count):
+        queryset.update(
+            rating_sum=F('rating_sum') + delta_sum,
+            review_count=F('review_count') + delta_count,
+            updated_at=timezone.now(),
+        )
+        queryset.update(**{average_field: average_expression()})
+
+    @classmethod
+    def review_saved(cls, review, previous=None):
+        """previous = Review.rating_state() avant modification"""
+        if previous is not None:
+            if previous == review.rating_state():
+                return
+            old_rating, old_product_id, old_artisan_id = previous
+            cls.apply(old_product_id, old_artisan_id, old_rating, -1)
+        cls.apply(review.product_id, review.artisan_id, review.rating, 1)
+
+    @classmethod
+    def review_deleted(cls, review, artisan_id=None):
+        cls.apply(review.product_id, artisan_id or review.artisan_id, review.rating, -1)
+
+    @classmethod
+    @transaction.atomic
+    def reconcile(cls):
+        """Recalcule tous les agrégats depuis la table des avis (UPDATE par sous-requêtes)"""
+        product_reviews = Q(product=OuterRef('pk'))
+        Product.objects.update(
+            rating_sum=review_subquery(product_reviews, Sum('rating')),
+            review_count=review_subquery(product_reviews, Count('id')),
+            updated_at=timezone.now(),
+        )
+        Product.objects.update(average_rating=average_expression())
+
+        # Avis direct à l'artisan, sinon avis sur un de ses produits
+        artisan_reviews = Q(artisan=OuterRef('pk')) | Q(artisan__isnull=True, product__artisan=OuterRef('pk'))
+        User = get_user_model()
+        User.objects.update(
+            rating_sum=review_subquery(artisan_reviews, Sum('rating')),
+            review_count=review_subquery(artisan_reviews, Count('id')),
+            updated_at=timezone.now(),
+        )
+        User.objects.update(rating=average_expression())
+        logger.info("Agrégats des avis recalculés")
@@ -1,18 +1,52 @@
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from core import images
 from .models import Review, Message, Conversation
 
+User = get_user_model()
+
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = '__all__'
 
 class MessageSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Message
         fields = '__all__'
+        read_only_fields = ['sender', 'is_read']
+
+    def get_image_variants(self, obj):
+        return images.variants_payload(obj.image, obj.image_variants, self.context.get('request'))
+
+class ParticipantSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='first_name', read_only=True)
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'name', 'profile_image', 'role']
+
 
 class ConversationSerializer(serializers.ModelSerializer):
-    messages = MessageSerializer(many=True, read_only=True)
+    """Ligne de la boîte de réception : pas de messages imbriqués"""
+    # Relation avec modèle intermédiaire : déclarée explicitement pour rester modifiable
+    participants = serializers.PrimaryKeyRelatedField(many=True, queryset=User.objects.all())
+    participants_detail = ParticipantSerializer(source='participants', many=True, read_only=True)
+    last_message = serializers.SerializerMethodField()
+    # Annoté par ConversationViewSet (compteur de l'utilisateur connecté)
+    unread_count = serializers.IntegerField(read_only=True, default=0)
+
     class Meta:
         model = Conversation
-        fields = '__all__'
+        fields = ['id', 'participants', 'participants_detail', 'updated_at', 'last_message', 'unread_count']
+
+    def get_last_message(self, obj):
+        if obj.last_message_at is None:
+            return None
+        return {
+            'preview': obj.last_message_preview,
+            'sender': obj.last_message_sender_id,
+            'timestamp': serializers.DateTimeField().to_representation(obj.last_message_at),
+        }
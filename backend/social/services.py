@@ -0,0 +1,127 @@
+# social/services.py
+"""
+Messagerie : création, lecture et historique des messages d'une
+conversation. Utilisé par l'API REST et par le consumer WebSocket
+(social/consumers.py) ; chaque nouveau message est diffusé aux
+participants connectés via la couche channels.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from .models import Conversation, ConversationParticipant, Message
+
+logger = logging.getLogger(__name__)
+
+HISTORY_PAGE_SIZE = 30
+HISTORY_MAX_PAGE_SIZE = 100
+PREVIEW_LENGTH = 255
+
+
+def conversation_group(conversation_id):
+    """Groupe channels des participants connectés à une conversation"""
+    return f"conversation_{conversation_id}"
+
+
+def message_preview(message):
+    if message.content:
+        return message.content[:PREVIEW_LENGTH]
+    return '📷 Photo' if message.image else ''
+
+
+def serialize_message(message):
+    return {
+        'id': message.id,
+        'conversation': message.conversation_id,
+        'sender': message.sender_id,
+        'content': message.content,
+        'image': message.image.url if message.image else None,
+        'is_read': message.is_read,
+        'timestamp': message.timestamp.isoformat(),
+    }
+
+
+class MessagingService:
+
+    @classmethod
+    def get_conversation(cls, conversation_id, user):
+        """Conversation dont `user` est participant, sinon None"""
+        return Conversation.objects.filter(id=conversation_id, participants=user).first()
+
+    @classmethod
+    @transaction.atomic
+    def post_message(cls, conversation, sender, content=None, image=None):
+        message = Message.objects.create(
+            conversation=conversation, sender=sender, content=content, image=image,
+        )
+        # Copie du dernier message et compteurs non lus, dans la même transaction
+        Conversation.objects.filter(id=conversation.id).update(
+            updated_at=message.timestamp,
+            last_message_preview=message_preview(message),
+            last_message_sender=sender,
+            last_message_at=message.timestamp,
+        )
+        ConversationParticipant.objects.filter(conversation=conversation).exclude(user=sender).update(
+            unread_count=F('unread_count') + 1
+        )
+        cls.broadcast(conversation.id, {'type': 'chat.message', 'message': serialize_message(message)})
+        return message
+
+    @classmethod
+    @transaction.atomic
+    def mark_read(cls, conversation, user, up_to=None):
+        """
+        Marque comme lus, en un UPDATE, les messages reçus par `user`
+        (jusqu'au message `up_to` inclus). Retourne les ids marqués.
+        """
+        unread = Message.objects.filter(conversation=conversation, is_read=False).exclude(sender=user)
+        if up_to is not None:
+            unread = unread.filter(id__lte=up_to)
+        ids = list(unread.values_list('id', flat=True))
+        if ids:
+            # Le nombre de lignes réellement modifiées : un appel concurrent
+            # ne décrémente pas deux fois le compteur
+            marked = Message.objects.filter(id__in=ids, is_read=False).update(is_read=True)
+            ConversationParticipant.objects.filter(conversation=conversation, user=user).update(
+                unread_count=Greatest(F('unread_count') - marked, 0)
+            )
+            cls.broadcast(conversation.id, {'type': 'chat.read', 'user_id': user.id, 'message_ids': ids})
+        return ids
+
+    @classmethod
+    def history(cls, conversation, before=None, limit=HISTORY_PAGE_SIZE):
+        """
+        Page de messages plus anciens que le message `before` (curseur
+        (timestamp, id), index message_timestamp_id_idx), du plus récent
+        au plus ancien. Retourne (messages, curseur suivant ou None).
+        """
+        limit = max(1, min(int(limit or HISTORY_PAGE_SIZE), HISTORY_MAX_PAGE_SIZE))
+        messages = Message.objects.filter(conversation=conversation)
+        if before is not None:
+            cursor = messages.filter(id=before).values_list('timestamp', 'id').first()
+            if cursor is None:
+                return [], None
+            timestamp, message_id = cursor
+            messages = messages.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id))
+        page = list(messages.order_by('-timestamp', '-id')[:limit + 1])
+        next_cursor = page[limit - 1].id if len(page) > limit else None
+        return page[:limit], next_cursor
+
+    @classmethod
+    def broadcast(cls, conversation_id, event):
+        """Diffuse un évènement aux participants connectés, après le commit"""
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+
+        def send():
+            try:
+                async_to_sync(channel_layer.group_send)(conversation_group(conversation_id), event)
+            except Exception:
+                logger.exception(f"Diffusion impossible sur la conversation {conversation_id}")
+
+        transaction.on_commit(send)
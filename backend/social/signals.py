@@ -0,0 +1,40 @@
+# social/signals.py
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Review
+from .ratings import RatingService, product_artisan
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    """Note et cible avant modification, pour retirer l'ancienne valeur"""
+    instance._previous_rating = None
+    if raw or instance.pk is None or instance._state.adding:
+        return
+    if hasattr(instance, '_loaded_rating'):
+        instance._previous_rating = instance._loaded_rating
+    else:
+        # Instance construite à la main (pas chargée depuis la base)
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list(
+            'rating', 'product_id', 'artisan_id'
+        ).first()
+
+
+@receiver(post_save, sender=Review)
+def update_ratings_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    RatingService.review_saved(instance, previous=None if created else instance._previous_rating)
+    instance._loaded_rating = instance.rating_state()
+
+
+@receiver(pre_delete, sender=Review)
+def remember_review_artisan(sender, instance, **kwargs):
+    # Le produit peut être supprimé dans la même cascade : on résout l'artisan avant
+    instance._rating_artisan_id = instance.artisan_id or product_artisan(instance.product_id)
+
+
+@receiver(post_delete, sender=Review)
+def update_ratings_on_delete(sender, instance, **kwargs):
+    RatingService.review_deleted(instance, artisan_id=getattr(instance, '_rating_artisan_id', None))
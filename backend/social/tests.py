@@ -1,3 +1,368 @@
-from django.test import TestCase
+import json
+
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from products.models import Product
+from users.models import User
+from .models import Conversation, ConversationParticipant, Message, Review
+from .ratings import RatingService
+from .routing import websocket_urlpatterns
+from .services import MessagingService
+
+
+class MessagingApiQueryTests(TestCase):
+    """Nombre de requêtes des conversations et messages, quel que soit leur nombre"""
+
+    def setUp(self):
+        cache.clear()
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.api = APIClient()
+        self.api.force_authenticate(self.buyer)
+        self.conversation = self.add_conversations(2)[0]
+        self.add_messages(3)
+
+    def add_conversations(self, count):
+        conversations = []
+        for _ in range(count):
+            index = User.objects.count()
+            artisan = User.objects.create_user(
+                f'artisan{index}', password='x', role=User.Role.ARTISAN, phone=f'02{index:02d}',
+            )
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.buyer, artisan)
+            MessagingService.post_message(conversation, artisan, content='Bonjour')
+            conversations.append(conversation)
+        return conversations
+
+    def add_messages(self, count):
+        for index in range(count):
+            MessagingService.post_message(self.conversation, self.buyer, content=f'Message {index}')
+
+    def get(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_conversations(self):
+        # Page (dernier message et non lus dénormalisés), participants
+        self.get('/api/conversations/', 2)
+        self.add_conversations(4)
+        self.assertEqual(len(self.get('/api/conversations/', 2).data['results']), 6)
+
+    def test_conversation(self):
+        self.get(f'/api/conversations/{self.conversation.pk}/', 2)
+
+    def test_messages(self):
+        url = f'/api/messages/?conversation={self.conversation.pk}'
+        self.get(url, 1)
+        self.add_messages(5)
+        self.assertEqual(len(self.get(url, 1).data['results']), 9)
+
+
+class InboxTests(TestCase):
+    """Dernier message et non lus dénormalisés : envoi, lecture, accès"""
+
+    def setUp(self):
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.buyer, self.artisan)
+
+    def client_for(self, user):
+        api = APIClient()
+        api.force_authenticate(user)
+        return api
+
+    def send(self, user, content):
+        response = self.client_for(user).post(
+            '/api/messages/', {'conversation': self.conversation.pk, 'content': content}, format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def inbox(self, user):
+        response = self.client_for(user).get('/api/conversations/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0]
+
+    def read(self, user, **data):
+        return self.client_for(user).post(f'/api/conversations/{self.conversation.pk}/read/', data, format='json')
+
+    def test_unread_counts(self):
+        self.send(self.artisan, 'Bonjour')
+        self.send(self.artisan, 'Le pagne est prêt')
+
+        inbox = self.inbox(self.buyer)
+        self.assertEqual(inbox['unread_count'], 2)
+        self.assertEqual(
+            (inbox['last_message']['preview'], inbox['last_message']['sender']), ('Le pagne est prêt', self.artisan.pk),
+        )
+        # Ses propres messages ne comptent pas
+        self.assertEqual(self.inbox(self.artisan)['unread_count'], 0)
+
+        self.send(self.buyer, 'Merci')
+        self.assertEqual(self.inbox(self.artisan)['unread_count'], 1)
+        self.assertEqual(self.inbox(self.buyer)['unread_count'], 2)
+
+    def test_read_up_to(self):
+        ids = [self.send(self.artisan, f'Message {index}') for index in range(3)]
+
+        self.assertEqual(self.read(self.buyer, up_to=ids[1]).data, {'marked': 2})
+        self.assertEqual(self.inbox(self.buyer)['unread_count'], 1)
+        self.assertEqual(list(Message.objects.filter(is_read=False).values_list('id', flat=True)), [ids[2]])
+
+        self.assertEqual(self.read(self.buyer).data, {'marked': 1})
+        self.assertEqual(self.read(self.buyer).data, {'marked': 0})
+        self.assertEqual(self.inbox(self.buyer)['unread_count'], 0)
+        self.assertEqual(self.read(self.buyer, up_to='dernier').status_code, 400)
+
+    def test_reading_own_messages_changes_nothing(self):
+        self.send(self.buyer, 'Bonjour')
+        self.assertEqual(self.read(self.buyer).data, {'marked': 0})
+        self.assertEqual(self.inbox(self.artisan)['unread_count'], 1)
+
+    def test_non_participant(self):
+        stranger = User.objects.create_user('stranger', password='x', role=User.Role.BUYER, phone='0102')
+        api = self.client_for(stranger)
+
+        response = api.post('/api/messages/', {'conversation': self.conversation.pk, 'content': 'Spam'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('conversation', response.data)
+        self.assertFalse(Message.objects.exists())
+        self.assertEqual(self.read(stranger).status_code, 404)
+        self.assertEqual(
+            list(ConversationParticipant.objects.values_list('unread_count', flat=True)), [0, 0],
+        )
+        self.conversation.refresh_from_db()
+        self.assertIsNone(self.conversation.last_message_at)
+
+
+class InboxMigrationTests(TransactionTestCase):
+    """
+    0004_inbox_counters : le modèle intermédiaire reprend la table de
+    l'ancienne relation ManyToMany (lignes conservées) et les compteurs
+    sont calculés à partir des messages existants.
+    """
+    before = [('social', '0003_cursor_indexes')]
+    after = [('social', '0004_inbox_counters')]
+
+    def tearDown(self):
+        # Schéma complet pour les tests suivants
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_participants_table_reused(self):
+        # Utilisateurs : table hors des migrations testées
+        buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        old_apps = executor.loader.project_state(self.before).apps
+        OldConversation = old_apps.get_model('social', 'Conversation')
+        OldMessage = old_apps.get_model('social', 'Message')
+
+        conversation = OldConversation.objects.create()
+        conversation.participants.add(buyer.pk, artisan.pk)
+        for content in ('Bonjour', 'Toujours disponible ?'):
+            OldMessage.objects.create(conversation=conversation, sender_id=buyer.pk, content=content)
+        OldMessage.objects.create(conversation=conversation, sender_id=artisan.pk, content='Oui', is_read=True)
+        rows = sorted(
+            OldConversation.participants.through.objects.values_list('id', 'conversation_id', 'user_id')
+        )
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        new_apps = executor.loader.project_state(self.after).apps
+        Participant = new_apps.get_model('social', 'ConversationParticipant')
+        NewConversation = new_apps.get_model('social', 'Conversation')
+
+        self.assertEqual(Participant._meta.db_table, 'social_conversation_participants')
+        self.assertEqual(sorted(Participant.objects.values_list('id', 'conversation_id', 'user_id')), rows)
+        self.assertEqual(
+            dict(Participant.objects.values_list('user_id', 'unread_count')), {buyer.pk: 0, artisan.pk: 2},
+        )
+        migrated = NewConversation.objects.get()
+        self.assertEqual((migrated.last_message_preview, migrated.last_message_sender_id), ('Oui', artisan.pk))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ConversationConsumerTests(TransactionTestCase):
+    """
+    Canal WebSocket d'une conversation sur la couche en mémoire
+    (TransactionTestCase : la diffusion part après le commit).
+    """
+
+    def setUp(self):
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.buyer, self.artisan)
+
+    async def connect(self, user):
+        """
+        Client WebSocket (asgiref ; channels.testing importe daphne, que
+        l'application n'utilise pas). Retourne (client, accepté, code).
+        """
+        communicator = ApplicationCommunicator(URLRouter(websocket_urlpatterns), {
+            'type': 'websocket',
+            'path': f'/ws/conversations/{self.conversation.pk}/',
+            'headers': [],
+            'subprotocols': [],
+            'user': user,
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        response = await communicator.receive_output()
+        return communicator, response['type'] == 'websocket.accept', response.get('code')
+
+    async def send(self, communicator, content):
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(content)})
+
+    async def receive(self, communicator):
+        response = await communicator.receive_output()
+        self.assertEqual(response['type'], 'websocket.send')
+        return json.loads(response['text'])
+
+    async def disconnect(self, communicator):
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait()
+
+    async def test_message_broadcast_to_participants(self):
+        buyer, connected, _ = await self.connect(self.buyer)
+        self.assertTrue(connected)
+        artisan, connected, _ = await self.connect(self.artisan)
+        self.assertTrue(connected)
+
+        await self.send(buyer, {'type': 'message', 'content': 'Bonjour'})
+        for communicator in (buyer, artisan):
+            event = await self.receive(communicator)
+            self.assertEqual(event['type'], 'message')
+            self.assertEqual(event['message']['content'], 'Bonjour')
+        message = await database_sync_to_async(Message.objects.get)()
+        self.assertEqual(message.sender_id, self.buyer.pk)
+
+        # Saisie : les autres participants seulement
+        await self.send(artisan, {'type': 'typing', 'is_typing': True})
+        self.assertEqual(
+            await self.receive(buyer), {'type': 'typing', 'user_id': self.artisan.pk, 'is_typing': True}
+        )
+        self.assertTrue(await artisan.receive_nothing())
+
+        await self.disconnect(buyer)
+        await self.disconnect(artisan)
+
+    async def test_outsider_refused(self):
+        outsider = await database_sync_to_async(User.objects.create_user)(
+            'outsider', password='x', role=User.Role.BUYER, phone='0102',
+        )
+        communicator, connected, code = await self.connect(outsider)
+        self.assertFalse(connected)
+        self.assertEqual(code, 4403)
+
+
+class RatingServiceTests(TestCase):
+    """Agrégats des notes tenus par deltas, identiques au recalcul complet (reconcile)"""
+
+    def setUp(self):
+        self.buyer = User.objects.create_user('buyer', password='x', role=User.Role.BUYER, phone='0101')
+        self.artisan = User.objects.create_user('artisan', password='x', role=User.Role.ARTISAN, phone='0100')
+        self.other = User.objects.create_user('other', password='x', role=User.Role.ARTISAN, phone='0102')
+        self.mask = self.add_product(self.artisan, 'Masque')
+        self.stool = self.add_product(self.other, 'Tabouret')
+
+    def add_product(self, artisan, name):
+        return Product.objects.create(artisan=artisan, name=name, description='d', price=1000, stock=5, category='other')
+
+    def review(self, rating, **target):
+        return Review.objects.create(user=self.buyer, rating=rating, comment='c', **target)
+
+    def aggregates(self):
+        products = {
+            name: (rating_sum, count, average)
+            for name, rating_sum, count, average in Product.objects.values_list(
+                'name', 'rating_sum', 'review_count', 'average_rating'
+            )
+        }
+        artisans = {
+            username: (rating_sum, count, average)
+            for username, rating_sum, count, average in User.objects.filter(role=User.Role.ARTISAN).values_list(
+                'username', 'rating_sum', 'review_count', 'rating'
+            )
+        }
+        return products, artisans
+
+    def assertReconciled(self):
+        incremental = self.aggregates()
+        RatingService.reconcile()
+        self.assertEqual(self.aggregates(), incremental)
+        return incremental
+
+    def test_create(self):
+        self.review(4, product=self.mask)
+        self.review(2, artisan=self.artisan)
+
+        products, artisans = self.assertReconciled()
+        self.assertEqual(products['Masque'], (4, 1, 4.0))
+        self.assertEqual(artisans['artisan'], (6, 2, 3.0))
+        self.assertEqual(artisans['other'], (0, 0, 0.0))
+
+    def test_update_rating_and_product(self):
+        review = self.review(4, product=self.mask)
+        review = Review.objects.get(pk=review.pk)
+        review.rating = 2
+        review.save()
+        products, artisans = self.assertReconciled()
+        self.assertEqual((products['Masque'], artisans['artisan']), ((2, 1, 2.0), (2, 1, 2.0)))
+
+        # Même instance, puis changement de produit (et donc d'artisan)
+        review.product = self.stool
+        review.rating = 5
+        review.save()
+        products, artisans = self.assertReconciled()
+        self.assertEqual((products['Masque'], artisans['artisan']), ((0, 0, 0.0), (0, 0, 0.0)))
+        self.assertEqual((products['Tabouret'], artisans['other']), ((5, 1, 5.0), (5, 1, 5.0)))
+
+    def test_unchanged_save(self):
+        review = self.review(3, product=self.mask)
+        review = Review.objects.get(pk=review.pk)
+        review.comment = 'Très beau'
+        with self.assertNumQueries(1):
+            review.save()
+        self.assertEqual(self.assertReconciled()[0]['Masque'], (3, 1, 3.0))
+
+    def test_no_reads_on_write(self):
+        # L'artisan du produit est résolu dans l'UPDATE, la note précédente vient du chargement
+        with CaptureQueriesContext(connection) as queries:
+            review = self.review(4, product=self.mask)
+            review.rating = 1
+            review.save()
+        self.assertFalse([query['sql'] for query in queries if query['sql'].startswith('SELECT')])
+        self.assertEqual(self.assertReconciled()[1]['artisan'], (1, 1, 1.0))
+
+    def test_delete(self):
+        self.review(4, product=self.mask)
+        self.review(2, product=self.mask).delete()
+        products, artisans = self.assertReconciled()
+        self.assertEqual((products['Masque'], artisans['artisan']), ((4, 1, 4.0), (4, 1, 4.0)))
+
+        # Produit supprimé : ses avis sortent aussi de la note de l'artisan
+        self.mask.delete()
+        self.assertEqual(self.assertReconciled()[1]['artisan'], (0, 0, 0.0))
+
+    def test_reconcile_repairs_drift(self):
+        self.review(5, product=self.mask)
+        self.review(3, artisan=self.other)
+        expected = self.aggregates()
+        Product.objects.update(rating_sum=0, review_count=0, average_rating=0)
+        RatingService.reconcile()
+        self.assertEqual(self.aggregates(), expected)
 
-# Create your tests here.
@@ -1,15 +1,74 @@
-from rest_framework import viewsets
+from django.db.models import F
+from rest_framework import permissions, serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from core.mixins import QueryPlanMixin
 from .models import Review, Conversation, Message
 from .serializers import ReviewSerializer, ConversationSerializer, MessageSerializer
+from .services import MessagingService
 
 class ReviewViewSet(viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    cursor_ordering = ('-created_at', '-id')
 
-class ConversationViewSet(viewsets.ModelViewSet):
+class ConversationViewSet(QueryPlanMixin, viewsets.ModelViewSet):
+    """
+    Boîte de réception de l'utilisateur : dernier message et compteur de
+    non lus sont dénormalisés (social.services), la liste ne lit jamais
+    les messages.
+    """
     queryset = Conversation.objects.all()
     serializer_class = ConversationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ('-updated_at', '-id')
+    prefetch_related_fields = ('participants',)
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            memberships__user=self.request.user
+        ).annotate(unread_count=F('memberships__unread_count'))
+
+    def perform_create(self, serializer):
+        conversation = serializer.save()
+        conversation.participants.add(self.request.user)
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        """Marque comme lus les messages reçus (jusqu'à ?up_to=<id> si fourni)"""
+        conversation = self.get_object()
+        up_to = request.data.get('up_to')
+        try:
+            up_to = int(up_to) if up_to is not None else None
+        except (TypeError, ValueError):
+            return Response({'error': 'up_to invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        ids = MessagingService.mark_read(conversation, request.user, up_to)
+        return Response({'marked': len(ids)})
 
 class MessageViewSet(viewsets.ModelViewSet):
+    """
+    Messages des conversations de l'utilisateur (?conversation=<id>).
+    Le temps réel passe par le WebSocket ws/conversations/<id>/.
+    """
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ('-timestamp', '-id')
+
+    def get_queryset(self):
+        queryset = super().get_queryset().filter(conversation__participants=self.request.user)
+        conversation_id = self.request.query_params.get('conversation')
+        if conversation_id:
+            queryset = queryset.filter(conversation_id=conversation_id)
+        return queryset
+
+    def perform_create(self, serializer):
+        conversation = serializer.validated_data['conversation']
+        if not conversation.participants.filter(id=self.request.user.id).exists():
+            raise serializers.ValidationError({'conversation': "Vous ne participez pas à cette conversation"})
+        serializer.instance = MessagingService.post_message(
+            conversation,
+            self.request.user,
+            content=serializer.validated_data.get('content'),
+            image=serializer.validated_data.get('image'),
+        )
@@ -6,6 +6,7 @@ document.addEventListener('DOMContentLoaded', function () {
     // Éléments du DOM
     const searchInput = document.querySelector('.search-box input');
     const statusFilter = document.querySelector('.filter-select');
+    const sortSelect = document.querySelector('.sort-select');
     const customerModal = document.getElementById('customerModal');
     const closeModalBtn = document.querySelector('.close-modal');
     const viewCustomerBtns = document.querySelectorAll('.view-customer');
@@ -25,6 +26,9 @@ document.addEventListener('DOMContentLoaded', function () {
             const searchParams = new URLSearchParams(window.location.search);
             searchParams.set('search', searchInput.value.trim());
             searchParams.set('status', statusFilter.value);
+            if (sortSelect) searchParams.set('sort', sortSelect.value);
+            // Nouveau tri ou filtre : retour à la première page
+            searchParams.delete('cursor');
             window.location.href = `${window.location.pathname}?${searchParams.toString()}`;
         }
 
@@ -37,6 +41,7 @@ document.addEventListener('DOMContentLoaded', function () {
 
         // Filtrage par statut
         statusFilter.addEventListener('change', submitSearch);
+        if (sortSelect) sortSelect.addEventListener('change', submitSearch);
     }
 
     // Affichage des détails client
@@ -1381,8 +1381,11 @@ document.addEventListener('DOMContentLoaded', function () {
                     .then(data => {
                         if (data.success) {
                             // Mettre à jour l'interface
+                            // Seules les commandes acceptées changent (transitions refusées ignorées)
                             selectedIds.forEach(id => {
-                                updateRowStatus(id, batchStatus, getStatusText(batchStatus));
+                                if (!data.results || data.results[id] === 'updated') {
+                                    updateRowStatus(id, batchStatus, getStatusText(batchStatus));
+                                }
                             });
 
                             // Décocher toutes les cases
@@ -1403,7 +1406,11 @@ document.addEventListener('DOMContentLoaded', function () {
                             // Masquer les actions groupées
                             updateBatchActions();
 
+                            const rejected = Object.values(data.results || {}).filter(result => result === 'invalid_transition' || result === 'not_found').length;
                             showToast(`${data.updated_count} commande(s) mise(s) à jour avec succès`, 'success');
+                            if (rejected) {
+                                showToast(`${rejected} commande(s) non modifiée(s) (transition non autorisée)`, 'warning');
+                            }
                             closeModal(DOM.batchUpdateModal);
                         } else {
                             showToast(`Erreur: ${data.error}`, 'error');
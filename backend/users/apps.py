@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        from core.images import register
+
+        register(self.get_model('User'), 'profile_image', 'profile_image_variants')
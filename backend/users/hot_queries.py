@@ -0,0 +1,14 @@
+# users/hot_queries.py
+"""Requêtes fréquentes des utilisateurs (commande explain_hot_queries)"""
+from core.explain import hot_query
+from .models import User
+
+
+@hot_query('users.active_artisans')
+def active_artisans():
+    return User.objects.filter(role=User.Role.ARTISAN, is_active=True)
+
+
+@hot_query('users.by_role')
+def by_role():
+    return User.objects.filter(role=User.Role.ARTISAN).order_by('-date_joined', '-id')[:20]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='review_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from core import images
+
 class User(AbstractUser):
     class Role(models.TextChoices):
         BUYER = 'buyer', 'Acheteur'
@@ -12,6 +14,7 @@ class User(AbstractUser):
     role = models.CharField(max_length=20, choices=Role.choices, default=Role.BUYER)
     phone = models.CharField(max_length=15, unique=True, null=True, blank=True)
     profile_image = models.ImageField(upload_to='profile_images/', null=True, blank=True)
+    profile_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # core.images
     location = models.CharField(max_length=255, blank=True)
     
     # Champs spécifiques Artisan
@@ -23,17 +26,35 @@ class User(AbstractUser):
     years_of_experience = models.IntegerField(default=0)
     is_verified = models.BooleanField(default=False)
     is_certified = models.BooleanField(default=False)
+    # Note moyenne des avis reçus (maintenue par social.ratings)
     rating = models.FloatField(default=0.0)
+    rating_sum = models.IntegerField(default=0)
+    review_count = models.IntegerField(default=0)
     total_sales = models.IntegerField(default=0)
     qr_code = models.ImageField(upload_to='qr_codes/', null=True, blank=True)
     
     working_hours = models.JSONField(default=dict, blank=True)
+    # Requêtes conditionnelles (core.conditional)
+    updated_at = models.DateTimeField(auto_now=True)
 
     REQUIRED_FIELDS = ['phone', 'email'] # email est dans AbstractUser
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Pagination par curseur (core.pagination)
+            models.Index(fields=['date_joined', 'id'], name='user_joined_id_idx'),
+            # Filtre par rôle (?role=artisan, artisans actifs du site, nouveaux clients)
+            models.Index(fields=['role', 'is_active'], name='user_role_active_idx'),
+            models.Index(fields=['role', 'date_joined', 'id'], name='user_role_joined_idx'),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.role})"
 
+    @property
+    def profile_image_srcset(self):
+        return images.srcset(self.profile_image, self.profile_image_variants)
+
 # ADD THIS MODEL CLASS:
 class Address(models.Model):
     ADDRESS_TYPE_CHOICES = [
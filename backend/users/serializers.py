@@ -1,15 +1,19 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from core import images
+from core.serializers import DynamicFieldsMixin
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     # C'EST LA CORRECTION CRUCIALE :
     # On dit à Django : "Le champ 'name' correspond à 'first_name' dans la BDD"
     name = serializers.CharField(source='first_name', required=True)
     
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
+    # Copies réduites de la photo de profil (core.images)
+    profile_image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -22,6 +26,7 @@ class UserSerializer(serializers.ModelSerializer):
             'role', 
             'phone', 
             'profile_image', 
+            'profile_image_variants', 
             'location', 
             'bio', 
             'stand_name', 
@@ -30,8 +35,12 @@ class UserSerializer(serializers.ModelSerializer):
             'working_hours', 
             'years_of_experience'
         ]
+        field_dependencies = {'profile_image_variants': ('profile_image', 'profile_image_variants')}
         # Pas besoin de mettre 'name' dans extra_kwargs car on l'a défini manuellement en haut
 
+    def get_profile_image_variants(self, obj):
+        return images.variants_payload(obj.profile_image, obj.profile_image_variants, self.context.get('request'))
+
     def create(self, validated_data):
         # 1. On extrait le mot de passe
         password = validated_data.pop('password', None)
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from core.async_api import async_read_view
 from .views import UserViewSet, login_view
 
 router = DefaultRouter()
@@ -8,7 +10,17 @@ router.register(r'users', UserViewSet)
 urlpatterns = [
     # Login custom doit être AVANT le router pour être prioritaire si conflit
     path('auth/login/', login_view, name='login'),
-    
+]
+if settings.ASYNC_API_VIEWS:
+    # Lectures asynchrones (profil ASGI) : /users/?role=artisan et profils
+    urlpatterns += [
+        path('users/', async_read_view(UserViewSet, {'get': 'list', 'post': 'create'}, 'list')),
+        path('users/<int:pk>/', async_read_view(UserViewSet, {
+            'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+        }, 'retrieve')),
+    ]
+
+urlpatterns += [
     # Routes générées par le router (dont /users/)
     path('', include(router.urls)),
 ]
\ No newline at end of file
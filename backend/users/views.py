@@ -6,13 +6,16 @@ from django.contrib.auth import authenticate
 from django.db.models import Q 
 from rest_framework_simplejwt.tokens import RefreshToken
 from drf_spectacular.utils import extend_schema
+from core.conditional import ConditionalGetMixin
+from core.mixins import QueryPlanMixin
 from .models import User
 from .serializers import UserSerializer
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    cursor_ordering = ('-date_joined', '-id')
 
     def get_queryset(self):
         """Filtrage par rôle si le paramètre ?role=artisan est passé"""
@@ -20,7 +23,8 @@ class UserViewSet(viewsets.ModelViewSet):
         role = self.request.query_params.get('role')
         if role:
             queryset = queryset.filter(role=role)
-        return queryset
+        # Colonnes limitées aux champs demandés (?fields=)
+        return self.apply_query_plan(queryset)
 
     def get_permissions(self):
         """
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class WebsiteConfig(AppConfig):
     name = 'website'
+
+    def ready(self):
+        from core.images import register
+
+        register(self.get_model('BlogPost'), 'featured_image', 'featured_image_variants')
+
+        from . import signals  # noqa: F401
@@ -0,0 +1,14 @@
+# website/hot_queries.py
+"""Requêtes fréquentes du blog (commande explain_hot_queries)"""
+from core.explain import hot_query
+from .models import BlogPost
+
+
+@hot_query('website.published_posts')
+def published_posts():
+    return BlogPost.objects.filter(status='published').order_by('-published_at')[:9]
+
+
+@hot_query('website.related_posts')
+def related_posts():
+    return BlogPost.objects.filter(status='published', category='Général').order_by('-published_at')[:3]
@@ -1,8 +1,11 @@
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
 from django.utils.text import slugify
 from django.utils import timezone
 
+from core import images
+
 class BlogPost(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Brouillon'),
@@ -16,6 +19,7 @@ class BlogPost(models.Model):
     content = models.TextField(verbose_name="Contenu")
     excerpt = models.TextField(max_length=500, blank=True, verbose_name="Extrait")
     featured_image = models.ImageField(upload_to='blog_images/', blank=True, null=True, verbose_name="Image de couverture")
+    featured_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # core.images
     category = models.CharField(max_length=100, default='Général', verbose_name="Catégorie")
     tags = models.CharField(max_length=200, blank=True, help_text="Séparez les tags par des virgules")
     
@@ -27,6 +31,16 @@ class BlogPost(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Articles publiés : liste du blog et articles similaires (index partiels)
+            models.Index(
+                fields=['-published_at'], condition=Q(status='published'), name='blogpost_published_idx'
+            ),
+            models.Index(
+                fields=['category', '-published_at'], condition=Q(status='published'),
+                name='blogpost_published_cat_idx'
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -42,6 +56,10 @@ class BlogPost(models.Model):
     def get_tags_list(self):
         return [tag.strip() for tag in self.tags.split(',')] if self.tags else []
 
+    @property
+    def featured_image_srcset(self):
+        return images.srcset(self.featured_image, self.featured_image_variants)
+
 class Comment(models.Model):
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -0,0 +1,15 @@
+# website/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import BlogPost, Comment
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_post_on_comment(sender, instance, raw=False, **kwargs):
+    """Les commentaires sont affichés avec l'article (ETag de post_detail)"""
+    if raw:
+        return
+    BlogPost.objects.filter(pk=instance.post_id).update(updated_at=timezone.now())
@@ -3,12 +3,16 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required  # <-- Add this line
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import Q, Subquery
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_POST
 from .forms import WebsiteLoginForm, WebsiteRegistrationForm
 from django.core.paginator import Paginator
-from products.models import Product
+from core import cache
+from core.conditional import conditional_page, queryset_state, request_salt
+from products.models import CATALOG_CACHE, Product
+from products.reservations import SESSION_RESERVATION_KEY, ReservationService
+from products.search import filter_category, search_products
 from orders.services import PaymentService
 from orders.models import Order, OrderItem
 import json
@@ -39,7 +43,10 @@ CATEGORIES_DATA = [
 def home(request):
     """Page d'accueil"""
     # Récupérer les produits récents comme produits vedettes
-    featured_products = Product.objects.filter(stock__gt=0).order_by('-created_at')[:8]
+    featured_products = cache.get_or_set(
+        CATALOG_CACHE, 'home:featured',
+        lambda: list(Product.objects.filter(stock__gt=0).prefetch_related('images').order_by('-created_at')[:8]),
+    )
     
     context = {
         'featured_products': featured_products,
@@ -49,29 +56,29 @@ def home(request):
 
 def products_list(request):
     """Liste des produits avec filtres"""
-    products = Product.objects.all()
+    products = Product.objects.prefetch_related('images')
     
     # Filtres
     category = request.GET.get('category')
     search_query = request.GET.get('q')
-    sort_by = request.GET.get('sort', 'newest')
+    # Avec une recherche, le tri par défaut est la pertinence
+    sort_by = request.GET.get('sort', 'relevance' if search_query else 'newest')
     
     if category:
-        products = products.filter(category__iexact=category)
+        products = filter_category(products, category)
     
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
+        products = search_products(products, search_query)
     
     # Tri
-    if sort_by == 'price_asc':
+    if sort_by == 'relevance' and search_query:
+        pass  # Déjà trié par l'index de recherche
+    elif sort_by == 'price_asc':
         products = products.order_by('price')
     elif sort_by == 'price_desc':
         products = products.order_by('-price')
     elif sort_by == 'popular':
-        products = products.order_by('-average_rating')
+        products = products.order_by('-average_rating', '-review_count', '-id')
     else:  # newest
         products = products.order_by('-created_at')
     
@@ -90,12 +97,27 @@ def products_list(request):
     return render(request, 'website/products.html', context)
 
 
+def product_page_state(request, pk):
+    """Produit et produits similaires (même catégorie) : une requête"""
+    category = Product.objects.filter(pk=pk).values('category')[:1]
+    return queryset_state(
+        filter_category(Product.objects.all(), Subquery(category)),
+        ('updated_at', 'artisan__updated_at'),
+        *request_salt(request),
+    )
+
+
+@conditional_page(product_page_state)
 def product_detail(request, pk):
     """Détail d'un produit"""
-    product = get_object_or_404(Product, pk=pk)
-    related_products = Product.objects.filter(
-        category=product.category
-    ).exclude(pk=pk)[:4]
+    product = get_object_or_404(Product.objects.prefetch_related('images'), pk=pk)
+    # Le produit lui-même (stock) n'est pas mis en cache, seulement les suggestions
+    related_products = cache.get_or_set(
+        CATALOG_CACHE, f'related:{pk}',
+        lambda: list(filter_category(
+            Product.objects.exclude(pk=pk), product.category
+        ).order_by('-created_at').prefetch_related('images')[:4]),
+    )
     
     context = {
         'product': product,
@@ -144,7 +166,7 @@ def artisans_list(request):
 def artisan_detail(request, pk):
     """Détail d'un artisan"""
     artisan = get_object_or_404(User, pk=pk, role='artisan')
-    products = Product.objects.filter(artisan=artisan)
+    products = Product.objects.filter(artisan=artisan).prefetch_related('images')
     
     context = {
         'artisan': artisan,
@@ -177,6 +199,18 @@ def post_list(request):
     
     return render(request, 'website/post_list.html', {'page_obj': posts})
 
+def post_page_state(request, slug):
+    """Article et articles similaires ; un commentaire met à jour son article"""
+    category = BlogPost.objects.filter(slug=slug, status='published').values('category')[:1]
+    return queryset_state(
+        BlogPost.objects.filter(status='published', category=Subquery(category)),
+        ('updated_at', 'author__updated_at'),
+        *request_salt(request),
+    )
+
+
+# Une revalidation (304) n'est pas comptée comme une nouvelle vue
+@conditional_page(post_page_state)
 def post_detail(request, slug):
     """Détail d'un article"""
     post = get_object_or_404(BlogPost, slug=slug, status='published')
@@ -203,7 +237,9 @@ def post_detail(request, slug):
         comment_form = CommentForm()
     
     # Articles similaires (même catégorie)
-    related_posts = BlogPost.objects.filter(category=post.category, status='published').exclude(id=post.id)[:3]
+    related_posts = BlogPost.objects.filter(
+        category=post.category, status='published'
+    ).exclude(id=post.id).order_by('-published_at')[:3]
     
     context = {
         'post': post,
@@ -282,17 +318,32 @@ def cart_view(request):
     return render(request, 'website/cart.html', context)
 
 
+def _cart_owner(request):
+    """Propriétaire des réservations de stock : utilisateur ou session anonyme"""
+    if not request.user.is_authenticated:
+        if not request.session.session_key:
+            request.session.save()
+        # Retrouvée à la connexion (products.signals.claim_session_reservations)
+        request.session[SESSION_RESERVATION_KEY] = request.session.session_key
+    return {'user': request.user, 'session_key': request.session.session_key}
+
+
 def add_to_cart(request, product_id):
     """Ajouter au panier"""
     product = get_object_or_404(Product, pk=product_id)
     cart = request.session.get('cart', {})
     
     product_id_str = str(product_id)
-    if product_id_str in cart:
-        cart[product_id_str] += 1
-    else:
-        cart[product_id_str] = 1
+    quantity = cart.get(product_id_str, 0) + 1
     
+    # Réserver le stock pour la durée du panier (STOCK_RESERVATION_TTL)
+    try:
+        ReservationService.reserve(product.id, quantity, **_cart_owner(request))
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('website:product_detail', pk=product.id)
+    
+    cart[product_id_str] = quantity
     request.session['cart'] = cart
     messages.success(request, f'{product.name} ajouté au panier!')
     
@@ -309,6 +360,7 @@ def remove_from_cart(request, product_id):
     if product_id_str in cart:
         del cart[product_id_str]
         request.session['cart'] = cart
+        ReservationService.release(product_id, **_cart_owner(request))
         messages.success(request, 'Article retiré du panier')
     
     return redirect('website:cart') # <-- Correction ici
@@ -320,6 +372,12 @@ def update_cart(request, product_id):
         cart = request.session.get('cart', {})
         product_id_str = str(product_id)
         
+        try:
+            ReservationService.reserve(product_id, max(quantity, 0), **_cart_owner(request))
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('website:cart')
+        
         if quantity > 0:
             cart[product_id_str] = quantity
         else:
@@ -376,20 +434,21 @@ def payment(request):
                 delivery_address=delivery_address,
                 delivery_phone=delivery_phone,
                 payment_method=payment_method,
+                session_key=request.session.session_key,
             )
             
             # Si paiement à la livraison, pas besoin de traiter le paiement maintenant
             if payment_method == 'delivery':
                 messages.success(request, "Commande créée avec succès ! Vous paierez à la livraison.")
             else:
-                # Traiter le paiement
+                # Le paiement est traité en arrière-plan par le provider
                 phone_number = request.POST.get('delivery_phone', request.user.phone)
-                result = PaymentService.process_payment(
+                payment = PaymentService.process_payment(
                     order=order,
                     payment_method=payment_method,
                     phone_number=phone_number,
                 )
-                messages.success(request, f"Paiement effectué ! Transaction: {result['transaction_id']}")
+                messages.success(request, f"Commande créée ! Paiement {payment.reference} en cours de traitement.")
             
             # Définir un cookie pour vider le panier côté client
             response = redirect('website:confirmation')
@@ -432,7 +491,7 @@ def confirmation(request):
     
     context = {
         'order': order,
-        'order_items': order.items.all(),
+        'order_items': order.items.select_related('product').prefetch_related('product__images'),
     }
     
     response = render(request, 'website/confirmation.html', context)
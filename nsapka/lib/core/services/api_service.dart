@@ -610,6 +610,11 @@ class RemoteApiService {
       if (response.statusCode == 200) {
         final decoded = json.decode(response.body);
 
+        // Réponse paginée par curseur : {next, previous, results}
+        if (decoded is Map && decoded['results'] is List) {
+          return List<Map<String, dynamic>>.from(decoded['results']);
+        }
+
         // 🔥 Vérifier si c'est une liste
         if (decoded is! List) {
           debugPrint('⚠️ Réponse n\'est pas une liste: $decoded');